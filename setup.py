@@ -37,6 +37,8 @@ setup(
     packages=[
         'warthog',
         'warthog.admin',
+        'warthog.management',
+        'warthog.management.commands',
         'warthog.migrations',
         'warthog.migrations_south',
         'warthog.templatetags',
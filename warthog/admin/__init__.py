@@ -3,7 +3,7 @@ from __future__ import absolute_import
 from django.conf import settings
 from django.contrib import admin
 from django.core.exceptions import PermissionDenied
-from django.core.urlresolvers import reverse
+from django.core.urlresolvers import reverse, get_script_prefix
 from django.db import transaction
 from django.forms.utils import ErrorList
 from django.contrib.admin import helpers
@@ -15,7 +15,27 @@ from urlparse import unquote
 
 from .forms import ResourceFieldsForm, ResourceAddForm
 from .. import cache
-from ..models import Template, ResourceType, ResourceTypeField, Resource
+from ..models import Template, ResourceType, ResourceTypeField, Resource, ResourceField
+
+
+# Reversed URLs split around a placeholder argument; (script prefix, url name) -> (prefix, suffix)
+_url_templates = {}
+
+
+def reverse_pk(viewname, pk):
+    """
+    Reverse a URL that takes a single primary key argument.
+
+    The URL is only reversed once per script prefix, subsequent calls substitute
+    the primary key, this avoids reversing a URL for every row of a change list.
+
+    """
+    cache_key = (get_script_prefix(), viewname)
+    try:
+        prefix, suffix = _url_templates[cache_key]
+    except KeyError:
+        prefix, suffix = _url_templates[cache_key] = tuple(reverse(viewname, args=['0']).rsplit('0', 1))
+    return '%s%s%s' % (prefix, pk, suffix)
 
 
 class CachedModelAdmin(admin.ModelAdmin):
@@ -23,8 +43,11 @@ class CachedModelAdmin(admin.ModelAdmin):
     actions = 'clear_cache'
 
     def clear_cache(self, request, queryset):
-        map(cache.clear_model, queryset)
-        count = len(queryset)
+        if hasattr(queryset, 'invalidate'):
+            # Also removes rendered output and purges pages from any HTTP cache
+            count = queryset.invalidate()
+        else:
+            count = cache.clear_models(queryset)
         if count > 1:
             message = '%s objects where' % count
         else:
@@ -39,7 +62,7 @@ class TemplateAdmin(admin.ModelAdmin):
     """
     fieldsets = [
         (None, {
-            'fields': ('site', 'name', 'description', 'cacheable', ) ,
+            'fields': ('site', 'name', 'description', 'cacheable', 'streaming', ) ,
         }),
         ('Content', {
             'fields': ('mime_type', 'content', ),
@@ -83,7 +106,7 @@ class ResourceTypeAdmin(admin.ModelAdmin):
     filter_horizontal = ('child_types',)
 
     def site_summary(self, obj):
-        """Summary of sites."""
+        """Summary of sites (prefetched by get_queryset)."""
         return ', '.join(s.name for s in obj.site.all())
     site_summary.short_description = _('Sites')
 
@@ -102,7 +125,7 @@ class ResourceTypeAdmin(admin.ModelAdmin):
         Returns a QuerySet of all model instances that can be edited by the
         admin site. This is used by changelist_view.
         """
-        qs = super(ResourceTypeAdmin, self).get_queryset(request)
+        qs = super(ResourceTypeAdmin, self).get_queryset(request).prefetch_related('site', 'child_types')
         if request.user.is_superuser:
             return qs
         return qs.filter(site=settings.SITE_ID)
@@ -172,18 +195,18 @@ class ResourceAdmin(CachedModelAdmin):
 
     def resource_path(self, obj):
         """ Path to resource """
-        return '<a href="%s">%s</a>' % (obj.get_absolute_url(), obj.uri_path)
+        return '<a href="%s">%s</a>' % (reverse_pk('warthog-preview', obj.pk), obj.uri_path)
     resource_path.short_description = _('Resource Path')
     resource_path.allow_tags = True
 
     def html_actions(self, obj):
         """Actions within the list"""
-        child_types = obj.type.child_types.all()
+        child_types = ResourceType.objects.child_type_map().get(obj.type_id, [])
         add_uri = reverse('admin:warthog_resource_add')
         actions = []
-        for type in child_types:
+        for type_pk, type_name in child_types:
             actions.append('<li><a href="%s?parent=%s&type=%s">Add %s resource</a></li>' % (
-                add_uri, obj.pk, type.pk, type.name))
+                add_uri, obj.pk, type_pk, type_name))
         return '<ul>%s</ul>' % ''.join(actions)
     html_actions.short_description = _('Actions')
     html_actions.allow_tags = True
@@ -211,7 +234,7 @@ class ResourceAdmin(CachedModelAdmin):
     unpublish_summary.short_description = _('expire ')
 
     def make_published(self, request, queryset):
-        rows_updated = queryset.update(published=True)
+        rows_updated = queryset.publish()
         if rows_updated == 1:
             message_bit = "1 resource was"
         else:
@@ -220,7 +243,7 @@ class ResourceAdmin(CachedModelAdmin):
     make_published.short_description = _('Publish selected resources')
 
     def make_unpublished(self, request, queryset):
-        rows_updated = queryset.update(published=False)
+        rows_updated = queryset.unpublish()
         if rows_updated == 1:
             message_bit = "1 resource was"
         else:
@@ -264,7 +287,7 @@ class ResourceAdmin(CachedModelAdmin):
         Returns a QuerySet of all model instances that can be edited by the
         admin site. This is used by changelist_view.
         """
-        qs = super(ResourceAdmin, self).get_queryset(request)
+        qs = super(ResourceAdmin, self).get_queryset(request).select_related('type', 'site')
         if request.user.is_superuser and 'all' in request.GET:
             return qs
         return qs.filter(site=settings.SITE_ID)
@@ -281,6 +304,18 @@ class ResourceAdmin(CachedModelAdmin):
         """
         return form.save_to(obj)
 
+    def save_snapshot(self, request, obj):
+        """
+        Publish (a new snapshot of) a resource saved as published, so the saved
+        changes are live; a resource saved as not published no longer
+        references a snapshot.
+        """
+        queryset = self.model.objects.filter(pk=obj.pk)
+        if obj.published:
+            queryset.publish()
+        elif obj.snapshot_id is not None:
+            queryset.unpublish()
+
     def has_change_permission(self, request, obj=None):
         if obj and obj.is_locked_for_user(request.user):
             return False
@@ -310,22 +345,24 @@ class ResourceAdmin(CachedModelAdmin):
 #                current_app=self.admin_site.name), resource_type_code=obj.type)
 
         ModelForm = self.get_form(request, obj)
-        initial=dict(obj.fields.all().values_list('code', 'value'))
+        FieldsForm = ResourceFieldsForm.for_type(obj.type)
+        initial = dict(ResourceField.objects.get_bundle(obj.pk))
         if request.method == 'POST':
             form = ModelForm(data=request.POST, instance=obj)
-            fields_form = ResourceFieldsForm(obj.type, instance=obj, initial=initial, prefix='fields', data=request.POST, files=request.FILES)
+            fields_form = FieldsForm(instance=obj, initial=initial, prefix='fields', data=request.POST, files=request.FILES)
 
             if form.is_valid() and fields_form.is_valid():
                 obj = self.save_form(request, form, change=False)
                 self.save_model(request, obj, form, False)
                 self.save_fields_form(request, fields_form, obj, False)
+                self.save_snapshot(request, obj)
                 self.log_addition(request, obj)
                 return self.response_change(request, obj)
         else:
             form = ModelForm(instance=obj)
 
             # Populate form
-            fields_form = ResourceFieldsForm(obj.type, instance=obj, initial=initial, prefix='fields')
+            fields_form = FieldsForm(instance=obj, initial=initial, prefix='fields')
 
         adminForm = helpers.AdminForm(form, list(self.get_fieldsets(request, obj)),
             self.get_prepopulated_fields(request, obj),
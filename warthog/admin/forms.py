@@ -1,35 +1,97 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
+from collections import OrderedDict
 from django import forms
-from ..models import Resource
+from django.db import transaction
+from .. import search
+from ..conf import settings
+from ..managers import CHANGE_FIELDS, log_changes
+from ..models import Resource, ResourceField
 from ..resource_types import library
 
 
+# Compiled form classes; resource type pk -> (resource type updated, form class)
+_form_classes = {}
+
+
 class ResourceFieldsForm(forms.Form):
     """
     Form that dynamically creates form fields based on a ResourceType definition.
+
+    Use :meth:`for_type` to obtain the form class for a particular resource type.
     """
-    def __init__(self, resource_type, instance, *args, **kwargs):
-        self.resource_type = resource_type
+    resource_type = None
+    field_types = {}
+
+    def __init__(self, instance, *args, **kwargs):
         self.instance = instance
         super(ResourceFieldsForm, self).__init__(*args, **kwargs)
 
         initial = kwargs.get('initial', {})
-        for f in resource_type.fields.all():
-            self.fields[f.code] = f.create_form_field()
-            initial[f.code] = library[f.field_type].to_python(initial.get(f.code), instance.pk, f.code)
+        for code, field_type in self.field_types.iteritems():
+            initial[code] = library[field_type].to_python(initial.get(code), instance, code)
         self.initial = initial
 
+    @classmethod
+    def for_type(cls, resource_type):
+        """
+        Get a form class for a resource type.
+
+        Form classes are built from the ResourceTypeField definitions once and
+        cached for the life of the process (until the resource type is updated).
+
+        :param resource_type: ResourceType object.
+        :return: ResourceFieldsForm sub class.
+        """
+        try:
+            updated, form_class = _form_classes[resource_type.pk]
+        except KeyError:
+            pass
+        else:
+            if updated == resource_type.updated:
+                return form_class
+
+        base_fields = OrderedDict()
+        field_types = {}
+        for f in resource_type.fields.all():
+            base_fields[f.code] = f.create_form_field()
+            field_types[f.code] = f.field_type
+
+        form_class = type(str('%sFieldsForm' % resource_type.code.title().replace('-', '')), (cls,), {
+            'resource_type': resource_type,
+            'field_types': field_types,
+        })
+        # Assigned after class creation as field codes may clash with form attributes.
+        form_class.base_fields = base_fields
+        _form_classes[resource_type.pk] = (resource_type.updated, form_class)
+        return form_class
+
     def save_to(self, obj):
         """
         Save the values on this form to a resource_types object.
+
+        All changed fields are replaced in a single transaction (one delete and
+        one bulk insert) and the cached field bundle is invalidated once.
+
         :param obj: ResourceObject to save form fields to.
         """
         changed_data = self.changed_data
+        if not changed_data:
+            return
         cleaned_data = self.cleaned_data
-        obj.fields.filter(code__in=changed_data).delete()
-        for code, value in ((code, cleaned_data[code]) for code in changed_data):
-            obj.fields.create(code=code, value=library[code].to_database(value, obj.pk, code))
+        resource_fields = [
+            ResourceField(
+                resource=obj, code=code,
+                value=library[self.field_types[code]].to_database(cleaned_data[code], obj, code)
+            ) for code in changed_data
+        ]
+        with transaction.atomic():
+            obj.fields.filter(code__in=changed_data).delete()
+            ResourceField.objects.bulk_create(resource_fields)
+            log_changes(CHANGE_FIELDS, [obj.pk])
+        ResourceField.objects.invalidate_bundle(obj.pk, obj)
+        if any(self.field_types[code] in settings.CMS_SEARCH_FIELD_TYPES for code in changed_data):
+            search.update_resource(obj)
 
 
 class ResourceAddForm(forms.ModelForm):
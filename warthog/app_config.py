@@ -5,3 +5,7 @@ from django.apps import AppConfig
 class WarthogAppConfig(AppConfig):
     name = 'warthog'
     verbose_name = 'Warthog CMS'
+
+    def ready(self):
+        from . import search
+        search.connect_signals()
@@ -1,81 +1,278 @@
 # -*- coding: utf-8 -*-
+"""
+Cache layer used by warthog.
+
+All cache access (managers, admin actions and views) goes through this module
+so keys are built in one place and batch operations/statistics are available
+everywhere.
+
+"""
+from __future__ import absolute_import
+import hashlib
+import re
+import uuid
 from django.core.cache import cache as default_cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.utils.encoding import force_bytes
+from .conf import settings
+
+
+class CacheStats(object):
+    """Counters of cache operations performed by warthog (per process)."""
+    __slots__ = ('hits', 'misses', 'sets', 'deletes')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.hits = self.misses = self.sets = self.deletes = 0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+stats = CacheStats()
+
+
+# Characters that are not valid in a memcached key or are used as separators
+UNSAFE_KEY_CHARS = re.compile(r'[^\x21-\x7e]|[,=\[\]]')
+
+
+def key_component(value):
+    """
+    Convert a value into a cache key component.
+
+    Values that are too long or contain characters that are unsafe in a key are
+    replaced with a digest of the value.
+
+    """
+    value = force_bytes(value)
+    if len(value) > settings.CMS_CACHE_KEY_MAX_COMPONENT or UNSAFE_KEY_CHARS.search(value):
+        return 'md5.' + hashlib.md5(value).hexdigest()
+    return value
+
+
+def generate_key(namespace, **vary_by):
+    """
+    Generate a versioned cache key.
+
+    :param namespace: namespace of key, eg model or fragment.
+    :param vary_by: attributes that identify the item; always in name order.
+
+    """
+    return 'warthog:%s:%s[%s]' % (
+        settings.CMS_CACHE_KEY_VERSION, namespace,
+        ','.join(['%s=%s' % (k, key_component(v)) for k, v in sorted(vary_by.iteritems())])
+    )
 
 
 def generate_obj_key(instance_or_type, **vary_by):
     """Generate a cache key for a model object."""
     opts = instance_or_type._meta
-    return 'model:%s.%s[%s]' % (
-        opts.app_label, opts.module_name,
-        ','.join(['%s=%s' % v for v in vary_by.iteritems()])
-    )
+    return generate_key('model:%s.%s' % (opts.app_label, opts.model_name), **vary_by)
 
 
-def set_model(model_instance, cache=None):
+def get(key, default=None, cache=None):
+    """
+    Get a value from cache.
+
+    :param key: cache key.
+    :param default: value returned if key is not found.
+    :param cache: cache instance to use; defaults to main django cache.
+
+    """
+    cache = cache or default_cache
+    value = cache.get(key)
+    if value is None:
+        stats.misses += 1
+        return default
+    stats.hits += 1
+    return value
+
+
+def get_many(keys, cache=None):
+    """
+    Get multiple values from cache.
+
+    :param keys: cache keys.
+    :param cache: cache instance to use; defaults to main django cache.
+    :returns: dict of key -> value for keys that where found.
+
+    """
+    cache = cache or default_cache
+    keys = list(keys)
+    values = {k: v for k, v in cache.get_many(keys).iteritems() if v is not None}
+    stats.hits += len(values)
+    stats.misses += len(keys) - len(values)
+    return values
+
+
+def set(key, value, timeout=DEFAULT_TIMEOUT, cache=None):
+    """Store a value in cache."""
+    cache = cache or default_cache
+    stats.sets += 1
+    cache.set(key, value, timeout)
+
+
+def set_many(data, timeout=DEFAULT_TIMEOUT, cache=None):
+    """Store multiple values (dict of key -> value) in cache."""
+    cache = cache or default_cache
+    stats.sets += len(data)
+    cache.set_many(data, timeout)
+
+
+def add(key, value, timeout=DEFAULT_TIMEOUT, cache=None):
+    """Store a value in cache only if the key does not already exist."""
+    cache = cache or default_cache
+    stats.sets += 1
+    return cache.add(key, value, timeout)
+
+
+def delete(key, cache=None):
+    """Remove a key from cache."""
+    cache = cache or default_cache
+    stats.deletes += 1
+    cache.delete(key)
+
+
+def delete_many(keys, cache=None):
+    """Remove multiple keys from cache."""
+    cache = cache or default_cache
+    keys = list(keys)
+    stats.deletes += len(keys)
+    cache.delete_many(keys)
+
+
+def default_timeout(cache=None):
+    """Default timeout of a cache instance (`None` for no expiry)."""
+    cache = cache or default_cache
+    return cache.default_timeout
+
+
+def generation_key(name):
+    return generate_key('generation', name=name)
+
+
+def get_generations(names, cache=None):
+    """
+    Get the current generation tokens of a set of names.
+
+    Generation tokens are used to build keys for derived entries (eg rendered
+    fragments) that can be invalidated by calling :func:`invalidate_generations`
+    rather than having to know every derived key.
+
+    :param names: names of generations, eg ``templates``.
+    :param cache: cache instance to use; defaults to main django cache.
+    :returns: dict of name -> token.
+
+    """
+    keys = {generation_key(name): name for name in names}
+    tokens = get_many(keys, cache)
+    missing = {key: uuid.uuid4().hex[:12] for key in keys if key not in tokens}
+    if missing:
+        set_many(missing, None, cache)
+        tokens.update(missing)
+    return {keys[key]: token for key, token in tokens.iteritems()}
+
+
+def invalidate_generations(names, cache=None):
+    """Invalidate generations; a new token is issued on next access."""
+    delete_many([generation_key(name) for name in names], cache)
+
+
+def get_model_keys(model_instance):
+    """
+    All cache keys that reference a model object.
+
+    Models may define a ``cache_keys`` attribute (see
+    :class:`warthog.managers.CachingManager`) to include reference keys.
+
+    """
+    keys = getattr(model_instance, 'cache_keys', None)
+    if keys is None:
+        keys = [generate_obj_key(model_instance, pk=model_instance.pk)]
+    return keys
+
+
+def set_model(model_instance, cache=None, timeout=DEFAULT_TIMEOUT):
     """
     Store a model in cache.
-    
+
     :param model_instance: the model object to store.
     :param cache: cache instance to use; defaults to main django cache.
+    :param timeout: cache timeout.
     :returns: cache key.
-    
+
     """
-    cache = cache or default_cache
     key = generate_obj_key(model_instance, pk=model_instance.pk)
-    cache.set(key, model_instance)
+    set(key, model_instance, timeout, cache)
     return key
 
 
 def get_model(model_type, pk, cache=None):
     """Store a model in cache.
-    
+
     :param model_type: model type for building cache key.
     :param pk: primary key of model to fetch from cache.
     :param cache: cache instance to use; defaults to main django cache.
     :returns: model object if found; else None.
-    
+
     """
-    cache = cache or default_cache
     key = generate_obj_key(model_type, pk=pk)
-    return cache.get(key)
+    return get(key, cache=cache)
 
 
 def clear_model(model_instance, cache=None):
-    """Clear a model instance from cache.
+    """Clear a model instance (and any reference keys) from cache.
 
     :param model_instance: the model object to store.
     :param cache: cache instance to use; defaults to main django cache.
 
     """
-    cache = cache or default_cache
-    key = generate_obj_key(model_instance, pk=model_instance.pk)
-    return cache.delete(key)
+    delete_many(get_model_keys(model_instance), cache)
 
 
-def set_model_by_attribute(model_instance, attr_name, cache=None):
+def clear_models(model_instances, cache=None):
+    """Clear multiple model instances from cache in a single operation.
+
+    :param model_instances: iterable of model objects.
+    :param cache: cache instance to use; defaults to main django cache.
+    :returns: number of model objects cleared.
+
+    """
+    keys = []
+    count = 0
+    for model_instance in model_instances:
+        keys.extend(get_model_keys(model_instance))
+        count += 1
+    if keys:
+        delete_many(keys, cache)
+    return count
+
+
+def set_model_by_attribute(model_instance, attr_name, cache=None, timeout=DEFAULT_TIMEOUT):
     """Store a model in cache by attribute value.
-    
+
     :param model_instance: the model object to store.
     :param attr_name: attribute name.
     :param cache: cache instance to use; defaults to main django cache.
+    :param timeout: cache timeout.
     :returns: reference cache key.
-    
+
     .. note::
         Attribute must be unique.
 
     """
-    cache = cache or default_cache
     # TODO: Add check for uniqueness (use unique flag)
     value = getattr(model_instance, attr_name)
     reference_key = generate_obj_key(model_instance, **{attr_name: value})
-    key = set_model(model_instance, cache)
-    cache.set(reference_key, key)
+    key = set_model(model_instance, cache, timeout)
+    set(reference_key, key, timeout, cache)
     return reference_key
 
 
 def get_model_by_attribute(model_type, attr_name, value, cache=None):
     """Get a model from cache by reference.
-    
+
     :param model_type: model type for building cache key.
     :param attr_name: attribute name.
     :param value: value of attribute.
@@ -83,10 +280,9 @@ def get_model_by_attribute(model_type, attr_name, value, cache=None):
     :returns: model object if found; else None.
 
     """
-    cache = cache or default_cache
     reference_key = generate_obj_key(model_type, **{attr_name: value})
-    key = cache.get(reference_key)
+    key = get(reference_key, cache=cache)
     if key:
-        return cache.get(key)
+        return get(key, cache=cache)
     else:
         return None
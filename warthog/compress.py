@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Precompression of rendered output.
+
+Cached pages are compressed once when they are rendered so responses can be
+served in any encoding the client accepts without compressing per request.
+
+"""
+from __future__ import absolute_import
+import gzip
+from io import BytesIO
+from .conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+IDENTITY = 'identity'
+
+
+def gzip_compress(content, level):
+    buf = BytesIO()
+    # A fixed mtime keeps output (and any ETag derived from it) stable
+    with gzip.GzipFile(mode='wb', compresslevel=level, fileobj=buf, mtime=0) as f:
+        f.write(content)
+    return buf.getvalue()
+
+
+def brotli_compress(content, level):
+    return brotli.compress(content, quality=level)
+
+
+def get_compressors():
+    """Available compressors (encoding, function) in order of preference."""
+    compressors = [('gzip', gzip_compress)]
+    if brotli is not None:
+        compressors.insert(0, ('br', brotli_compress))
+    return compressors
+
+
+def compress(content):
+    """
+    Compress content with each available encoding.
+
+    Content shorter than ``CMS_COMPRESS_MIN_LENGTH`` is not compressed, nor is
+    an encoding kept if it does not reduce the size of the content.
+
+    :param content: bytes to compress.
+    :returns: dict of encoding -> content; always includes ``identity``.
+
+    """
+    variants = {IDENTITY: content}
+    if len(content) >= settings.CMS_COMPRESS_MIN_LENGTH:
+        for encoding, compressor in get_compressors():
+            compressed = compressor(content, settings.CMS_COMPRESS_LEVEL)
+            if len(compressed) < len(content):
+                variants[encoding] = compressed
+    return variants
+
+
+def parse_accept_encoding(header):
+    """
+    Parse an Accept-Encoding header.
+
+    :returns: dict of encoding -> quality value.
+
+    """
+    encodings = {}
+    for item in header.split(','):
+        encoding, _, params = item.partition(';')
+        encoding = encoding.strip().lower()
+        if not encoding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        encodings[encoding] = quality
+    return encodings
+
+
+def select_encoding(accept_encoding, variants):
+    """
+    Select the best encoding of the available variants for a client.
+
+    :param accept_encoding: value of the Accept-Encoding header.
+    :param variants: dict of encoding -> content (see :func:`compress`).
+    :returns: encoding name; ``identity`` if no compressed variant is acceptable.
+
+    """
+    accepted = parse_accept_encoding(accept_encoding)
+    wildcard = accepted.get('*', 0.0)
+    best, best_quality = IDENTITY, 0.0
+    for encoding, _ in get_compressors():
+        quality = accepted.get(encoding, wildcard)
+        if encoding in variants and quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
@@ -1,86 +1,246 @@
 # -*- coding: utf-8 -*-
-from models import Resource
+import warnings
+from itertools import islice
+from models import Resource, ResourceField, ResourceSnapshot, ResourceTypeField
+from resource_types import library
 
-# TODO: A lot of opportunity here for caching
+
+class FieldLoader(object):
+    """
+    Loads the field values of a batch of resource items (with a single cache
+    request) the first time any of them is used, and memoises the field types
+    of their resource types.
+
+    The title and field values of resources with a published snapshot are read
+    from the snapshot (all snapshots of the batch are fetched together).
+    """
+    __slots__ = ('resource_ids', 'bundles', 'snapshot_ids', 'snapshots', 'field_types')
+
+    def __init__(self, resource_ids, bundles=None, snapshot_ids=None):
+        """
+        :param resource_ids: primary keys of resources in the batch.
+        :param bundles: Field values if already known (dict of resource pk ->
+            dict of code -> value).
+        :param snapshot_ids: Published snapshots of resources in the batch
+            (dict of resource pk -> snapshot pk).
+        """
+        self.resource_ids = resource_ids
+        self.bundles = bundles
+        self.snapshot_ids = snapshot_ids or {}
+        self.snapshots = None
+        self.field_types = {}
+
+    def get_snapshot(self, resource_id):
+        snapshot_id = self.snapshot_ids.get(resource_id)
+        if snapshot_id is None:
+            return None
+        if self.snapshots is None:
+            self.snapshots = ResourceSnapshot.objects.get_snapshots(set(self.snapshot_ids.itervalues()))
+        return self.snapshots.get(snapshot_id)
+
+    def get_title(self, resource_id, default):
+        """Title of a resource; from its snapshot if it has one otherwise default."""
+        snapshot = self.get_snapshot(resource_id)
+        return default if snapshot is None else snapshot.title
+
+    def get_values(self, resource_id):
+        snapshot = self.get_snapshot(resource_id)
+        if snapshot is not None:
+            return snapshot.fields
+        if self.bundles is None:
+            self.bundles = ResourceField.objects.get_bundles(
+                [pk for pk in self.resource_ids if pk not in self.snapshot_ids])
+        return self.bundles.get(resource_id, {})
+
+    def get_field_types(self, resource_type_id):
+        try:
+            return self.field_types[resource_type_id]
+        except KeyError:
+            field_types = self.field_types[resource_type_id] = ResourceTypeField.objects.get_field_types(
+                resource_type_id)
+            return field_types
 
 
 class ResourceItemFields(object):
     """
     Wrapper around resource item fields
+
+    Values are decoded by the field type of each field (see
+    :mod:`warthog.resource_types`) on first access; values that cannot be
+    decoded (eg a malformed date) are returned as stored.
     """
-    __slots__ = ('__field_map', )
+    __slots__ = ('__item', '__loader', '__field_map', '__decoded')
 
-    def __init__(self, fields):
-        field_lookup = {}
-        for field in fields:
-            field_lookup[field.code] = field.value
-        self.__field_map = field_lookup
+    def __init__(self, item, loader):
+        """
+        :param item: ResourceItem the fields belong to.
+        :param loader: FieldLoader of the item.
+        """
+        self.__item = item
+        self.__loader = loader
+        self.__field_map = loader.get_values(item.pk)
+        self.__decoded = {}
 
     def __getitem__(self, item):
-        return self.__field_map[item]
+        try:
+            return self.__decoded[item]
+        except KeyError:
+            pass
+        value = self.__field_map[item]
+        field_type = self.__loader.get_field_types(self.__item.type_id).get(item)
+        try:
+            value = library[field_type].to_python(value, self.__item, item)
+        except (ValueError, TypeError):
+            pass
+        self.__decoded[item] = value
+        return value
+
+
+# Resource columns held by a ResourceItem (the values used by menus and listings)
+ITEM_FIELDS = ('pk', 'type_id', 'title', 'menu_title_raw', 'menu_class', 'uri_path', 'order')
 
 
 class ResourceItem(object):
     """
     Wrapper around resource item
+
+    Only the values used by templates are held (see ``ITEM_FIELDS``) so items
+    can also be built from projected rows (see :meth:`from_row`) without
+    creating a model instance. Field values (``vars``) are not loaded until
+    first used.
     """
-    def __init__(self, resource):
-        self.resource = resource
-        self.vars = ResourceItemFields(resource.fields.all())
+    __slots__ = ITEM_FIELDS + ('_loader', '_vars', '_resource')
 
-    @property
-    def title(self):
-        return self.resource.title
+    def __init__(self, resource, fields=None, title=None):
+        """
+        :param resource: Resource being wrapped.
+        :param fields: Field values of resource (dict of code -> value); fetched
+            from the field bundle on first use if not supplied.
+        :param title: Title used in place of the resource's title (eg the title
+            of its published snapshot).
+        """
+        for name in ITEM_FIELDS:
+            setattr(self, name, getattr(resource, name))
+        if title is not None:
+            self.title = title
+        self._loader = FieldLoader([resource.pk], None if fields is None else {resource.pk: fields})
+        self._vars = None
+        self._resource = resource
+
+    @classmethod
+    def from_row(cls, row, loader):
+        """
+        Build an item from a row of values.
+
+        :param row: tuple of the values of ``ITEM_FIELDS``.
+        :param loader: FieldLoader of the batch the row belongs to.
+        """
+        item = cls.__new__(cls)
+        item.pk, item.type_id, title, item.menu_title_raw, item.menu_class, item.uri_path, item.order = row
+        item.title = loader.get_title(item.pk, title)
+        item._loader = loader
+        item._vars = None
+        item._resource = None
+        return item
 
     @property
-    def menu_title(self):
-        return self.resource.menu_title
+    def resource(self):
+        """
+        Resource model instance of the item, fetched on first use.
+
+        .. deprecated::
+            Use the values held by the item, fetching a resource for every item
+            of a listing is costly.
+        """
+        warnings.warn("ResourceItem.resource is deprecated, use the values held by the item.",
+                      DeprecationWarning, stacklevel=2)
+        if self._resource is None:
+            self._resource = Resource.objects.get(pk=self.pk)
+        return self._resource
 
     @property
-    def menu_class(self):
-        return self.resource.menu_class
+    def vars(self):
+        if self._vars is None:
+            self._vars = ResourceItemFields(self, self._loader)
+        return self._vars
 
     @property
-    def uri_path(self):
-        return self.resource.uri_path
+    def menu_title(self):
+        return self.menu_title_raw or self.title
 
 
 class ResourceIterator(object):
     """
     Resource iterator for iterating over resource query sets
+
+    Only live resources are iterated. Rows are fetched as values (see
+    ``ITEM_FIELDS``) rather than model instances and are processed in batches
+    (the fields of a batch are fetched in a single operation when first used)
+    so large sets can be iterated (eg by a streaming template) cheaply and
+    without holding every resource in memory. Titles and fields are read from
+    the published snapshot of each resource (see :class:`FieldLoader`).
+
+    Resources iterated over are not recorded as dependencies of the render,
+    callers record the listing instead (eg
+    :meth:`warthog.dependencies.DependencyTracker.add_section`) which is
+    invalidated when any resource in it changes.
+
+    The length (eg ``{{ items|length }}``) is counted with a query the first
+    time it is used unless the resources have already been iterated over, and
+    is then kept; note ``list()`` asks for the length before iterating.
     """
-    def __init__(self, queryset):
+    batch_size = 100
+
+    def __init__(self, queryset, use_snapshots=True):
+        """
+        :param queryset: Resources to iterate over (a ResourceQuerySet).
+        :param use_snapshots: Read published snapshots; previews use the
+            current values.
+        """
         self.resources = queryset
+        self.use_snapshots = use_snapshots
+        self._count = None
 
     @classmethod
-    def for_type(cls, resource_type, include_hidden=False):
+    def for_type(cls, resource_type, include_hidden=False, use_snapshots=True):
         """
         Get a resource iterator for a particular resource type.
         :param resource_type: Resource type object.
         :return:
         """
-        queryset = Resource.objects.all()
+        queryset = Resource.objects.filter_front(type=resource_type)
         if not include_hidden:
             queryset = queryset.filter(hide_from_menu=False)
-        return cls(queryset)
+        return cls(queryset, use_snapshots)
 
     @classmethod
-    def for_children(cls, resource, include_hidden=False):
+    def for_children(cls, resource, include_hidden=False, use_snapshots=True):
         """
         Get a resource iterator for child objects.
         :param cls:
-        :param resource:
+        :param resource: Resource, ResourceItem or primary key of the parent.
         :return:
         """
-        queryset = resource.children.all()
+        queryset = Resource.objects.filter_front(parent=getattr(resource, 'pk', resource))
         if not include_hidden:
             queryset = queryset.filter(hide_from_menu=False)
-        return cls(queryset)
+        return cls(queryset, use_snapshots)
 
     def __iter__(self):
-        for resource in self.resources:
-            if resource.is_live:
-                yield ResourceItem(resource)
+        rows = iter(self.resources.live().values_list(*(ITEM_FIELDS + ('snapshot', ))).iterator())
+        count = 0
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                self._count = count
+                break
+            count += len(batch)
+            snapshot_ids = {row[0]: row[-1] for row in batch if row[-1]} if self.use_snapshots else None
+            loader = FieldLoader([row[0] for row in batch], snapshot_ids=snapshot_ids)
+            for row in batch:
+                yield ResourceItem.from_row(row[:-1], loader)
 
     def __len__(self):
-        return len(self.resources)
+        if self._count is None:
+            self._count = self.resources.live().count()
+        return self._count
@@ -1 +1,67 @@
 # -*- coding: utf-8 -*-
+
+# Version included in every warthog cache key; increment to orphan all
+# previously cached entries (eg after a deployment that changes models).
+CMS_CACHE_KEY_VERSION = 1
+
+# Cache key components longer than this (eg deep uri_path values) are replaced
+# by a digest so keys stay within the 250 byte limit of memcached.
+CMS_CACHE_KEY_MAX_COMPONENT = 64
+
+# Seconds between checks that the in-process uri_path index (used by
+# CmsRequestMiddleware) is still current.
+CMS_URI_INDEX_CHECK_INTERVAL = 5
+
+# Rendered pages at least this many bytes long are stored in the output cache
+# with precompressed (gzip and, if the brotli package is installed, br)
+# variants alongside the uncompressed body.
+CMS_COMPRESS_MIN_LENGTH = 200
+
+# Compression level used for precompressed variants (1-9).
+CMS_COMPRESS_LEVEL = 6
+
+# Approximate size (in characters) of the chunks sent by templates flagged as
+# streaming.
+CMS_STREAMING_CHUNK_SIZE = 64 * 1024
+
+# Maximum number of URLs in each sitemap file (the sitemap protocol allows up
+# to 50,000).
+CMS_SITEMAP_SHARD_SIZE = 50000
+
+# Search index backend; ``fts5`` (SQLite full-text index), ``table`` (search
+# terms table, any database) or None to use fts5 where available.
+CMS_SEARCH_BACKEND = None
+
+# Types of resource fields included (along with the title) in the search index.
+CMS_SEARCH_FIELD_TYPES = ('text', 'html')
+
+# Header of CMS responses listing the surrogate keys (cache tags) of the page;
+# eg Surrogate-Key (Fastly) or Cache-Tag (Cloudflare, Akamai). None to disable.
+CMS_SURROGATE_KEY_HEADER = 'Surrogate-Key'
+
+# Maximum length of the surrogate key header (CDNs and proxies limit the size of
+# headers, eg Varnish 8 KB); pages that depend on content with more keys than fit
+# are tagged with warthog.purge.OVERFLOW_KEY instead. None for no limit.
+CMS_SURROGATE_KEY_MAX_LENGTH = 4096
+
+# Dotted path of the backend (see warthog.purge.BasePurgeBackend) used to purge
+# pages from a CDN when content changes; None to disable purging.
+CMS_PURGE_BACKEND = None
+
+# Seconds purge requests are collected (and de-duplicated) before being sent.
+CMS_PURGE_DELAY = 1.0
+
+# Database aliases of read replicas used for front-end (public site) reads when
+# warthog.routers.ReadReplicaRouter is installed; empty to read from default.
+CMS_READ_DATABASES = ()
+
+# Seconds reads stay on the primary database after a write so users see their
+# own changes while replicas catch up (see ReplicaStickinessMiddleware); reads
+# of every user also go to the primary for this period after any write so
+# stale replica reads do not refill caches that have just been invalidated.
+CMS_READ_STICKY_SECONDS = 5
+
+# Seconds readers of the content change log wait at a gap in entry IDs for the
+# transaction that allocated the missing IDs to commit before reading past it
+# (see warthog.managers.ContentChangeManager).
+CMS_CHANGE_LOG_SETTLE_SECONDS = 60
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Render dependency tracking.
+
+While output is rendered the resources, sections (lists of the children of a
+resource) and templates it reads are recorded by the identity map of the
+request (see :class:`DependencyTracker`). When the output is cached a reverse
+index of dependency -> cache key is stored (see
+:class:`warthog.models.RenderDependency`) so when content changes exactly the
+cached output that used it is removed, eg changing a shared snippet only
+removes the pages that include it. The index is only written when the
+dependencies of output change; entries of output that has expired from the
+cache are removed by :func:`prune` (see the ``warthog_prune_dependencies``
+command).
+
+Dependencies use the same keys as surrogate keys (see :mod:`warthog.purge`).
+
+"""
+from __future__ import absolute_import
+import hashlib
+from contextlib import contextmanager
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.template import TemplateDoesNotExist, loader
+from django.template.base import Variable
+from django.template.loader_tags import ExtendsNode, IncludeNode
+from django.utils.encoding import force_bytes
+from . import cache, purge
+
+
+def template_name_key(name):
+    return 'template-name.%s' % name
+
+
+def type_listing_key(type_id):
+    """Dependency of output listing resources of a type; changes when any resource of the type changes."""
+    return 'type-listing.%s' % type_id
+
+# Dependency of output using templates that cannot be determined before rendering
+# (eg ``{% include template_var %}``); invalidated when any template changes.
+ANY_TEMPLATE = template_name_key('*')
+
+
+class DependencyTracker(object):
+    """
+    Records the dependencies of renders in progress; renders may be nested (eg
+    inline resources) in which case the dependencies of the inner render are
+    also dependencies of the outer render.
+    """
+    def __init__(self):
+        self.frames = []
+
+    @contextmanager
+    def track(self):
+        """Track dependencies of a render; yields the set of dependency keys."""
+        frame = set()
+        self.frames.append(frame)
+        try:
+            yield frame
+        finally:
+            self.frames.pop()
+            if self.frames:
+                self.frames[-1].update(frame)
+
+    @property
+    def active(self):
+        return bool(self.frames)
+
+    def add(self, keys):
+        if self.frames:
+            self.frames[-1].update(keys)
+
+    def add_resource(self, resource_id):
+        if self.frames:
+            self.frames[-1].add(purge.resource_key(resource_id))
+
+    def add_section(self, resource_id):
+        if self.frames:
+            self.frames[-1].add(purge.section_key(resource_id))
+
+    def add_template(self, template):
+        """Add a template along with any templates it extends or includes."""
+        if self.frames:
+            self.frames[-1].update(get_template_dependencies(template))
+
+
+def _constant_name(filter_expression):
+    """Name of a template referenced by extends/include if it is a constant."""
+    if filter_expression.filters or isinstance(filter_expression.var, Variable):
+        return None
+    return filter_expression.var
+
+
+def get_template_dependencies(template):
+    """
+    Keys of the templates a template extends or includes (recursively).
+
+    :param template: Template (as returned by the template loader).
+
+    """
+    keys = set()
+    pending = [getattr(template, 'template', template)]
+    while pending:
+        nodelist = getattr(pending.pop(), 'nodelist', None)
+        if nodelist is None:
+            continue
+        nodes = [(n, n.parent_name) for n in nodelist.get_nodes_by_type(ExtendsNode)]
+        nodes += [(n, n.template) for n in nodelist.get_nodes_by_type(IncludeNode)]
+        for node, filter_expression in nodes:
+            name = _constant_name(filter_expression)
+            if name is None:
+                keys.add(ANY_TEMPLATE)
+                continue
+            key = template_name_key(name)
+            if key in keys:
+                continue
+            keys.add(key)
+            try:
+                pending.append(loader.get_template(name).template)
+            except (TemplateDoesNotExist, AttributeError):
+                pass
+    return keys
+
+
+def _model():
+    return apps.get_model('warthog', 'RenderDependency')
+
+
+def registered_key(output_key):
+    """Cache key of the signature of the dependencies registered for output."""
+    return cache.generate_key('dependencies', output=output_key)
+
+
+def register(output_key, dependencies):
+    """
+    Register the dependencies of cached output; nothing is written if the same
+    dependencies are already registered (eg output that has been rendered
+    again after expiring).
+
+    :param output_key: cache key of the output.
+    :param dependencies: dependency keys.
+
+    """
+    dependencies = set(dependencies)
+    signature = hashlib.md5(force_bytes('\n'.join(sorted(dependencies)))).hexdigest()
+    if cache.get(registered_key(output_key)) == signature:
+        return
+
+    model = _model()
+    try:
+        with transaction.atomic(using=model.objects.db):
+            queryset = model.objects.filter(output_key=output_key)
+            existing = set(queryset.values_list('dependency', flat=True))
+            if existing - dependencies:
+                queryset.filter(dependency__in=list(existing - dependencies)).delete()
+            model.objects.bulk_create([
+                model(dependency=key, output_key=output_key) for key in dependencies - existing])
+    except IntegrityError:
+        # Registered by a concurrent render of the same output
+        return
+    cache.set(registered_key(output_key), signature, None)
+
+
+def invalidate(keys):
+    """
+    Remove cached output that depends on any of the keys.
+
+    :param keys: dependency keys.
+    :returns: number of cache entries removed.
+
+    """
+    model = _model()
+    output_keys = list(set(model.objects.filter(dependency__in=list(keys)).values_list('output_key', flat=True)))
+    for offset in range(0, len(output_keys), 500):
+        chunk = output_keys[offset:offset + 500]
+        cache.delete_many(chunk + [registered_key(key) for key in chunk])
+        model.objects.filter(output_key__in=chunk).delete()
+    return len(output_keys)
+
+
+def prune(chunk_size=500):
+    """
+    Remove the dependencies of output that is no longer cached (eg has expired
+    or been evicted).
+
+    :returns: number of output keys removed.
+
+    """
+    model = _model()
+    output_keys = model.objects.order_by('output_key').values_list('output_key', flat=True).distinct()
+    removed = 0
+    cursor = ''
+    while True:
+        chunk = list(output_keys.filter(output_key__gt=cursor)[:chunk_size])
+        if not chunk:
+            break
+        cursor = chunk[-1]
+        cached = cache.get_many(chunk)
+        orphans = [key for key in chunk if key not in cached]
+        if orphans:
+            model.objects.filter(output_key__in=orphans).delete()
+            cache.delete_many([registered_key(key) for key in orphans])
+            removed += len(orphans)
+    return removed
+
+
+def changed(keys, dependency_keys=()):
+    """
+    Content identified by keys has changed; remove dependent cached output and
+    purge it from any HTTP cache (pages carry the dependencies they were
+    rendered from as surrogate keys, or ``OVERFLOW_KEY`` if there are too many
+    to list, see :func:`warthog.render.get_surrogate_keys`).
+
+    :param keys: surrogate keys (see :mod:`warthog.purge`).
+    :param dependency_keys: additional dependency keys (eg
+        :func:`type_listing_key`).
+
+    """
+    keys = list(keys) + list(dependency_keys)
+    invalidate(keys)
+    purge.purge_keys(keys + [purge.OVERFLOW_KEY])
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from .data_structures import ResourceItem
+from .dependencies import DependencyTracker
+from .models import Resource, ResourceField, ResourceSnapshot, ResourceType
+
+
+# Marker for a lazy item that has not been resolved.
+_PENDING = object()
+
+
+class LazyResourceItem(object):
+    """
+    Proxy for a :class:`ResourceItem` that is resolved on first access.
+
+    All items pending on the same identity map are resolved together (see
+    :meth:`IdentityMap.resolve_pending`). If the resource is not found (or is
+    not live) the proxy is falsy and has no attributes.
+
+    """
+    __slots__ = ('_identity_map', '_lookup', '_item')
+
+    def __init__(self, identity_map, lookup):
+        self._identity_map = identity_map
+        self._lookup = lookup
+        self._item = _PENDING
+
+    def _resolve(self):
+        if self._item is _PENDING:
+            identity_map = self._identity_map
+            identity_map.resolve_pending()
+            resource = identity_map.resources.get(self._lookup)
+            if resource is not None and resource.is_live:
+                self._item = identity_map.get_item(resource)
+            else:
+                self._item = None
+        return self._item
+
+    def __getattr__(self, item):
+        return getattr(self._resolve(), item)
+
+    def __nonzero__(self):
+        return self._resolve() is not None
+
+
+class IdentityMap(object):
+    """
+    Memoises resource, resource type and field lookups for the duration of a
+    single request so each object is only fetched (from cache or database) once
+    no matter how many template tags refer to it.
+
+    Resources read through the map are recorded as dependencies of any render
+    in progress (see :class:`warthog.dependencies.DependencyTracker`).
+
+    :param use_snapshots: Field values of resources are read from the published
+        snapshot of a resource (if it has one); previews use the current values.
+
+    """
+    def __init__(self, use_snapshots=True):
+        self.use_snapshots = use_snapshots
+        self.resources = {}
+        self.resource_types = {}
+        self.fields = {}
+        self.snapshots = {}
+        self.pending = set()
+        self.dependencies = DependencyTracker()
+
+    @staticmethod
+    def resource_lookup(pk_or_path):
+        """Lookup (field name, value) of a resource from it's ID or path."""
+        try:
+            return 'pk', int(pk_or_path)
+        except ValueError:
+            # Assume is path
+            return 'uri_path', pk_or_path
+
+    def add_resource(self, resource):
+        """Add a resource that has been fetched by other means."""
+        self.resources[('pk', resource.pk)] = resource
+        self.resources[('uri_path', resource.uri_path)] = resource
+        return resource
+
+    def get_resource(self, pk_or_path):
+        """
+        Get a resource for front display from it's ID or path.
+
+        :return: Resource; or None if not found.
+        """
+        lookup = self.resource_lookup(pk_or_path)
+        try:
+            resource = self.resources[lookup]
+        except KeyError:
+            try:
+                resource = Resource.objects.get_front(**dict([lookup]))
+            except Resource.DoesNotExist:
+                resource = self.resources[lookup] = None
+            else:
+                self.resources[lookup] = resource
+                self.add_resource(resource)
+
+        if resource is not None:
+            self.dependencies.add_resource(resource.pk)
+        return resource
+
+    def defer_resource(self, pk_or_path):
+        """
+        Get a lazy resource item from it's ID or path; the resource is not
+        fetched until the item (or any other pending item) is accessed.
+
+        :return: LazyResourceItem
+        """
+        lookup = self.resource_lookup(pk_or_path)
+        if lookup not in self.resources:
+            self.pending.add(lookup)
+        return LazyResourceItem(self, lookup)
+
+    def resolve_pending(self):
+        """
+        Resolve all pending (deferred) resources in a single batch, along with
+        their fields.
+        """
+        pending = [lookup for lookup in self.pending if lookup not in self.resources]
+        self.pending.clear()
+        if not pending:
+            return
+
+        resources = Resource.objects.get_front_many(
+            pks=[value for name, value in pending if name == 'pk'],
+            uri_paths=[value for name, value in pending if name == 'uri_path'],
+        )
+        for resource in resources:
+            self.add_resource(resource)
+        for lookup in pending:
+            self.resources.setdefault(lookup, None)
+        self._load_fields(resources)
+
+    def _load_fields(self, resources):
+        """Load the fields (or snapshots) of resources in a single batch."""
+        resources = [r for r in resources if r.pk not in self.fields]
+        if self.use_snapshots:
+            snapshot_ids = [r.snapshot_id for r in resources if r.snapshot_id and r.snapshot_id not in self.snapshots]
+            self.snapshots.update(ResourceSnapshot.objects.get_snapshots(snapshot_ids))
+            resources = [r for r in resources if self.get_snapshot(r) is None]
+        self.fields.update(ResourceField.objects.get_bundles([r.pk for r in resources]))
+
+    def get_item(self, resource):
+        """
+        Wrap a resource for use by templates; the title and field values are
+        those of the published snapshot of the resource (if used).
+        """
+        snapshot = self.get_snapshot(resource)
+        return ResourceItem(resource, self.get_fields(resource.pk), snapshot.title if snapshot is not None else None)
+
+    def get_items(self, resources):
+        """
+        Wrap resources fetched by other means (eg search results) for use by
+        templates, their fields are loaded in a single batch.
+        """
+        for resource in resources:
+            self.add_resource(resource)
+        self._load_fields(resources)
+        return [self.get_item(resource) for resource in resources]
+
+    def get_resource_type(self, pk):
+        """Get a resource type from it's ID."""
+        try:
+            return self.resource_types[pk]
+        except KeyError:
+            resource_type = self.resource_types[pk] = ResourceType.objects.get(pk=pk)
+            return resource_type
+
+    def get_resource_type_by_code(self, code):
+        """Get a resource type from it's code."""
+        try:
+            return self.resource_types[code]
+        except KeyError:
+            resource_type = self.resource_types[code] = ResourceType.objects.get(code=code)
+            self.resource_types[resource_type.pk] = resource_type
+            return resource_type
+
+    def get_snapshot(self, resource):
+        """
+        Get the published snapshot of a resource.
+
+        :return: ResourceSnapshot; or None if snapshots are not used or the
+            resource has not been published with a snapshot.
+        """
+        if not (self.use_snapshots and resource.snapshot_id):
+            return None
+        try:
+            return self.snapshots[resource.snapshot_id]
+        except KeyError:
+            snapshot = self.snapshots[resource.snapshot_id] = ResourceSnapshot.objects.get_snapshot(
+                resource.snapshot_id)
+            return snapshot
+
+    def get_fields(self, resource_id):
+        """Get the field values (dict of code -> value) of a resource."""
+        self.dependencies.add_resource(resource_id)
+        try:
+            return self.fields[resource_id]
+        except KeyError:
+            pass
+        resource = self.resources.get(('pk', resource_id))
+        snapshot = resource and self.get_snapshot(resource)
+        if snapshot is not None:
+            fields = snapshot.fields
+        else:
+            fields = ResourceField.objects.get_bundle(resource_id)
+        self.fields[resource_id] = fields
+        return fields
+
+
+def get_identity_map(request, use_snapshots=True):
+    """
+    Get the identity map of a request, one is created on first access.
+
+    :param request: Current request object; if `None` a new (unshared) map is returned.
+    :param use_snapshots: Read published snapshots (see :class:`IdentityMap`);
+        only applies when the map is created.
+
+    """
+    if request is None:
+        return IdentityMap(use_snapshots)
+    try:
+        return request.warthog_identity_map
+    except AttributeError:
+        identity_map = request.warthog_identity_map = IdentityMap(use_snapshots)
+        return identity_map
+
+
+def get_context_identity_map(context):
+    """Get the identity map of the request a template context is being rendered for."""
+    request = getattr(context, 'request', None) or context.get('request')
+    return get_identity_map(request)
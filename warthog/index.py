@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import threading
+import time
+from . import cache
+from .conf import settings
+from .managers import URI_PATHS_GENERATION
+from .models import Resource
+
+
+def normalise_path(uri_path):
+    """Normalise a path in the same way as :meth:`ResourceManager.get_uri_path`."""
+    if len(uri_path) > 1 and uri_path.endswith('/'):
+        return uri_path[:-1]
+    return uri_path
+
+
+class UriPathIndex(object):
+    """
+    In-process index of the uri_path of every resource for front display.
+
+    The index is rebuilt when the uri_paths generation is invalidated (any
+    resource is saved or (un)published); the generation is checked at most
+    every ``CMS_URI_INDEX_CHECK_INTERVAL`` seconds so most lookups are only a
+    dict probe.
+
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths = None
+        self._token = None
+        self._checked = 0
+
+    def _current(self):
+        now = time.time()
+        if self._paths is None or now - self._checked > settings.CMS_URI_INDEX_CHECK_INTERVAL:
+            with self._lock:
+                token = cache.get_generations([URI_PATHS_GENERATION])[URI_PATHS_GENERATION]
+                if self._paths is None or token != self._token:
+                    self._paths = Resource.objects.get_uri_path_index()
+                    self._token = token
+                self._checked = now
+        return self._paths
+
+    def get(self, uri_path):
+        """
+        Get the pk of the resource at a path.
+
+        :return: primary key; or None if there is no resource at this path.
+        """
+        return self._current().get(normalise_path(uri_path))
+
+    def __contains__(self, uri_path):
+        return self.get(uri_path) is not None
+
+    def clear(self):
+        """Force the index to be rebuilt on next access."""
+        self._paths = None
+
+uri_path_index = UriPathIndex()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import json
+from itertools import islice
+from django.core.management.base import BaseCommand
+
+from ...models import Resource, ResourceField
+
+
+# Resource fields included in each exported resource (along with site, type,
+# uri_path, parent and fields); see warthog_import.
+RESOURCE_FIELDS = (
+    'title', 'slug', 'published', 'publish_date', 'unpublish_date', 'menu_title_raw', 'menu_class',
+    'hide_from_menu', 'order', 'deleted', 'edit_lock',
+)
+DATE_FIELDS = ('publish_date', 'unpublish_date')
+
+
+class Command(BaseCommand):
+    help = ("Export resources (with their fields) as JSON lines in uri_path order. Resources are read "
+            "in chunks so memory use does not grow with the number of resources.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--site', dest='site', type=int,
+            help="Only export resources of this site.")
+        parser.add_argument(
+            '--output', '-o', dest='output',
+            help="File to write to; defaults to stdout.")
+        parser.add_argument(
+            '--chunk-size', dest='chunk_size', type=int, default=1000,
+            help="Number of resources read per query. Default: 1000.")
+
+    def iter_resources(self, queryset, chunk_size):
+        """Yield resources as dicts; fields of each chunk are fetched with a single query."""
+        columns = ('site', 'type__code', 'parent__uri_path') + RESOURCE_FIELDS
+        rows = queryset.keyset_iterator(columns, chunk_size)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            fields = {row[1]: {} for row in chunk}
+            for resource_id, code, value in ResourceField.objects.filter(
+                    resource__in=list(fields)).values_list('resource', 'code', 'value'):
+                fields[resource_id][code] = value
+
+            for row in chunk:
+                uri_path, pk, site, type_code, parent = row[:5]
+                data = dict(zip(RESOURCE_FIELDS, row[5:]))
+                for name in DATE_FIELDS:
+                    if data[name] is not None:
+                        data[name] = data[name].isoformat()
+                data.update(site=site, type=type_code, uri_path=uri_path, parent=parent, fields=fields[pk])
+                yield data
+
+    def handle(self, **options):
+        queryset = Resource.objects.all()
+        if options['site']:
+            queryset = queryset.filter(site=options['site'])
+
+        output = open(options['output'], 'w') if options['output'] else self.stdout
+        try:
+            count = 0
+            for data in self.iter_resources(queryset, max(1, options['chunk_size'])):
+                output.write(json.dumps(data, sort_keys=True) + '\n')
+                count += 1
+        finally:
+            if output is not self.stdout:
+                output.close()
+        self.stderr.write("Exported %s resource(s)." % count)
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import hashlib
+import json
+import multiprocessing
+import os
+import posixpath
+import tempfile
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from django.utils.encoding import force_bytes
+
+from ...models import Resource, ResourceField, ResourceType, Template
+from ...render import get_cms_template, get_template_names, render_resource
+
+
+MANIFEST_NAME = '.warthog-manifest.json'
+
+# File extensions used for each of the Template.MIME_TYPES
+EXTENSIONS = {
+    'text/html': '.html',
+    'text/plain': '.txt',
+    'text/css': '.css',
+    'text/javascript': '.js',
+    'text/csv': '.csv',
+    'text/xml': '.xml',
+    'text/cachemanifest': '.appcache',
+    'application/xhtml+xml': '.xhtml',
+    'application/javascript': '.js',
+    'application/json': '.json',
+}
+
+
+def get_output_path(uri_path, mime_type):
+    """
+    Relative path of the file a resource is exported to.
+
+    Paths that already end with the extension of the MIME type are used as is,
+    any other path is treated as a directory containing an index file, eg
+    ``/about`` -> ``about/index.html``.
+
+    """
+    extension = EXTENSIONS.get(mime_type, '.html')
+    path = uri_path.strip('/')
+    if path and path.endswith(extension):
+        return path
+    return posixpath.join(path, 'index' + extension)
+
+
+def write_atomic(file_name, content):
+    """Write a file by writing a temporary file and renaming it into place."""
+    directory = os.path.dirname(file_name)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # Created by another worker
+            if not os.path.isdir(directory):
+                raise
+    fd, temp_name = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(temp_name, 0o644)
+        os.rename(temp_name, file_name)
+    except:
+        os.unlink(temp_name)
+        raise
+
+
+def export_resources(args):
+    """
+    Render resources and write them to the output directory (runs in a worker
+    process).
+
+    Resources are rendered as the site being exported (``SITE_ID`` is
+    overridden) so templates, resource lookups and listings all use the
+    content of that site.
+
+    :param args: tuple of (output directory, site pk, list of (resource pk, relative path)).
+    :return: list of resource pks exported.
+
+    """
+    output_dir, site_id, jobs = args
+    site = Site.objects.get(pk=site_id)
+    factory = RequestFactory()
+    exported = []
+    with override_settings(SITE_ID=site.pk):
+        for pk, relative_path in jobs:
+            resource = Resource.objects.get(pk=pk)
+            request = factory.get(resource.uri_path, HTTP_HOST=site.domain)
+            request.user = AnonymousUser()
+            content = render_resource(resource, request)
+            write_atomic(os.path.join(output_dir, relative_path), force_bytes(content))
+            exported.append(pk)
+    return exported
+
+
+class Command(BaseCommand):
+    help = ("Render every live resource of a site into a directory of static files. Only resources "
+            "that have changed since the previous export are rendered unless --full is supplied.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help="Directory to write files into.")
+        parser.add_argument(
+            '--site', dest='site', type=int,
+            help="ID of the site to export; defaults to SITE_ID.")
+        parser.add_argument(
+            '--processes', dest='processes', type=int, default=multiprocessing.cpu_count(),
+            help="Number of worker processes. Default: number of CPUs.")
+        parser.add_argument(
+            '--chunk-size', dest='chunk_size', type=int, default=50,
+            help="Number of resources rendered by a worker per batch. Default: 50.")
+        parser.add_argument(
+            '--full', action='store_true', dest='full', default=False,
+            help="Render every resource, not only those changed since the previous export.")
+
+    def read_manifest(self, output_dir):
+        try:
+            with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+                return {int(k): v for k, v in json.load(f).iteritems()}
+        except (IOError, ValueError):
+            return {}
+
+    def write_manifest(self, output_dir, manifest):
+        write_atomic(os.path.join(output_dir, MANIFEST_NAME), json.dumps(manifest, indent=1, sort_keys=True))
+
+    def prune(self, output_dir, paths):
+        """
+        Remove files written by a previous export, along with any directories
+        left empty by their removal. Only paths recorded in the manifest are
+        removed so other files in the output directory are left alone.
+
+        :param paths: relative paths of files to remove.
+        :return: number of files removed.
+        """
+        removed = 0
+        for path in paths:
+            file_name = os.path.join(output_dir, path)
+            try:
+                os.unlink(file_name)
+            except OSError:
+                continue
+            removed += 1
+            directory = os.path.dirname(file_name)
+            while directory != output_dir:
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    # Not empty
+                    break
+                directory = os.path.dirname(directory)
+        return removed
+
+    def build_jobs(self, site):
+        """
+        Determine the output path and signature of every live resource of a
+        site; the signature changes when the resource, its fields or its
+        template change.
+
+        :return: dict of resource pk -> (signature, relative path).
+        """
+        resources = list(Resource.objects.live().filter(site=site).values_list('pk', 'type', 'uri_path', 'updated'))
+        resource_types = ResourceType.objects.in_bulk(set(r[1] for r in resources))
+        template_updated = dict(Template.objects.values_list('name', 'updated'))
+
+        templates = {}
+        for resource_type in resource_types.itervalues():
+            template_names = get_template_names(resource_type, site)
+            template = get_cms_template(template_names)
+            templates[resource_type.pk] = (
+                template_names, template.mime_type if template else 'text/html')
+
+        jobs = {}
+        for offset in range(0, len(resources), 500):
+            chunk = resources[offset:offset + 500]
+            bundles = ResourceField.objects.get_bundles([r[0] for r in chunk])
+            for pk, type_id, uri_path, updated in chunk:
+                template_names, mime_type = templates[type_id]
+                signature = hashlib.md5(force_bytes(json.dumps([
+                    updated.isoformat(),
+                    sorted(bundles.get(pk, {}).items()),
+                    [(n, template_updated[n].isoformat()) for n in template_names if n in template_updated],
+                ]))).hexdigest()
+                jobs[pk] = (signature, get_output_path(uri_path, mime_type))
+        return jobs
+
+    def handle(self, output_dir, **options):
+        output_dir = os.path.abspath(output_dir)
+        try:
+            site = Site.objects.get(pk=options['site']) if options['site'] else Site.objects.get_current()
+        except Site.DoesNotExist:
+            raise CommandError("Site %s does not exist." % options['site'])
+
+        previous = self.read_manifest(output_dir)
+        current = self.build_jobs(site)
+        changed = [(pk, path) for pk, (signature, path) in current.iteritems()
+                   if options['full'] or previous.get(pk) != [signature, path]]
+
+        chunk_size = max(1, options['chunk_size'])
+        batches = [(output_dir, site.pk, changed[i:i + chunk_size]) for i in range(0, len(changed), chunk_size)]
+        if options['processes'] > 1 and len(batches) > 1:
+            # Workers must not share the parent's database connections.
+            connections.close_all()
+            pool = multiprocessing.Pool(options['processes'])
+            try:
+                results = pool.map(export_resources, batches)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = map(export_resources, batches)
+        exported = sum(len(r) for r in results)
+
+        # Remove files of resources that are no longer live (or have moved)
+        current_paths = set(path for _, path in current.itervalues())
+        removed = self.prune(output_dir, set(path for _, path in previous.itervalues()) - current_paths)
+
+        self.write_manifest(output_dir, {pk: list(job) for pk, job in current.iteritems()})
+        self.stdout.write("Exported %s of %s resource(s), removed %s file(s)." % (exported, len(current), removed))
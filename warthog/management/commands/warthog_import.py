@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import json
+import sys
+from collections import defaultdict
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ... import cache, dependencies, search
+from ...managers import (CHANGE_FIELDS, CHANGE_RESOURCE, URI_PATHS_GENERATION, bulk_chunk_size, log_changes,
+                         resource_generation, resource_purge_keys)
+from ...models import Resource, ResourceField, ResourceType
+from .warthog_export import DATE_FIELDS, RESOURCE_FIELDS
+
+
+class Command(BaseCommand):
+    help = ("Import resources exported by warthog_export. Resources are matched on site and uri_path; "
+            "existing resources are updated and their fields replaced. Rows are written in bulk, one "
+            "transaction per chunk, without model signals; the cache is invalidated after each chunk.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="File to read; - for stdin.")
+        parser.add_argument(
+            '--chunk-size', dest='chunk_size', type=int, default=500,
+            help="Number of resources written per transaction. Default: 500.")
+        parser.add_argument(
+            '--skip-search-index', action='store_true', dest='skip_search_index', default=False,
+            help="Do not update the search index (rebuild it later with warthog_search_index).")
+
+    def parse(self, line, line_number, type_ids):
+        try:
+            data = json.loads(line)
+            data['type'] = type_ids[data['type']]
+        except ValueError:
+            raise CommandError("Line %s is not valid JSON." % line_number)
+        except KeyError as ex:
+            raise CommandError("Line %s: unknown resource type or missing value %s." % (line_number, ex))
+        for name in DATE_FIELDS:
+            if data.get(name):
+                data[name] = parse_datetime(data[name])
+        return data
+
+    def get_pks(self, keys):
+        """Primary keys of resources identified by (site, uri_path)."""
+        paths = defaultdict(set)
+        for site, uri_path in keys:
+            paths[site].add(uri_path)
+        pks = {}
+        for site, uri_paths in paths.iteritems():
+            uri_paths = list(uri_paths)
+            # Keep within the query parameter limit of SQLite
+            for offset in range(0, len(uri_paths), 500):
+                queryset = Resource.objects.filter(site=site, uri_path__in=uri_paths[offset:offset + 500])
+                for uri_path, pk in queryset.values_list('uri_path', 'pk'):
+                    pks[(site, uri_path)] = pk
+        return pks
+
+    def import_chunk(self, chunk):
+        """
+        Write a chunk of resources; parents must precede children (as they do
+        in uri_path order) or already exist.
+
+        :returns: list of (pk, uri_path, parent pk, type pk) of resources written.
+        """
+        now = timezone.now()
+        keys = [(data['site'], data['uri_path']) for data in chunk]
+        parent_keys = [(data['site'], data['parent']) for data in chunk if data.get('parent')]
+
+        existing = self.get_pks(keys)
+        Resource.objects.bulk_create([
+            Resource(site_id=data['site'], type_id=data['type'], uri_path=data['uri_path'],
+                     **{name: data[name] for name in RESOURCE_FIELDS if name in data})
+            for data in chunk if (data['site'], data['uri_path']) not in existing
+        ])
+        pks = self.get_pks(keys + parent_keys)
+
+        # Django has no bulk update; each column of existing rows (and the parent of new rows) is set
+        # with a single statement choosing the value of each row (see bulk_update_values).
+        updates = {}
+        rows = []
+        for key, data in zip(keys, chunk):
+            parent_id = None
+            if data.get('parent'):
+                try:
+                    parent_id = pks[(data['site'], data['parent'])]
+                except KeyError:
+                    raise CommandError("Parent %s of %s does not exist; parents must precede their children." % (
+                        data['parent'], data['uri_path']))
+            rows.append((pks[key], key[1], parent_id, data['type']))
+            if key in existing:
+                values = {name: data[name] for name in RESOURCE_FIELDS if name in data}
+                values.update(type=data['type'], parent=parent_id, updated=now)
+                updates[existing[key]] = values
+            elif parent_id is not None:
+                updates[pks[key]] = {'parent': parent_id}
+        self.bulk_update_values(updates)
+
+        resource_ids = [pks[key] for key in keys]
+        ResourceField.objects.filter(resource__in=resource_ids).delete()
+        ResourceField.objects.bulk_create([
+            ResourceField(resource_id=pks[key], code=code, value=value)
+            for key, data in zip(keys, chunk) for code, value in data.get('fields', {}).iteritems()
+        ])
+
+        # Published resources are served from a snapshot of the imported values
+        published = [pks[key] for key, data in zip(keys, chunk) if data.get('published')]
+        Resource.objects.filter(pk__in=published).take_snapshots()
+        Resource.objects.filter(pk__in=list(set(resource_ids) - set(published))).exclude(
+            snapshot=None).update(snapshot=None)
+
+        log_changes(CHANGE_RESOURCE, resource_ids)
+        log_changes(CHANGE_FIELDS, resource_ids)
+        return rows
+
+    def bulk_update_values(self, updates):
+        """
+        Update rows with a statement per chunk of rows; chunks are sized to keep
+        within the query parameter limit of the database (each column of each
+        row takes two parameters, see :func:`warthog.managers.bulk_chunk_size`).
+
+        :param updates: dict of resource pk -> dict of field name -> value.
+        """
+        if not updates:
+            return
+        names = set(name for values in updates.itervalues() for name in values)
+        items = updates.items()
+        chunk_size = bulk_chunk_size(Resource.objects.db, len(names) * 2 + 1)
+        for offset in range(0, len(items), chunk_size):
+            chunk = items[offset:offset + chunk_size]
+            columns = {}
+            for name in names:
+                field = Resource._meta.get_field(name)
+                whens = [When(pk=pk, then=Value(values[name])) for pk, values in chunk if name in values]
+                if whens:
+                    columns[name] = Case(*whens, default=F(field.attname), output_field=field)
+            Resource.objects.filter(pk__in=[pk for pk, _ in chunk]).update(**columns)
+
+    def invalidate(self, rows):
+        """Remove cache (and CDN) entries and rendered output of imported resources."""
+        for offset in range(0, len(rows), 1000):
+            keys = []
+            purge_keys = set()
+            listing_keys = set()
+            for pk, uri_path, parent_id, type_id in rows[offset:offset + 1000]:
+                purge_keys.update(resource_purge_keys(pk, parent_id))
+                listing_keys.add(dependencies.type_listing_key(type_id))
+                keys.extend([
+                    Resource.generate_cache_key(pk=pk),
+                    Resource.generate_cache_key(uri_path=uri_path),
+                    ResourceField.objects.bundle_key(pk),
+                    cache.generation_key(resource_generation(pk)),
+                ])
+            cache.delete_many(keys)
+            dependencies.changed(purge_keys, listing_keys)
+
+    def handle(self, input, **options):
+        type_ids = dict(ResourceType.objects.values_list('code', 'pk'))
+        chunk_size = max(1, options['chunk_size'])
+
+        source = sys.stdin if input == '-' else open(input)
+        count = 0
+        try:
+            lines = (
+                self.parse(line, line_number, type_ids)
+                for line_number, line in enumerate(source, 1) if line.strip()
+            )
+            while True:
+                chunk = list(islice(lines, chunk_size))
+                if not chunk:
+                    break
+                with transaction.atomic():
+                    rows = self.import_chunk(chunk)
+                self.invalidate(rows)
+                count += len(rows)
+                if not options['skip_search_index']:
+                    for resource in Resource.objects.filter(pk__in=[row[0] for row in rows]):
+                        search.index_resource(resource)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if count:
+                cache.invalidate_generations([URI_PATHS_GENERATION])
+
+        self.stdout.write("Imported %s resource(s)." % count)
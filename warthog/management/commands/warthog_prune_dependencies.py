@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from django.core.management.base import BaseCommand
+
+from ... import dependencies
+
+
+class Command(BaseCommand):
+    help = ("Remove render dependencies of output that is no longer cached. Intended to be run from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', dest='chunk_size', type=int, default=500,
+            help="Number of output keys checked per cache request. Default: 500.")
+
+    def handle(self, **options):
+        count = dependencies.prune(max(1, options['chunk_size']))
+        self.stdout.write("Removed dependencies of %s output(s)." % count)
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import datetime
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...models import ResourceSnapshot
+
+
+class Command(BaseCommand):
+    help = ("Remove resource snapshots that are no longer published. Intended to be run from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', dest='days', type=int, default=30,
+            help="Keep snapshots taken within this number of days. Default: 30.")
+
+    def handle(self, **options):
+        before = timezone.now() - datetime.timedelta(days=options['days'])
+        count = ResourceSnapshot.objects.prune(before)
+        self.stdout.write("Removed %s snapshot(s)." % count)
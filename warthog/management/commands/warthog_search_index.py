@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from django.core.management.base import BaseCommand
+
+from ... import search
+from ...models import Resource
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search index of all resources."
+
+    def handle(self, **options):
+        count = 0
+        for resource in Resource.objects.select_related('type').iterator():
+            search.index_resource(resource)
+            count += 1
+        self.stdout.write("Indexed %s resource(s) using the %s backend." % (count, search.get_backend().name))
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ... import cache
+from ...models import Resource
+
+
+def last_run_key():
+    """Cache key of the time of the last run."""
+    return cache.generate_key('transitions', marker='last-run')
+
+
+class Command(BaseCommand):
+    help = ("Invalidate (and optionally warm) cache entries of resources that have gone live or "
+            "expired since the last run. Intended to be run from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', dest='since',
+            help="Process transitions after this ISO 8601 date time; defaults to the last run.")
+        parser.add_argument(
+            '--window', dest='window', type=int, default=60,
+            help="Minutes to look back if there is no record of a previous run. Default: 60.")
+        parser.add_argument(
+            '--warm', action='store_true', dest='warm', default=False,
+            help="Re-populate the cache for resources that are now live.")
+
+    def get_since(self, options, now):
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError("Invalid --since value: %s" % options['since'])
+            if settings.USE_TZ and timezone.is_naive(since):
+                since = timezone.make_aware(since, timezone.get_current_timezone())
+            return since
+        return cache.get(last_run_key()) or (now - datetime.timedelta(minutes=options['window']))
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        since = self.get_since(options, now)
+
+        resources = Resource.objects.transitioned(since, now)
+        count = resources.invalidate()
+
+        if options['warm']:
+            uri_paths = resources.filter(site=settings.SITE_ID).values_list('uri_path', flat=True)
+            for uri_path in uri_paths:
+                try:
+                    Resource.objects.get_uri_path(uri_path)
+                except Resource.DoesNotExist:
+                    pass
+
+        cache.set(last_run_key(), now, None)
+
+        self.stdout.write("%s resource(s) transitioned since %s." % (count, since.isoformat()))
+        next_transition = Resource.objects.next_transition()
+        if next_transition:
+            self.stdout.write("Next transition at %s." % next_transition.isoformat())
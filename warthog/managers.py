@@ -1,21 +1,136 @@
 # -*- coding: utf-8 -*-
-from django.db import models
+from __future__ import absolute_import
+import json
+from datetime import timedelta
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.db import connections, models, transaction
 from django.db.models.query import QuerySet
+from django.dispatch import Signal
 from django.conf import settings
-from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db.models import Case, Max, Min, Q, Value, When
+from django.utils import timezone
+from . import cache, dependencies, purge, routers
+from .conf import settings as cms_settings
 
 
-def generate_cache_key(instance_or_type, **vary_by):
-    """Generate a cache key for a model object."""
-    opts = instance_or_type._meta
-    return 'model:{}[{}]'.format(
-        opts.db_table,
-        ','.join(['%s=%s' % v for v in vary_by.iteritems()])
-    )
+# Keys are built by the cache layer so managers and admin actions share one scheme.
+generate_cache_key = cache.generate_obj_key
+
+# Generation invalidated when any template changes.
+TEMPLATES_GENERATION = 'templates'
+
+# Generation invalidated when any resource is added, moved or (un)published.
+URI_PATHS_GENERATION = 'uri_paths'
+
+
+def resource_generation(resource_id):
+    """Name of the generation invalidated when a resource or its fields change."""
+    return 'resource.%s' % resource_id
+
+
+def resource_purge_keys(resource_id, parent_id=None):
+    """
+    Surrogate keys (and render dependencies) to invalidate when a resource
+    changes; the resource itself and, as they may list it, its parent and
+    siblings.
+    """
+    keys = [purge.resource_key(resource_id)]
+    if parent_id is not None:
+        keys.extend([purge.resource_key(parent_id), purge.section_key(parent_id)])
+    return keys
+
+
+# Sent after resources have been published (a new snapshot of each taken)
+resources_published = Signal(providing_args=['resource_ids', 'using'])
+
+
+# Kinds of content recorded in the change log (see ContentChangeManager)
+CHANGE_RESOURCE = 'resource'
+CHANGE_FIELDS = 'fields'
+CHANGE_TEMPLATE = 'template'
+CHANGE_RESOURCE_TYPE = 'resource_type'
+
+CHANGE_SAVE = 'save'
+CHANGE_DELETE = 'delete'
+
+
+def log_changes(kind, object_ids, action=CHANGE_SAVE, using=None):
+    """
+    Append entries to the content change log (see :class:`ContentChangeManager`).
+
+    :param kind: kind of content changed, eg ``CHANGE_RESOURCE``.
+    :param object_ids: primary keys of changed objects (of the resource for
+        ``CHANGE_FIELDS``).
+    :param action: ``CHANGE_SAVE`` or ``CHANGE_DELETE``.
+    :param using: database the change was written to; the entries are written
+        to the same database so they commit with the change.
+
+    """
+    return apps.get_model('warthog', 'ContentChange').objects.db_manager(using).record(kind, object_ids, action)
+
+
+# Compile time default limit of query parameters (SQLITE_LIMIT_VARIABLE_NUMBER)
+SQLITE_MAX_QUERY_PARAMS = 999
+
+
+def bulk_chunk_size(using, params_per_row, extra_params=0, default=500):
+    """
+    Number of rows written by each statement of a bulk operation using a number
+    of query parameters for each row (eg a ``When`` of a ``Case`` per row),
+    keeping within the query parameter limit of the database (eg 999 for
+    SQLite).
+
+    :param using: alias of the database.
+    :param params_per_row: query parameters used for each row.
+    :param extra_params: query parameters used once by each statement.
+    :param default: number of rows where the database has no limit.
+
+    """
+    connection = connections[using]
+    # Only exposed by Django 2.0 and later
+    max_params = getattr(connection.features, 'max_query_params', None)
+    if max_params is None and connection.vendor == 'sqlite':
+        max_params = SQLITE_MAX_QUERY_PARAMS
+    if max_params is None:
+        return default
+    return max(1, min(default, (max_params - extra_params) // params_per_row))
+
+
+def log_deletion(instance, using=None):
+    """
+    Append an entry for a deleted object to the change log, unless it was
+    already logged by the ``delete()`` method of the model (see
+    :class:`warthog.models.AtomicSaveMixin`); used for objects deleted in bulk
+    or by cascade, which are deleted within a transaction by the collector.
+    """
+    if not getattr(instance, '_change_logged', False):
+        instance.log_change(CHANGE_DELETE, using)
+
+
+def get_cache_timeout(instance):
+    """
+    Timeout to use when caching a model object.
+
+    Objects that define ``seconds_to_transition`` (eg resources with a publish
+    or un-publish date) are only cached until that transition occurs.
+    """
+    seconds = getattr(instance, 'seconds_to_transition', None)
+    default_timeout = cache.default_timeout()
+    if seconds is None or (default_timeout is not None and seconds > default_timeout):
+        return DEFAULT_TIMEOUT
+    return seconds
 
 
 class CachingManager(models.Manager):
-    """Manager that handles caching transparently."""
+    """
+    Manager that handles caching transparently.
+
+    Models using it are expected to have a ``log_change`` method (see
+    :class:`warthog.models.AtomicSaveMixin`) used to log deletes.
+
+    """
     def get_queryset(self):
         return CachingQuerySet(self.model)
 
@@ -24,8 +139,13 @@ class CachingManager(models.Manager):
         models.signals.post_delete.connect(self._post_save, sender=model)
         setattr(model, 'generate_cache_key', classmethod(generate_cache_key))
         setattr(model, 'cache_key', property(lambda self: self.generate_cache_key(pk=self.pk)))
+        setattr(model, 'cache_keys', property(lambda self: self.__class__._default_manager.get_cache_keys(self)))
         return super(CachingManager, self).contribute_to_class(model, name)
 
+    def get_cache_keys(self, instance):
+        """All cache keys that reference a model object (used for invalidation)."""
+        return [instance.cache_key]
+
     def _invalidate_cache(self, instance):
         """
         Explicitly set a None value instead of just deleting so we don't have any race
@@ -36,9 +156,11 @@ class CachingManager(models.Manager):
         Five second should be more than enough time to prevent this from happening for
         a web app.
         """
-        cache.set(instance.cache_key, None, 5)
+        cache.set_many({key: None for key in instance.cache_keys}, 5)
 
-    def _post_save(self, instance, **kwargs):
+    def _post_save(self, instance, signal=None, using=None, **kwargs):
+        if signal is models.signals.post_delete:
+            log_deletion(instance, using)
         self._invalidate_cache(instance)
 
     def _post_delete(self, instance, **kwargs):
@@ -51,7 +173,7 @@ class CachingQuerySet(QuerySet):
         while True:
             obj = super_iterator.next()
             # Use cache.add instead of cache.set to prevent race conditions (see CachingManager)
-            cache.add(obj.cache_key, obj)
+            cache.add(obj.cache_key, obj, get_cache_timeout(obj))
             yield obj
 
     def get(self, *args, **kwargs):
@@ -79,18 +201,611 @@ class CachingQuerySet(QuerySet):
         return super(CachingQuerySet, self).get(*args, **kwargs)
 
 
+class ResourceQuerySet(CachingQuerySet):
+    """Query set for resources, provides bulk publishing operations."""
+    def _bulk_update(self, **values):
+        """
+        Update all resources in this query set with a single statement and
+        invalidate every cache entry (pk and uri_path keys) that references them.
+
+        :return: number of rows updated.
+        """
+        values.setdefault('updated', timezone.now())
+        with transaction.atomic(using=self.db):
+            rows = list(self.values_list('pk', 'uri_path', 'parent', 'type'))
+            if not rows:
+                return 0
+            updated = self.model._default_manager.using(self.db).filter(
+                pk__in=[row[0] for row in rows]).update(**values)
+            log_changes(CHANGE_RESOURCE, [row[0] for row in rows], using=self.db)
+
+        self._invalidate_rows(rows)
+        return updated
+
+    def _invalidate_rows(self, rows):
+        """
+        Invalidate cache entries (and rendered output) of resources and purge
+        them from any HTTP cache.
+
+        :param rows: list of (pk, uri_path, parent pk, type pk) of resources.
+        """
+        field_manager = self.model._meta.get_field('fields').related_model.objects
+        cache_keys = []
+        purge_keys = set()
+        listing_keys = set()
+        for pk, uri_path, parent_id, type_id in rows:
+            cache_keys.append(generate_cache_key(self.model, pk=pk))
+            cache_keys.append(generate_cache_key(self.model, uri_path=uri_path))
+            cache_keys.append(field_manager.bundle_key(pk))
+            cache_keys.append(cache.generation_key(resource_generation(pk)))
+            purge_keys.update(resource_purge_keys(pk, parent_id))
+            listing_keys.add(dependencies.type_listing_key(type_id))
+        cache_keys.append(cache.generation_key(URI_PATHS_GENERATION))
+        cache.delete_many(cache_keys)
+        dependencies.changed(purge_keys, listing_keys)
+
+    def invalidate(self):
+        """
+        Invalidate the cache entries (pk and uri_path keys and field bundles) of
+        all resources in this query set, along with output rendered from them
+        and any HTTP cache entries (see :mod:`warthog.dependencies`).
+
+        :return: number of resources invalidated.
+        """
+        rows = list(self.values_list('pk', 'uri_path', 'parent', 'type'))
+        self._invalidate_rows(rows)
+        return len(rows)
+
+    def take_snapshots(self, **values):
+        """
+        Take a snapshot of each resource in this query set and point the
+        resource at it; the snapshot pointer (along with any values) of every
+        resource is set with a single update per chunk (chunks are sized to
+        keep within the query parameter limit of the database, see
+        :func:`bulk_chunk_size`). Caches are not invalidated (see
+        :meth:`publish`).
+
+        :param values: other values to update.
+        :return: list of (pk, uri_path, parent pk, type pk) of resources.
+        """
+        snapshot_manager = self.model._meta.get_field('snapshot').rel.to.objects
+        manager = self.model._default_manager.using(self.db)
+        rows = list(self.values_list('pk', 'uri_path', 'parent', 'type'))
+        # Each row takes the pk and snapshot pk of a When and a pk of pk__in
+        chunk_size = bulk_chunk_size(self.db, 3, len(values) + 1)
+        for offset in range(0, len(rows), chunk_size):
+            snapshots = snapshot_manager.create_for([row[0] for row in rows[offset:offset + chunk_size]])
+            manager.filter(pk__in=list(snapshots)).update(
+                snapshot=Case(*[When(pk=pk, then=Value(snapshot_id)) for pk, snapshot_id in snapshots.iteritems()],
+                              output_field=self.model._meta.get_field('snapshot')),
+                **values)
+        return rows
+
+    def _publish(self, **values):
+        """
+        Take a snapshot of each resource in this query set and make it live;
+        the snapshot pointer (and publish flags) of each resource are swapped
+        with a single update.
+
+        :return: number of resources published.
+        """
+        values.setdefault('updated', timezone.now())
+        with transaction.atomic(using=self.db):
+            rows = self.take_snapshots(**values)
+            if not rows:
+                return 0
+            log_changes(CHANGE_RESOURCE, [row[0] for row in rows], using=self.db)
+
+        self._invalidate_rows(rows)
+        resources_published.send(sender=self.model, resource_ids=[row[0] for row in rows], using=self.db)
+        return len(rows)
+
+    def publish(self):
+        """Publish (a snapshot of) all resources in this query set."""
+        return self._publish(published=True)
+
+    def unpublish(self):
+        """Un-publish all resources in this query set."""
+        return self._bulk_update(published=False, snapshot=None)
+
+    def schedule(self, publish_date=None, unpublish_date=None):
+        """
+        Publish all resources in this query set within a date range.
+
+        :param publish_date: date the resources go live; `None` for immediately.
+        :param unpublish_date: date the resources expire; `None` for never.
+
+        """
+        if (publish_date is not None) and (unpublish_date is not None) and (publish_date > unpublish_date):
+            raise ValidationError('Publish date must be prior to the Un-publish date.')
+        return self._publish(published=True, publish_date=publish_date, unpublish_date=unpublish_date)
+
+    def live(self):
+        """
+        Resources that are live now (published, not deleted and within their
+        publish window); the query equivalent of ``Resource.is_live``.
+        """
+        now = timezone.now()
+        return self.filter(published=True, deleted=False).filter(
+            Q(publish_date__isnull=True) | Q(publish_date__lte=now),
+            Q(unpublish_date__isnull=True) | Q(unpublish_date__gte=now),
+        )
+
+    def after_key(self, after):
+        """
+        Resources that follow a (uri_path, pk) key; see :meth:`keyset_iterator`.
+
+        :param after: (uri_path, pk) key; None for no restriction.
+
+        """
+        if after is None:
+            return self
+        uri_path, pk = after
+        return self.filter(Q(uri_path__gt=uri_path) | Q(uri_path=uri_path, pk__gt=pk))
+
+    def keyset_iterator(self, fields=(), chunk_size=1000, after=None):
+        """
+        Iterate over resources ordered by (uri_path, pk) fetching chunks using
+        keyset pagination; unlike offsets the cost of fetching a chunk does not
+        grow with the position in the set.
+
+        Values rather than model objects are returned, so iterating over a large
+        set does not store every resource in cache.
+
+        :param fields: names of additional fields to fetch.
+        :param chunk_size: number of resources fetched per query.
+        :param after: (uri_path, pk) key to start after.
+        :return: iterator of (uri_path, pk, *fields) tuples.
+
+        """
+        queryset = self.order_by('uri_path', 'pk')
+        while True:
+            chunk = list(queryset.after_key(after).values_list('uri_path', 'pk', *fields)[:chunk_size])
+            for row in chunk:
+                yield row
+            if len(chunk) < chunk_size:
+                break
+            after = chunk[-1][:2]
+
+    def transitioned(self, since, until=None):
+        """
+        Published resources that have gone live or expired in a time window.
+
+        :param since: start of the window (exclusive).
+        :param until: end of the window (inclusive); defaults to now.
+
+        """
+        until = until or timezone.now()
+        return self.filter(published=True, deleted=False).filter(
+            Q(publish_date__gt=since, publish_date__lte=until) |
+            Q(unpublish_date__gt=since, unpublish_date__lte=until)
+        )
+
+    def next_transition(self):
+        """
+        Date of the next publish/un-publish transition of any published resource
+        in this query set; `None` if nothing is scheduled.
+        """
+        now = timezone.now()
+        queryset = self.filter(published=True, deleted=False)
+        dates = [
+            queryset.filter(publish_date__gt=now).aggregate(date=Min('publish_date'))['date'],
+            queryset.filter(unpublish_date__gt=now).aggregate(date=Min('unpublish_date'))['date'],
+        ]
+        dates = [d for d in dates if d is not None]
+        return min(dates) if dates else None
+
+
+class ResourceTypeFieldManager(CachingManager):
+    """
+    Manager for resource type fields.
+
+    Any change to a field marks the owning resource type as updated so schema
+    derived from it (eg compiled admin forms) can be rebuilt.
+    """
+    def _post_save(self, instance, **kwargs):
+        super(ResourceTypeFieldManager, self)._post_save(instance, **kwargs)
+        resource_type = instance._meta.get_field('resource_type').rel.to
+        resource_type._default_manager.filter(pk=instance.resource_type_id).update(updated=timezone.now())
+        cache.set(generate_cache_key(resource_type, pk=instance.resource_type_id), None, 5)
+        cache.delete(self.field_types_key(instance.resource_type_id))
+
+    def field_types_key(self, resource_type_id):
+        return generate_cache_key(self.model, field_types=resource_type_id)
+
+    def get_field_types(self, resource_type_id):
+        """
+        Get the field types of a resource type.
+
+        :param resource_type_id: primary key of the resource type.
+        :return: dict of field code -> field type code (see :mod:`warthog.resource_types`).
+
+        """
+        cache_key = self.field_types_key(resource_type_id)
+        field_types = cache.get(cache_key)
+        if field_types is None:
+            field_types = dict(self.filter(resource_type=resource_type_id).values_list('code', 'field_type'))
+            cache.set(cache_key, field_types)
+        return field_types
+
+
+class ResourceFieldManager(models.Manager):
+    """
+    Manager for resource fields, maintains a cached bundle of field values for
+    each resource.
+
+    .. note::
+        Only ``post_save`` is observed so deletes of field rows remain a single
+        statement, code deleting fields must call :meth:`invalidate_bundle`.
+
+    """
+    def contribute_to_class(self, model, name):
+        models.signals.post_save.connect(self._post_save, sender=model)
+        return super(ResourceFieldManager, self).contribute_to_class(model, name)
+
+    def _post_save(self, instance, **kwargs):
+        self.invalidate_bundle(instance.resource_id)
+
+    def bundle_key(self, resource_id):
+        return generate_cache_key(self.model, resource=resource_id)
+
+    def get_bundle(self, resource_id):
+        """
+        Get the field values of a resource.
+
+        :param resource_id: primary key of the resource.
+        :return: dict of code -> database value.
+
+        """
+        cache_key = self.bundle_key(resource_id)
+        bundle = cache.get(cache_key)
+        if bundle is None:
+            bundle = dict(self.filter(resource=resource_id).values_list('code', 'value'))
+            # Use cache.add instead of cache.set to prevent race conditions (see CachingManager)
+            cache.add(cache_key, bundle)
+        return bundle
+
+    def get_bundles(self, resource_ids):
+        """
+        Get the field values of multiple resources with a single cache request
+        and (for any misses) a single query.
+
+        :param resource_ids: primary keys of resources.
+        :return: dict of resource pk -> dict of code -> database value.
+
+        """
+        keys = {self.bundle_key(resource_id): resource_id for resource_id in resource_ids}
+        bundles = {keys[key]: bundle for key, bundle in cache.get_many(keys).iteritems()}
+
+        missing = [resource_id for resource_id in keys.itervalues() if resource_id not in bundles]
+        if missing:
+            fetched = {resource_id: {} for resource_id in missing}
+            for resource_id, code, value in self.filter(resource__in=missing).values_list('resource', 'code', 'value'):
+                fetched[resource_id][code] = value
+            for resource_id, bundle in fetched.iteritems():
+                # Use cache.add instead of cache.set to prevent race conditions (see CachingManager)
+                cache.add(self.bundle_key(resource_id), bundle)
+            bundles.update(fetched)
+        return bundles
+
+    def invalidate_bundle(self, resource_id, resource=None):
+        """
+        Invalidate the cached field values of a resource (see CachingManager
+        for why None is set rather than deleting the key); output listing the
+        resource (which depends on the listing rather than each resource) is
+        also removed.
+
+        :param resource_id: primary key of the resource.
+        :param resource: The resource if already loaded, otherwise the listings
+            it appears in are fetched.
+
+        """
+        cache.set(self.bundle_key(resource_id), None, 5)
+        cache.invalidate_generations([resource_generation(resource_id)])
+        if resource is not None:
+            listing = (resource.parent_id, resource.type_id)
+        else:
+            resource_model = self.model._meta.get_field('resource').rel.to
+            listing = resource_model._default_manager.filter(pk=resource_id).values_list('parent', 'type').first()
+        if listing is None:
+            dependencies.changed([purge.resource_key(resource_id)])
+        else:
+            dependencies.changed(
+                resource_purge_keys(resource_id, listing[0]), [dependencies.type_listing_key(listing[1])])
+
+
+class ResourceSnapshotManager(models.Manager):
+    """
+    Manager for resource snapshots.
+
+    Snapshots are never changed once created so they are cached without a
+    timeout and never need to be invalidated.
+
+    """
+    def snapshot_key(self, pk):
+        return generate_cache_key(self.model, pk=pk)
+
+    def get_snapshot(self, pk):
+        """Get a snapshot from it's ID."""
+        cache_key = self.snapshot_key(pk)
+        snapshot = cache.get(cache_key)
+        if snapshot is None:
+            snapshot = self.get(pk=pk)
+            cache.set(cache_key, snapshot, None)
+        return snapshot
+
+    def get_snapshots(self, pks):
+        """
+        Get multiple snapshots with a single cache request and (for any misses)
+        a single query.
+
+        :return: dict of pk -> snapshot.
+        """
+        keys = {self.snapshot_key(pk): pk for pk in pks}
+        snapshots = {keys[key]: snapshot for key, snapshot in cache.get_many(keys).iteritems()}
+        missing = [pk for pk in keys.itervalues() if pk not in snapshots]
+        if missing:
+            fetched = self.in_bulk(missing)
+            cache.set_many({self.snapshot_key(pk): snapshot for pk, snapshot in fetched.iteritems()}, None)
+            snapshots.update(fetched)
+        return snapshots
+
+    def create_for(self, resource_ids):
+        """
+        Take snapshots of the current title, fields and template of resources;
+        snapshots are created with a single bulk insert per chunk.
+
+        :param resource_ids: primary keys of resources.
+        :return: dict of resource pk -> snapshot pk.
+        """
+        resource_model = self.model._meta.get_field('resource').rel.to
+        field_model = resource_model._meta.get_field('fields').related_model
+        snapshots = {}
+        for offset in range(0, len(resource_ids), 500):
+            chunk = resource_ids[offset:offset + 500]
+            fields = {pk: {} for pk in chunk}
+            for resource_id, code, value in field_model.objects.filter(
+                    resource__in=chunk).values_list('resource', 'code', 'value'):
+                fields[resource_id][code] = value
+            self.bulk_create([
+                self.model(resource_id=pk, title=title, template=template, payload=json.dumps(fields[pk]))
+                for pk, title, template in resource_model._default_manager.filter(pk__in=chunk).values_list(
+                    'pk', 'title', 'type__default_template')
+            ])
+            # Bulk inserts do not return primary keys; the snapshot just taken is the latest of each resource
+            snapshots.update(self.filter(resource__in=chunk).values_list('resource').annotate(Max('pk')))
+        return snapshots
+
+    def prune(self, before):
+        """
+        Remove snapshots taken before a date that are no longer published (ie
+        not referenced by any resource).
+
+        :return: number of snapshots removed.
+        """
+        resource_model = self.model._meta.get_field('resource').rel.to
+        published = resource_model._default_manager.filter(snapshot__isnull=False).values('snapshot')
+        pks = list(self.filter(created__lt=before).exclude(pk__in=published).values_list('pk', flat=True))
+        for offset in range(0, len(pks), 500):
+            chunk = pks[offset:offset + 500]
+            self.filter(pk__in=chunk).delete()
+            cache.delete_many([self.snapshot_key(pk) for pk in chunk])
+        return len(pks)
+
+
+class ContentChangeManager(models.Manager):
+    """
+    Manager for the content change log.
+
+    Saves and deletes of resources, resource fields, templates and resource
+    types (including bulk operations such as publishing) append an entry to
+    the log in the same transaction as the change. Workers outside of the web
+    process (eg cache warmers, exporters or indexers) process changes
+    incrementally by reading entries after a cursor (the ID of the last entry
+    processed)::
+
+        cursor = load_cursor()
+        for change in ContentChange.objects.iter_changes(cursor):
+            process(change)
+            cursor = change.pk
+        save_cursor(cursor)
+
+    .. note::
+        IDs are allocated when an entry is written but become visible when the
+        transaction commits, so an entry can appear after entries with a
+        higher ID. Reads stop at a gap in IDs (the cursor is held) until the
+        missing entries appear or the entry after the gap is older than
+        ``CMS_CHANGE_LOG_SETTLE_SECONDS`` (the missing IDs were rolled back or
+        pruned). Every entry is read, in ID order, provided the transaction
+        writing it commits within that period of writing it; entries of
+        transactions that commit later are skipped.
+
+    """
+    def record(self, kind, object_ids, action=CHANGE_SAVE):
+        """Append entries for changed objects, see :func:`log_changes`."""
+        now = timezone.now()
+        return self.bulk_create([
+            self.model(kind=kind, object_id=object_id, action=action, created=now) for object_id in object_ids
+        ])
+
+    def read(self, cursor=0, limit=1000, settle=None):
+        """
+        Read entries after a cursor.
+
+        :param cursor: ID of the last entry processed; 0 to read from the start.
+        :param limit: Maximum number of entries to read.
+        :param settle: Seconds a gap in IDs is waited on before entries after
+            it are read; defaults to ``CMS_CHANGE_LOG_SETTLE_SECONDS``.
+        :return: list of entries in order of ID; entries after a gap that is
+            still being waited on are not included.
+
+        """
+        if settle is None:
+            settle = cms_settings.CMS_CHANGE_LOG_SETTLE_SECONDS
+        entries = list(self.filter(pk__gt=cursor).order_by('pk')[:limit])
+        if settle:
+            settled = timezone.now() - timedelta(seconds=settle)
+            expected = cursor + 1
+            for idx, entry in enumerate(entries):
+                if entry.pk != expected and entry.created > settled:
+                    # Entries with the missing IDs may not have been committed yet
+                    return entries[:idx]
+                expected = entry.pk + 1
+        return entries
+
+    def iter_changes(self, cursor=0, chunk_size=1000, settle=None):
+        """
+        Iterate over all entries after a cursor, reading a chunk at a time.
+
+        :param cursor: ID of the last entry processed.
+        :param chunk_size: number of entries read per query.
+        :param settle: see :meth:`read`.
+
+        """
+        while True:
+            chunk = self.read(cursor, chunk_size, settle)
+            for change in chunk:
+                yield change
+            if len(chunk) < chunk_size:
+                break
+            cursor = chunk[-1].pk
+
+    def latest_cursor(self):
+        """Cursor of the most recent entry; used to start consuming only new changes."""
+        return self.aggregate(cursor=models.Max('pk'))['cursor'] or 0
+
+    def prune(self, before):
+        """
+        Remove entries older than a date.
+
+        :return: number of entries removed.
+        """
+        queryset = self.filter(created__lt=before)
+        count = queryset.count()
+        queryset.delete()
+        return count
+
+
+class TemplateManager(models.Manager):
+    """Manager for templates, changes to a template invalidate output rendered from it."""
+    def contribute_to_class(self, model, name):
+        models.signals.post_save.connect(self._post_save, sender=model)
+        models.signals.post_delete.connect(self._post_save, sender=model)
+        return super(TemplateManager, self).contribute_to_class(model, name)
+
+    def _post_save(self, instance, signal=None, using=None, **kwargs):
+        if signal is models.signals.post_delete:
+            log_deletion(instance, using)
+        cache.invalidate_generations([TEMPLATES_GENERATION])
+        # Templates are referenced by name (eg {% include %}); output including a template
+        # chosen at render time depends on every template.
+        name_keys = [dependencies.template_name_key(instance.name), dependencies.ANY_TEMPLATE]
+        dependencies.changed([purge.template_key(instance.pk)], name_keys)
+
+
 class ResourceTypeManager(CachingManager):
     """Manager for resource type objects"""
+
     def get_queryset(self):
         return super(ResourceTypeManager, self).get_queryset()
 
+    def contribute_to_class(self, model, name):
+        models.signals.class_prepared.connect(self._class_prepared, sender=model)
+        return super(ResourceTypeManager, self).contribute_to_class(model, name)
+
+    def _class_prepared(self, sender, **kwargs):
+        # Through model is only available once the class is prepared.
+        models.signals.m2m_changed.connect(self._m2m_changed, sender=sender.child_types.through)
+
+    def _invalidate_cache(self, instance):
+        super(ResourceTypeManager, self)._invalidate_cache(instance)
+        cache.delete(self.child_type_map_key)
+        dependencies.changed([purge.resource_type_key(instance.pk)])
+
+    def _m2m_changed(self, **kwargs):
+        cache.delete(self.child_type_map_key)
+
+    @property
+    def child_type_map_key(self):
+        return generate_cache_key(self.model, map='child_types')
+
+    def child_type_map(self):
+        """
+        Map of the child types of every resource type.
+
+        :return: dict of resource type pk -> list of (pk, name) tuples of child types.
+
+        """
+        child_types = cache.get(self.child_type_map_key)
+        if child_types is None:
+            child_types = {}
+            through = self.model.child_types.through
+            rows = through.objects.order_by('to_resourcetype__name').values_list(
+                'from_resourcetype', 'to_resourcetype', 'to_resourcetype__name')
+            for from_pk, to_pk, to_name in rows:
+                child_types.setdefault(from_pk, []).append((to_pk, to_name))
+            cache.set(self.child_type_map_key, child_types)
+        return child_types
+
 
 class ResourceManager(CachingManager):
     """Manager for dealing with resource models."""
     use_for_related_fields = True
 
     def get_queryset(self):
-        return super(ResourceManager, self).get_queryset()
+        return ResourceQuerySet(self.model, using=self._db)
+
+    def _invalidate_cache(self, instance):
+        super(ResourceManager, self)._invalidate_cache(instance)
+        cache.invalidate_generations([resource_generation(instance.pk), URI_PATHS_GENERATION])
+        keys = resource_purge_keys(instance.pk, instance.parent_id)
+        listing_keys = [dependencies.type_listing_key(instance.type_id)]
+        # Listings are not dependent on the resources they list, a resource that
+        # has moved must also be removed from the listings it was loaded from.
+        parent_id, type_id = getattr(instance, '_loaded_listings', (None, None))
+        if parent_id is not None and parent_id != instance.parent_id:
+            keys.extend(resource_purge_keys(instance.pk, parent_id)[1:])
+        if type_id is not None and type_id != instance.type_id:
+            listing_keys.append(dependencies.type_listing_key(type_id))
+        dependencies.changed(keys, listing_keys)
+
+    def get_cache_keys(self, instance):
+        """Resources are also referenced by uri_path and have a cached field bundle."""
+        keys = super(ResourceManager, self).get_cache_keys(instance)
+        keys.append(generate_cache_key(self.model, uri_path=instance.uri_path))
+        keys.append(instance.fields.bundle_key(instance.pk))
+        return keys
+
+    def publish(self):
+        """Publish all resources, see :meth:`ResourceQuerySet.publish`."""
+        return self.get_queryset().publish()
+
+    def unpublish(self):
+        """Un-publish all resources, see :meth:`ResourceQuerySet.unpublish`."""
+        return self.get_queryset().unpublish()
+
+    def schedule(self, publish_date=None, unpublish_date=None):
+        """Schedule all resources, see :meth:`ResourceQuerySet.schedule`."""
+        return self.get_queryset().schedule(publish_date, unpublish_date)
+
+    def live(self):
+        """See :meth:`ResourceQuerySet.live`."""
+        return self.get_queryset().live()
+
+    def transitioned(self, since, until=None):
+        """See :meth:`ResourceQuerySet.transitioned`."""
+        return self.get_queryset().transitioned(since, until)
+
+    def next_transition(self):
+        """See :meth:`ResourceQuerySet.next_transition`."""
+        return self.get_queryset().next_transition()
+
+    def front_queryset(self):
+        """
+        Query set for front display; reads from a replica database where
+        configured (see :mod:`warthog.routers`).
+        """
+        return self.get_queryset().using(routers.get_read_database(front=True))
 
     def get_front(self, **filters):
         """
@@ -102,7 +817,36 @@ class ResourceManager(CachingManager):
         :return: Resource
         """
         filters.update(published=True, deleted=False, site=settings.SITE_ID)
-        return self.get(**filters)
+        return self.front_queryset().get(**filters)
+
+    def get_front_many(self, pks=(), uri_paths=()):
+        """
+        Get multiple items for front display by ID and/or path.
+
+        Resources requested by ID are fetched from cache where possible, all
+        remaining resources are fetched with a single query.
+
+        :param pks: primary keys of resources.
+        :param uri_paths: paths of resources.
+        :return: list of Resources (resources that are not found are omitted).
+        """
+        keys = [generate_cache_key(self.model, pk=pk) for pk in pks]
+        resources = [
+            r for r in cache.get_many(keys).itervalues()
+            # Apply the same default filters as filter_front
+            if r.published and not r.deleted and r.site_id == settings.SITE_ID
+        ]
+        found = set(r.pk for r in resources)
+        missing = [pk for pk in pks if pk not in found]
+
+        query = None
+        if missing:
+            query = Q(pk__in=missing)
+        if uri_paths:
+            query = (query | Q(uri_path__in=uri_paths)) if query else Q(uri_path__in=uri_paths)
+        if query:
+            resources.extend(self.filter_front().filter(query))
+        return resources
 
     def filter_front(self, **filters):
         """
@@ -114,7 +858,13 @@ class ResourceManager(CachingManager):
         :return: Queryset
         """
         filters.update(published=True, deleted=False, site=settings.SITE_ID)
-        return self.filter(**filters)
+        return self.front_queryset().filter(**filters)
+
+    def get_uri_path_index(self):
+        """
+        Map of uri_path -> pk of all resources for front display.
+        """
+        return dict(self.filter_front().values_list('uri_path', 'pk'))
 
     def get_uri_path(self, uri_path):
         """
@@ -128,14 +878,9 @@ class ResourceManager(CachingManager):
             uri_path = uri_path[:-1]
 
         # Try to get from cache
-        ref_key = generate_cache_key(self.model, uri_path=uri_path)
-        cache_key = cache.get(ref_key) if ref_key else None
-        resource = cache.get(cache_key) if cache_key else None
+        resource = cache.get_model_by_attribute(self.model, 'uri_path', uri_path)
 
         if not resource:
             resource = self.get_front(uri_path__exact=uri_path)
-
-            cache_key = generate_cache_key(self.model, pk=resource.pk)
-            cache.set(cache_key, resource)
-            cache.set(ref_key, cache_key)
+            cache.set_model_by_attribute(resource, 'uri_path', timeout=get_cache_timeout(resource))
         return resource
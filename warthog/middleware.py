@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 from django.http import Http404
+from . import routers
+from .conf import settings
+from .index import uri_path_index
 from .views import Cms
 
 
@@ -27,3 +30,62 @@ class CmsMiddleware(object):
             except Http404:
                 pass
         return response
+
+
+class CmsRequestMiddleware(object):
+    """
+    Middleware that serves CMS resources before URL resolution.
+
+    Paths are checked against an in-process index of resource paths (see
+    :class:`warthog.index.UriPathIndex`) so CMS pages are served without Django
+    first building a 404 response, while other URLs only pay for a dict probe.
+
+    .. note::
+        Must be placed after ``AuthenticationMiddleware`` as the user is required
+        to determine if a resource can be served.
+
+    """
+    def __init__(self):
+        self.view = Cms.as_view()
+
+    def process_request(self, request):
+        """
+        Handle request event.
+
+        :param request: object.
+
+        """
+        if request.path_info in uri_path_index:
+            try:
+                return self.view(request)
+            except Http404:
+                pass
+
+
+class ReplicaStickinessMiddleware(object):
+    """
+    Middleware that keeps the reads of a user on the primary database for
+    ``CMS_READ_STICKY_SECONDS`` after they make a change (see
+    :mod:`warthog.routers`), so eg an editor sees a page they have just
+    published although replicas have not caught up.
+
+    A write made while handling a request sets a cookie; requests carrying the
+    cookie read from the primary database.
+
+    .. note::
+        Should be placed first so the state of the request thread is reset
+        before any other middleware reads from the database.
+
+    """
+    cookie_name = 'warthog_primary'
+
+    def process_request(self, request):
+        routers.reset()
+        if self.cookie_name in request.COOKIES:
+            routers.pin_to_primary()
+
+    def process_response(self, request, response):
+        if routers.has_written():
+            response.set_cookie(self.cookie_name, '1', max_age=settings.CMS_READ_STICKY_SECONDS, httponly=True)
+        # State is kept until the next request so streaming responses are read consistently
+        return response
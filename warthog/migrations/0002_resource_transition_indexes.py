@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warthog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resource',
+            name='publish_date',
+            field=models.DateTimeField(help_text='Optional; if date is set this resource will go live once this date is reached.', null=True, verbose_name='go live date', db_index=True, blank=True),
+        ),
+        migrations.AlterField(
+            model_name='resource',
+            name='unpublish_date',
+            field=models.DateTimeField(help_text='Optional; if date is set this resource will expire once this date has passed.', null=True, verbose_name='expiry date', db_index=True, blank=True),
+        ),
+    ]
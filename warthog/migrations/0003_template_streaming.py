@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warthog', '0002_resource_transition_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='template',
+            name='streaming',
+            field=models.BooleanField(default=False, help_text='Send output as it is rendered; for large outputs eg feeds or exports.', verbose_name='streaming'),
+        ),
+    ]
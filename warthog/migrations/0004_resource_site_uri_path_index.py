@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warthog', '0003_template_streaming'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='resource',
+            index_together=set([('site', 'uri_path')]),
+        ),
+    ]
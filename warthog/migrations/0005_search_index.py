@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models, OperationalError
+
+
+def create_fts_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    try:
+        # Not every SQLite build includes FTS5; the search terms table is used instead.
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE VIRTUAL TABLE warthog_search USING fts5(title, body)')
+    except OperationalError:
+        pass
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS warthog_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warthog', '0004_resource_site_uri_path_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('term', models.CharField(max_length=50)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('resource', models.ForeignKey(related_name='search_terms', to='warthog.Resource')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchterm',
+            unique_together=set([('term', 'resource')]),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
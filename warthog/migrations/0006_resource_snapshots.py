@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warthog', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceSnapshot',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('title', models.CharField(max_length=100, verbose_name='title')),
+                ('template', models.CharField(max_length=100, verbose_name='template')),
+                ('payload', models.TextField(help_text='Field values (JSON).', verbose_name='payload')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='creation date')),
+                ('resource', models.ForeignKey(related_name='snapshots', to='warthog.Resource')),
+            ],
+            options={
+                'verbose_name': 'resource snapshot',
+                'verbose_name_plural': 'resource snapshots',
+            },
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='snapshot',
+            field=models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.SET_NULL, blank=True, editable=False, to='warthog.ResourceSnapshot', null=True),
+        ),
+    ]
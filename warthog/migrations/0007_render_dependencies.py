@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warthog', '0006_resource_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderDependency',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('dependency', models.CharField(max_length=150)),
+                ('output_key', models.CharField(max_length=250, db_index=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='renderdependency',
+            unique_together=set([('dependency', 'output_key')]),
+        ),
+    ]
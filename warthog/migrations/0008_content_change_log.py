@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warthog', '0007_render_dependencies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentChange',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('kind', models.CharField(max_length=20, verbose_name='kind', choices=[('resource', 'Resource'), ('fields', 'Resource fields'), ('template', 'Template'), ('resource_type', 'Resource type')])),
+                ('object_id', models.PositiveIntegerField(help_text='ID of the resource for field changes.', verbose_name='object ID')),
+                ('action', models.CharField(default='save', max_length=10, verbose_name='action', choices=[('save', 'Saved'), ('delete', 'Deleted')])),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, verbose_name='creation date')),
+            ],
+            options={
+                'verbose_name': 'content change',
+                'verbose_name_plural': 'content changes',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warthog', '0008_content_change_log'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='template',
+            name='cacheable',
+            field=models.BooleanField(default=True, help_text='Output is cached by resource; clear for templates that depend on the request (eg query string parameters, headers or the current user).', verbose_name='cachable'),
+        ),
+    ]
@@ -1,20 +1,60 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
+import json
+import math
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
 from django.contrib.sites.models import Site
-from django.db import models
+from django.db import models, router, transaction
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.translation import ugettext_lazy as t
 from . import resource_types
-from .managers import CachingManager, ResourceManager, ResourceTypeManager
+from .managers import (ContentChangeManager, ResourceManager, ResourceTypeManager, ResourceTypeFieldManager,
+                       ResourceFieldManager, ResourceSnapshotManager, TemplateManager)
+from .managers import (CHANGE_DELETE, CHANGE_FIELDS, CHANGE_RESOURCE, CHANGE_RESOURCE_TYPE, CHANGE_SAVE, CHANGE_TEMPLATE,
+                       log_changes)
 
 
 code_name = RegexValidator(r'^[-\w]+$', message='Code value')
 
 
-class Template(models.Model):
+class AtomicSaveMixin(object):
+    """
+    Save and delete within a transaction that also appends an entry to the
+    content change log (see :class:`warthog.managers.ContentChangeManager`), so
+    the entry is committed along with the change.
+
+    Deletes that do not go through :meth:`delete` (eg deleting a query set)
+    are logged by the ``post_delete`` receivers of the model's manager where
+    it has them.
+    """
+    # Kind of content saves and deletes are logged as; None for no logging
+    change_kind = None
+
+    def log_change(self, action, using):
+        """Append an entry for a save or delete of this object to the change log."""
+        if self.change_kind:
+            log_changes(self.change_kind, [self.pk], action, using)
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(self.__class__, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super(AtomicSaveMixin, self).save(*args, **kwargs)
+            self.log_change(CHANGE_SAVE, using)
+
+    def delete(self, using=None):
+        using = using or router.db_for_write(self.__class__, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            # Logged before the primary key is cleared; post_delete receivers skip
+            # objects that are already logged.
+            self.log_change(CHANGE_DELETE, using)
+            self._change_logged = True
+            super(AtomicSaveMixin, self).delete(using=using)
+
+
+class Template(AtomicSaveMixin, models.Model):
     """Defines a template.
 
     A template is used as the scaffolding for a page (or section of a page).
@@ -50,11 +90,18 @@ class Template(models.Model):
     mime_type = models.CharField(t('MIME type'), choices=MIME_TYPES, default='text/html',
         max_length=25, help_text=t("Mime-type to be set for this template."))
     # Options
-    cacheable = models.BooleanField(t('cachable'), default=True)
+    cacheable = models.BooleanField(t('cachable'), default=True,
+        help_text=t("Output is cached by resource; clear for templates that depend on the request "
+                    "(eg query string parameters, headers or the current user)."))
+    streaming = models.BooleanField(t('streaming'), default=False,
+        help_text=t("Send output as it is rendered; for large outputs eg feeds or exports."))
     # Tracking
     created = models.DateTimeField(t('creation date'), auto_now_add=True)
     updated = models.DateTimeField(t('last modified'), auto_now=True)
 
+    objects = TemplateManager()
+    change_kind = CHANGE_TEMPLATE
+
     class Meta:
         verbose_name = t('template')
         verbose_name_plural = t('templates')
@@ -64,7 +111,7 @@ class Template(models.Model):
         return self.name
 
 
-class ResourceType(models.Model):
+class ResourceType(AtomicSaveMixin, models.Model):
     """
     Defines a resource and what fields that are associated with it.
     """
@@ -104,6 +151,7 @@ class ResourceType(models.Model):
     )
 
     objects = ResourceTypeManager()
+    change_kind = CHANGE_RESOURCE_TYPE
 
     class Meta:
         verbose_name = t('resource type')
@@ -113,7 +161,7 @@ class ResourceType(models.Model):
         return self.name
 
 
-class ResourceTypeField(models.Model):
+class ResourceTypeField(AtomicSaveMixin, models.Model):
     """
     Defines a field that is part of a resource.
     """
@@ -144,7 +192,7 @@ class ResourceTypeField(models.Model):
         help_text=t('Optional help message for describing the use of the field.')
     )
 
-    objects = CachingManager()
+    objects = ResourceTypeFieldManager()
 
     class Meta:
         verbose_name = t('resource type field')
@@ -154,6 +202,10 @@ class ResourceTypeField(models.Model):
     def __unicode__(self):
         return self.code
 
+    def log_change(self, action, using):
+        # Fields are part of the schema of the resource type
+        log_changes(CHANGE_RESOURCE_TYPE, [self.resource_type_id], CHANGE_SAVE, using)
+
     @property
     def label(self):
         return self.label_raw if self.label_raw else self.code
@@ -172,7 +224,7 @@ class ResourceTypeField(models.Model):
         return resource_types.library[self.field_type].create_form_field(self.get_kwargs())
 
 
-class Resource(models.Model):
+class Resource(AtomicSaveMixin, models.Model):
     """
     CMS Resource model, resource that is served on a particular URI.
     """
@@ -224,12 +276,12 @@ class Resource(models.Model):
     )
     publish_date = models.DateTimeField(
         verbose_name=t('go live date'),
-        null=True, blank=True,
+        null=True, blank=True, db_index=True,
         help_text=t("Optional; if date is set this resource will go live once this date is reached.")
     )
     unpublish_date = models.DateTimeField(
         verbose_name=t('expiry date'),
-        null=True, blank=True,
+        null=True, blank=True, db_index=True,
         help_text=t("Optional; if date is set this resource will expire once this date has passed.")
     )
     # Menu
@@ -273,11 +325,19 @@ class Resource(models.Model):
         )
     )
 
+    # Snapshot served to the public (see ResourceSnapshot)
+    snapshot = models.ForeignKey(
+        to='ResourceSnapshot',
+        null=True, blank=True, editable=False,
+        related_name='+', on_delete=models.SET_NULL
+    )
+
     # Details
     created = models.DateTimeField(t('creation date'), auto_now_add=True)
     updated = models.DateTimeField(t('last modified'), auto_now=True)
 
     objects = ResourceManager()
+    change_kind = CHANGE_RESOURCE
 
     class Meta:
         verbose_name = t('resource')
@@ -288,11 +348,20 @@ class Resource(models.Model):
         )
         ordering = ['order', 'uri_path', 'title', ]
         unique_together = (('site', 'slug', 'parent', ), )
+        index_together = (('site', 'uri_path', ), )
 
     def __unicode__(self):
         return '[%s] - %s (%s)' % (
             self.title, Resource.STATUS_EXPANDED[self.published_status][1], self.uri_path)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Resource, cls).from_db(db, field_names, values)
+        # Listings the resource appeared in when loaded, these are invalidated
+        # along with its current listings if it moves (see ResourceManager).
+        instance._loaded_listings = (instance.__dict__.get('parent_id'), instance.__dict__.get('type_id'))
+        return instance
+
     @models.permalink
     def get_absolute_url(self):
         return 'warthog-preview', [str(self.pk)]
@@ -323,6 +392,22 @@ class Resource(models.Model):
                 return self.STATUS_LIVE
         return self.STATUS_UNPUBLISHED
 
+    @property
+    def next_transition(self):
+        """Next date the published status of this resource changes (`None` if
+        there is no future publish/un-publish date)."""
+        now = timezone.now()
+        dates = [d for d in (self.publish_date, self.unpublish_date) if (d is not None) and d > now]
+        return min(dates) if dates else None
+
+    @property
+    def seconds_to_transition(self):
+        """Seconds until the next transition (`None` if there isn't one)."""
+        next_transition = self.next_transition
+        if next_transition is None:
+            return None
+        return max(1, int(math.ceil((next_transition - timezone.now()).total_seconds())))
+
     @property
     def is_live(self):
         """Is this model considered live."""
@@ -365,7 +450,7 @@ class Resource(models.Model):
         return False
 
 
-class ResourceField(models.Model):
+class ResourceField(AtomicSaveMixin, models.Model):
     """Template variable that is applied to a resource."""
     resource = models.ForeignKey(Resource, related_name='fields')
     code = models.CharField(
@@ -377,8 +462,106 @@ class ResourceField(models.Model):
         blank=True, null=True
     )
 
+    objects = ResourceFieldManager()
+
     class Meta:
         unique_together = (('resource', 'code',), )
 
     def __unicode__(self):
         return "%s=%s" % (self.code, self.value)
+
+    def log_change(self, action, using):
+        # Logged as a change to the fields of the resource
+        log_changes(CHANGE_FIELDS, [self.resource_id], CHANGE_SAVE, using)
+
+
+class ResourceSnapshot(models.Model):
+    """
+    Immutable copy of the title, fields and template of a resource taken when
+    it is published.
+
+    The public site renders the snapshot referenced by a resource, so changes
+    to a resource are not visible until it is published again and publishing is
+    a single update of the reference.
+    """
+    resource = models.ForeignKey(Resource, related_name='snapshots')
+    title = models.CharField(t('title'), max_length=100)
+    template = models.CharField(t('template'), max_length=100)
+    payload = models.TextField(t('payload'), help_text=t("Field values (JSON)."))
+    created = models.DateTimeField(t('creation date'), auto_now_add=True)
+
+    objects = ResourceSnapshotManager()
+
+    class Meta:
+        verbose_name = t('resource snapshot')
+        verbose_name_plural = t('resource snapshots')
+
+    def __unicode__(self):
+        return '%s (%s)' % (self.title, self.created)
+
+    @cached_property
+    def fields(self):
+        """Field values of the resource (dict of code -> value)."""
+        return json.loads(self.payload)
+
+
+class SearchTerm(models.Model):
+    """
+    Entry of the search index (see :mod:`warthog.search`); used where the
+    database does not provide a full-text index.
+    """
+    resource = models.ForeignKey(Resource, related_name='search_terms')
+    term = models.CharField(max_length=50)
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = (('term', 'resource', ), )
+
+    def __unicode__(self):
+        return "%s=%s" % (self.term, self.weight)
+
+
+class RenderDependency(models.Model):
+    """
+    Entry of the reverse index of cached output to the content it was rendered
+    from (see :mod:`warthog.dependencies`).
+    """
+    dependency = models.CharField(max_length=150)
+    output_key = models.CharField(max_length=250, db_index=True)
+
+    class Meta:
+        unique_together = (('dependency', 'output_key', ), )
+
+    def __unicode__(self):
+        return "%s -> %s" % (self.dependency, self.output_key)
+
+
+class ContentChange(models.Model):
+    """
+    Entry of the append-only log of content changes (see
+    :class:`warthog.managers.ContentChangeManager`).
+    """
+    KINDS = (
+        (CHANGE_RESOURCE,      t('Resource')),
+        (CHANGE_FIELDS,        t('Resource fields')),
+        (CHANGE_TEMPLATE,      t('Template')),
+        (CHANGE_RESOURCE_TYPE, t('Resource type')),
+    )
+    ACTIONS = (
+        (CHANGE_SAVE,   t('Saved')),
+        (CHANGE_DELETE, t('Deleted')),
+    )
+
+    kind = models.CharField(t('kind'), max_length=20, choices=KINDS)
+    object_id = models.PositiveIntegerField(t('object ID'), help_text=t("ID of the resource for field changes."))
+    action = models.CharField(t('action'), max_length=10, choices=ACTIONS, default=CHANGE_SAVE)
+    created = models.DateTimeField(t('creation date'), default=timezone.now)
+
+    objects = ContentChangeManager()
+
+    class Meta:
+        verbose_name = t('content change')
+        verbose_name_plural = t('content changes')
+
+    def __unicode__(self):
+        return '%s %s %s' % (self.kind, self.object_id, self.action)
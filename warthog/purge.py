@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Purging of CDN (or other HTTP cache) entries when content changes.
+
+CMS responses carry surrogate keys (see ``CMS_SURROGATE_KEY_HEADER``) that
+identify the resource, resource type, template, site and parent section a page
+was rendered from. When any of these change the keys are passed to a purge
+backend (see ``CMS_PURGE_BACKEND``).
+
+Purge requests are collected for ``CMS_PURGE_DELAY`` seconds and sent as a
+single de-duplicated batch from a background thread so saving many objects
+(eg bulk publishing) does not make a request to the CDN for each object.
+
+"""
+from __future__ import absolute_import
+import atexit
+import threading
+from logging import getLogger
+from django.utils.module_loading import import_string
+from .conf import settings
+
+
+logger = getLogger('warthog.purge')
+
+
+def resource_key(pk):
+    return 'resource-%s' % pk
+
+
+def section_key(parent_id):
+    return 'section-%s' % parent_id
+
+
+def resource_type_key(pk):
+    return 'type-%s' % pk
+
+
+def template_key(pk):
+    return 'template-%s' % pk
+
+
+def site_key(pk):
+    return 'site-%s' % pk
+
+
+# Key of pages depending on more content than can be listed in the surrogate key
+# header; purged whenever any content changes (see warthog.dependencies.changed).
+OVERFLOW_KEY = 'overflow'
+
+
+class BasePurgeBackend(object):
+    """
+    Interface of purge backends.
+
+    :param max_keys: Maximum number of keys sent in a single purge request.
+
+    """
+    max_keys = 256
+
+    def purge(self, keys):
+        """
+        Purge all cache entries tagged with any of the surrogate keys.
+
+        :param keys: list of surrogate keys.
+
+        """
+        raise NotImplementedError()
+
+
+class MemoryPurgeBackend(BasePurgeBackend):
+    """Backend that records purge requests; for development and testing."""
+    def __init__(self):
+        self.requests = []
+
+    def purge(self, keys):
+        self.requests.append(list(keys))
+
+
+class PurgeDispatcher(object):
+    """
+    Collects surrogate keys to be purged and passes them to a backend in
+    batches.
+
+    :param backend: Purge backend.
+    :param delay: Seconds to collect keys before purging; if 0 keys are purged
+        immediately.
+
+    """
+    def __init__(self, backend, delay):
+        self.backend = backend
+        self.delay = delay
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def purge(self, keys):
+        """Queue surrogate keys to be purged."""
+        with self.lock:
+            self.pending.update(keys)
+            if self.delay and self.timer is None:
+                self.timer = threading.Timer(self.delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+        if not self.delay:
+            self.flush()
+
+    def flush(self):
+        """Purge all queued keys now."""
+        with self.lock:
+            keys, self.pending = sorted(self.pending), set()
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+        max_keys = self.backend.max_keys
+        for offset in range(0, len(keys), max_keys):
+            try:
+                self.backend.purge(keys[offset:offset + max_keys])
+            except Exception:
+                logger.exception("Failed to purge %s key(s).", len(keys[offset:offset + max_keys]))
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """
+    Get the purge dispatcher of this process.
+
+    :return: PurgeDispatcher; or None if no purge backend is configured.
+
+    """
+    global _dispatcher
+    if _dispatcher is None and settings.CMS_PURGE_BACKEND:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                backend = import_string(settings.CMS_PURGE_BACKEND)()
+                _dispatcher = PurgeDispatcher(backend, settings.CMS_PURGE_DELAY)
+                atexit.register(_dispatcher.flush)
+    return _dispatcher
+
+
+def purge_keys(keys):
+    """
+    Queue surrogate keys to be purged (ignored if no backend is configured).
+
+    :param keys: iterable of surrogate keys.
+
+    """
+    dispatcher = get_dispatcher()
+    if dispatcher is not None:
+        dispatcher.purge(keys)
@@ -1,9 +1,176 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
+from contextlib import contextmanager
 from django.contrib.sites.shortcuts import get_current_site
-from django.template import loader
+from django.template import VariableDoesNotExist, loader
+from django.template.defaulttags import ForNode
+from django.utils.encoding import force_bytes, force_text
 from django.utils.safestring import mark_safe
+from . import cache, compress, dependencies, purge
+from .conf import settings
 from .context import CmsRequestContext
+from .identity import get_identity_map
+from .managers import TEMPLATES_GENERATION, get_cache_timeout, resource_generation
+from .models import Template
+
+
+def get_template_names(resource_type, site, default_template=None):
+    """
+    Names of templates (in order of preference) used to render a resource type.
+
+    :param resource_type: ResourceType of resource being rendered.
+    :param site: Current site.
+    :param default_template: Template used in place of the resource type's
+        default template, eg the template recorded in a snapshot.
+
+    """
+    default_template = default_template or resource_type.default_template
+    return [
+        "%s/%s" % (site.domain, default_template),
+        default_template
+    ]
+
+
+def resource_template_names(resource, request):
+    """
+    Names of templates used to render a resource; the template recorded in the
+    published snapshot of the resource is used in preference to the default
+    template of the resource type.
+
+    :param resource: Resource being rendered.
+    :param request: Current request object.
+
+    """
+    identity_map = get_identity_map(request)
+    snapshot = identity_map.get_snapshot(resource)
+    resource_type = identity_map.get_resource_type(resource.type_id)
+    return get_template_names(resource_type, get_current_site(request), snapshot and snapshot.template)
+
+
+def select_resource_template(resource, request):
+    """
+    Load the template used to render a resource; the template (along with the
+    templates it extends or includes) and the resource type that selects it
+    are recorded as dependencies of the render in progress.
+
+    :param resource: Resource being rendered.
+    :param request: Current request object.
+
+    """
+    template_names = resource_template_names(resource, request)
+    template = loader.select_template(template_names)
+    tracker = get_identity_map(request).dependencies
+    if tracker.active:
+        tracker.add([dependencies.template_name_key(name) for name in template_names])
+        tracker.add([purge.resource_type_key(resource.type_id)])
+        tracker.add_template(template)
+    return template
+
+
+def get_cms_template(template_names):
+    """
+    Get the CMS template that is used for the first of the template names
+    found in the CMS template store.
+
+    :param template_names: Names of candidate templates.
+    :return: Template; or None if no candidate is a CMS template.
+
+    """
+    templates = {t.name: t for t in Template.objects.filter(name__in=template_names)}
+    for name in template_names:
+        if name in templates:
+            return templates[name]
+
+
+def get_template_options(template_names, templates_generation):
+    """
+    Options of the CMS templates used to render a resource.
+
+    :param template_names: Names of candidate templates.
+    :param templates_generation: Current generation token of templates.
+    :returns: dict of ``cacheable`` (output can be cached, ie none of the
+        matching CMS templates have been flagged as not cacheable),
+        ``streaming``, ``mime_type`` and ``id`` (of the first matching CMS
+        template).
+
+    """
+    cache_key = cache.generate_key('template_options', names='|'.join(template_names), templates=templates_generation)
+    options = cache.get(cache_key)
+    if options is None:
+        templates = {t.name: t for t in Template.objects.filter(name__in=template_names).only(
+            'name', 'cacheable', 'streaming', 'mime_type')}
+        template = next((templates[name] for name in template_names if name in templates), None)
+        options = {
+            'cacheable': all(t.cacheable for t in templates.itervalues()),
+            'streaming': template.streaming if template else False,
+            'mime_type': template.mime_type if template else None,
+            'id': template.pk if template else None,
+        }
+        cache.set(cache_key, options, None)
+    return options
+
+
+def templates_cacheable(template_names, templates_generation):
+    """
+    Determine if output rendered from any of the templates can be cached (see
+    :func:`get_template_options`).
+
+    """
+    return get_template_options(template_names, templates_generation)['cacheable']
+
+
+def resource_template_options(resource, request):
+    """Options of the CMS template used to render a resource."""
+    generations = cache.get_generations([TEMPLATES_GENERATION])
+    return get_template_options(resource_template_names(resource, request), generations[TEMPLATES_GENERATION])
+
+
+def get_surrogate_keys(resource, request, template_options=None, dependency_keys=()):
+    """
+    Surrogate keys (see :mod:`warthog.purge`) of the page of a resource.
+
+    :param resource: Resource being rendered.
+    :param request: Current request object.
+    :param template_options: Options of the resource's template if already known
+        (see :func:`resource_template_options`).
+    :param dependency_keys: Dependencies recorded while the page was rendered
+        (see :mod:`warthog.dependencies`), eg other resources, sections and
+        templates the page includes; added after the page's own keys. If
+        they would make the header longer than ``CMS_SURROGATE_KEY_MAX_LENGTH``
+        ``OVERFLOW_KEY`` (purged on any change) is added in their place.
+
+    """
+    template_options = template_options or resource_template_options(resource, request)
+    keys = [
+        purge.resource_key(resource.pk),
+        purge.resource_type_key(resource.type_id),
+        purge.site_key(resource.site_id),
+    ]
+    if template_options['id'] is not None:
+        keys.append(purge.template_key(template_options['id']))
+    if resource.parent_id is not None:
+        keys.append(purge.section_key(resource.parent_id))
+    dependency_keys = sorted(set(dependency_keys).difference(keys))
+    max_length = settings.CMS_SURROGATE_KEY_MAX_LENGTH
+    if max_length is not None and len(' '.join(keys + dependency_keys)) > max_length:
+        keys.append(purge.OVERFLOW_KEY)
+    else:
+        keys.extend(dependency_keys)
+    return keys
+
+
+def get_resource_params(resource, identity_map):
+    """
+    Template variables of a resource.
+
+    :param resource: Resource being rendered.
+    :param identity_map: Identity map of the current request.
+
+    """
+    params = {code: mark_safe(value) for code, value in identity_map.get_fields(resource.pk).iteritems()}
+    snapshot = identity_map.get_snapshot(resource)
+    params['title'] = snapshot.title if snapshot is not None else resource.title
+    return params
 
 
 def render_resource(resource, request):
@@ -15,18 +182,321 @@ def render_resource(resource, request):
 
     """
     site = get_current_site(request)
+    identity_map = get_identity_map(request)
 
     # Build up rendering context
-    params = {r.code: mark_safe(r.value) for r in resource.fields.all()}
-    params['title'] = resource.title
-
-    context = CmsRequestContext(site, request, resource, params)
+    context = CmsRequestContext(site, request, resource, get_resource_params(resource, identity_map))
 
     # Identify and load template
-    template = loader.select_template([
-        "%s/%s" % (site.domain, resource.type.default_template),
-        resource.type.default_template
-    ])
+    template = select_resource_template(resource, request)
 
     # Render
     return template.render(context)
+
+
+def iter_for_node(node, context):
+    """
+    Render a ``{% for %}`` node yielding the output of each iteration.
+
+    Follows ``ForNode.render`` (``forloop`` variables, unpacking of loop
+    variables and ``{% empty %}``) reading the node's attributes, the node
+    itself is not changed.
+
+    """
+    parentloop = context['forloop'] if 'forloop' in context else {}
+    with context.push():
+        try:
+            values = node.sequence.resolve(context, True)
+        except VariableDoesNotExist:
+            values = []
+        if values is None:
+            values = []
+        if not hasattr(values, '__len__'):
+            values = list(values)
+        len_values = len(values)
+        if len_values < 1:
+            yield node.nodelist_empty.render(context)
+            return
+        if node.is_reversed:
+            values = reversed(values)
+        unpack = len(node.loopvars) > 1
+        loop_dict = context['forloop'] = {'parentloop': parentloop}
+        for i, item in enumerate(values):
+            loop_dict['counter0'] = i
+            loop_dict['counter'] = i + 1
+            loop_dict['revcounter'] = len_values - i
+            loop_dict['revcounter0'] = len_values - i - 1
+            loop_dict['first'] = (i == 0)
+            loop_dict['last'] = (i == len_values - 1)
+
+            unpacked_vars = None
+            if unpack:
+                try:
+                    unpacked_vars = dict(zip(node.loopvars, item))
+                except TypeError:
+                    pass
+            else:
+                context[node.loopvars[0]] = item
+            if unpacked_vars is None:
+                yield node.nodelist_loop.render(context)
+            else:
+                with context.push(unpacked_vars):
+                    yield node.nodelist_loop.render(context)
+
+
+def iter_template(template, context):
+    """
+    Render a Django template yielding the output of each top level node; each
+    iteration of a top level ``{% for %}`` loop is yielded as it is rendered
+    (see :func:`iter_for_node`) so a loop over a large sequence (eg a
+    :class:`warthog.data_structures.ResourceIterator`) is not held in memory.
+
+    .. note::
+        Other nodes are rendered by Django (``NodeList.render_node``) so a
+        template that extends another template is yielded in one piece.
+
+    """
+    with context.render_context.push():
+        with context.bind_template(template):
+            for node in template.nodelist:
+                if isinstance(node, ForNode):
+                    for bit in iter_for_node(node, context):
+                        yield force_text(bit)
+                else:
+                    yield force_text(template.nodelist.render_node(node, context))
+
+
+def iter_chunks(bits, chunk_size):
+    """Collect bits of output into chunks of around chunk_size characters."""
+    chunk, size = [], 0
+    for bit in bits:
+        chunk.append(bit)
+        size += len(bit)
+        if size >= chunk_size:
+            yield ''.join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def stream_resource(resource, request):
+    """
+    Render a resource as a stream of chunks.
+
+    The template is selected and compiled before the stream is returned so a
+    missing or invalid template raises an error before a response is started.
+    Output is collected into chunks of around ``CMS_STREAMING_CHUNK_SIZE``
+    characters so large outputs (eg feeds iterating over a
+    :class:`warthog.data_structures.ResourceIterator`) are not held in memory
+    (see :func:`iter_template`).
+
+    :param resource: Resource to render
+    :param request: Current request object.
+    :returns: iterator of chunks.
+
+    """
+    site = get_current_site(request)
+    identity_map = get_identity_map(request)
+    context = CmsRequestContext(site, request, resource, get_resource_params(resource, identity_map))
+    template = select_resource_template(resource, request)
+    if not hasattr(template, 'template'):
+        # Not a Django template, cannot be rendered incrementally.
+        return iter([template.render(context)])
+    return iter_chunks(iter_template(template.template, context), settings.CMS_STREAMING_CHUNK_SIZE)
+
+
+def render_resource_in_context(resource, request, context):
+    """
+    Render a resource within an existing context.
+
+    Rather than building a new context (and running every context processor
+    again) the resource is rendered over a new context (see ``Context.new``)
+    that shares the request, site, render state and the values of the context
+    processors already run for the enclosing template, but otherwise only
+    holds the resource's own variables. Variables of the enclosing template
+    are not visible so the output only depends on the resource and can be
+    cached (see :func:`render_resource_fragment`).
+
+    :param resource: Resource to render
+    :param request: Current request object.
+    :param context: Context of the template the resource is rendered within.
+
+    """
+    identity_map = get_identity_map(request)
+    template = select_resource_template(resource, request)
+    if not hasattr(template, 'template') or context.template is None:
+        # Not a Django template or not within a render, a context cannot be shared.
+        return render_resource(resource, request)
+
+    processors_index = getattr(context, '_processors_index', None)
+    processors = {} if processors_index is None else context.dicts[processors_index]
+    context = context.new(processors)
+    context.update(get_resource_params(resource, identity_map))
+    context.resource = resource
+    return template.template.render(context)
+
+
+def output_cache_key(namespace, resource, request):
+    """
+    Key used to cache rendered output of a resource.
+
+    Keys vary by resource, site and either the published snapshot of the
+    resource (snapshots never change so need no invalidation) or, where there
+    is no snapshot (or snapshots are not used eg previews), the resource
+    generation. Output is removed when anything it was rendered from changes
+    (see :mod:`warthog.dependencies`).
+
+    :param namespace: namespace of key, eg fragment or page.
+    :param resource: Resource being rendered.
+    :param request: Current request object.
+    :returns: cache key; or None if the output cannot be cached, ie the resource
+        is not live (eg previews), the request has a query string (keys do not
+        vary by it) or the resource uses templates that are not cacheable.
+
+    """
+    if not resource.is_live or request.GET:
+        return None
+
+    site = get_current_site(request)
+    snapshot = get_identity_map(request).get_snapshot(resource)
+    if snapshot is not None:
+        generations = cache.get_generations([TEMPLATES_GENERATION])
+        version = {'snapshot': snapshot.pk}
+    else:
+        generations = cache.get_generations([TEMPLATES_GENERATION, resource_generation(resource.pk)])
+        version = {'revision': generations[resource_generation(resource.pk)]}
+    if not templates_cacheable(resource_template_names(resource, request), generations[TEMPLATES_GENERATION]):
+        return None
+
+    return cache.generate_key(namespace, resource=resource.pk, site=site.pk, **version)
+
+
+class VisitorState(object):
+    """
+    Records if a render read state specific to the visitor, ie the session, the
+    CSRF token or messages (see :func:`track_visitor_state`).
+    """
+    def __init__(self):
+        self.used = False
+
+
+@contextmanager
+def track_visitor_state(request):
+    """
+    Track if a render reads state specific to the visitor, output that does
+    (eg a form including ``{% csrf_token %}``) varies by the visitor's cookies
+    and must not be cached. Yields a :class:`VisitorState`.
+
+    Reads made before the block (eg by authentication) are not counted.
+
+    :param request: Current request object.
+
+    """
+    session = getattr(request, 'session', None)
+    messages = getattr(request, '_messages', None)
+    session_accessed = getattr(session, 'accessed', False)
+    messages_used = getattr(messages, 'used', False)
+    csrf_used = request.META.pop('CSRF_COOKIE_USED', False)
+    if session is not None:
+        session.accessed = False
+    if messages is not None:
+        messages.used = False
+
+    state = VisitorState()
+    try:
+        yield state
+    finally:
+        state.used = bool(
+            request.META.get('CSRF_COOKIE_USED') or getattr(session, 'accessed', False) or
+            getattr(messages, 'used', False))
+        if csrf_used:
+            request.META['CSRF_COOKIE_USED'] = True
+        if session is not None:
+            session.accessed = session.accessed or session_accessed
+        if messages is not None:
+            messages.used = messages.used or messages_used
+
+
+def render_resource_fragment(resource, request, context=None):
+    """
+    Render a resource, caching the output.
+
+    Output is cached until anything it was rendered from (the resource, other
+    resources it reads, sections it lists or templates it uses) changes or the
+    resource reaches a publish transition (see :func:`output_cache_key`).
+
+    :param resource: Resource to render
+    :param request: Current request object.
+    :param context: Optional context to render within (see
+        :func:`render_resource_in_context`).
+
+    """
+    if context is None:
+        render = lambda: render_resource(resource, request)
+    else:
+        render = lambda: render_resource_in_context(resource, request, context)
+
+    cache_key = output_cache_key('fragment', resource, request)
+    if cache_key is None:
+        return render()
+
+    tracker = get_identity_map(request).dependencies
+    cached = cache.get(cache_key)
+    if cached is not None:
+        # Dependencies of the fragment are also dependencies of the output it is rendered within
+        output, keys = cached
+        tracker.add(keys)
+        return output
+
+    with tracker.track() as keys, track_visitor_state(request) as visitor_state:
+        output = render()
+    if not visitor_state.used:
+        dependencies.register(cache_key, keys)
+        cache.set(cache_key, (output, keys), get_cache_timeout(resource))
+    return output
+
+
+def render_resource_page(resource, request):
+    """
+    Render a resource as a page, caching the output with precompressed variants.
+
+    Pages are cached in the same way as fragments (see
+    :func:`render_resource_fragment`) along with the compressed variants
+    produced by :func:`warthog.compress.compress`; as with fragments the
+    dependencies of a cached page are added to the render being tracked (if
+    any) so they can be sent as surrogate keys. Pages rendered for an
+    authenticated user, requests with a query string and pages that read the
+    session, CSRF token or messages (their responses vary by cookie) are never
+    cached as they may contain content specific to the request.
+
+    .. note::
+        Output is cached by resource so templates that read any other request
+        state (eg request headers) must be flagged as not cacheable.
+
+    :param resource: Resource to render
+    :param request: Current request object.
+    :returns: dict of content encoding -> rendered bytes.
+
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated():
+        cache_key = None
+    else:
+        cache_key = output_cache_key('page', resource, request)
+    if cache_key is None:
+        return {compress.IDENTITY: force_bytes(render_resource(resource, request))}
+
+    tracker = get_identity_map(request).dependencies
+    cached = cache.get(cache_key)
+    if cached is not None:
+        variants, keys = cached
+        tracker.add(keys)
+        return variants
+
+    with tracker.track() as keys, track_visitor_state(request) as visitor_state:
+        content = render_resource(resource, request)
+    variants = compress.compress(force_bytes(content))
+    if not visitor_state.used:
+        dependencies.register(cache_key, keys)
+        cache.set(cache_key, (variants, keys), get_cache_timeout(resource))
+    return variants
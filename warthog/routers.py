@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Routing of front-end reads to read replicas.
+
+Reads made while serving the public site (the :class:`warthog.views.Cms` view
+and the front display methods of :class:`warthog.managers.ResourceManager`)
+are sent to one of the replicas listed in ``CMS_READ_DATABASES``. The admin,
+previews and all writes use the primary (default) database.
+
+After a write the current thread reads from the primary for
+``CMS_READ_STICKY_SECONDS`` so changes are visible before replicas have caught
+up; :class:`warthog.middleware.ReplicaStickinessMiddleware` carries this on to
+the following requests of the user that made the change.
+
+A write also invalidates cached content. Other users' requests would refill
+the cache from a replica that has not caught up yet, and the stale content
+would then be served until the next change. To prevent this, a marker is
+set in the shared cache on every write, and while it is present (for
+``CMS_READ_STICKY_SECONDS``) all reads go to the primary (see
+:func:`recently_written`).
+
+**Example**::
+
+    DATABASE_ROUTERS = ['warthog.routers.ReadReplicaRouter']
+    CMS_READ_DATABASES = ['replica']
+
+"""
+from __future__ import absolute_import
+import random
+import threading
+import time
+from contextlib import contextmanager
+from . import cache
+from .conf import settings
+
+
+# Models that are never read from replicas; render dependencies are written
+# while serving the public site so writing them does not make reads sticky.
+PRIMARY_MODELS = ('renderdependency', )
+
+REPLICA = 'replica'
+PRIMARY = 'primary'
+
+_state = threading.local()
+
+
+def reset():
+    """Clear the read mode, replica choice and stickiness of the current thread."""
+    _state.__dict__.clear()
+
+
+def pin_to_primary(seconds=None):
+    """
+    Read from the primary database for a period.
+
+    :param seconds: Length of period; defaults to ``CMS_READ_STICKY_SECONDS``.
+
+    """
+    if seconds is None:
+        seconds = settings.CMS_READ_STICKY_SECONDS
+    _state.pinned_until = max(getattr(_state, 'pinned_until', 0), time.time() + seconds)
+
+
+def is_pinned():
+    """Reads of the current thread are pinned to the primary database."""
+    return getattr(_state, 'pinned_until', 0) > time.time()
+
+
+def has_written():
+    """A write has been routed in the current thread (since the last reset)."""
+    return getattr(_state, 'written', False)
+
+
+def recent_write_key():
+    """Cache key of the marker of a recent write (see :func:`note_write`)."""
+    return cache.generate_key('routers', marker='written')
+
+
+def note_write():
+    """
+    Record that CMS content has been written; reads of every thread go to the
+    primary database for ``CMS_READ_STICKY_SECONDS``. The marker is set at
+    most once a second per thread.
+    """
+    now = time.time()
+    if now - getattr(_state, 'noted_at', 0) >= 1:
+        _state.noted_at = now
+        cache.set(recent_write_key(), now, settings.CMS_READ_STICKY_SECONDS)
+
+
+def recently_written():
+    """
+    CMS content has been written (by any thread or process) within
+    ``CMS_READ_STICKY_SECONDS``; checked once per read mode block.
+    """
+    try:
+        return _state.recently_written
+    except AttributeError:
+        written = _state.recently_written = cache.get(recent_write_key()) is not None
+        return written
+
+
+@contextmanager
+def read_mode(mode):
+    """
+    Read from replicas (``REPLICA``) or the primary (``PRIMARY``) within a block.
+    """
+    previous = getattr(_state, 'mode', None)
+    _state.__dict__.pop('recently_written', None)
+    _state.mode = mode
+    try:
+        yield
+    finally:
+        _state.mode = previous
+
+
+def get_read_database(front=False):
+    """
+    Database alias for reads of CMS content.
+
+    :param front: The read is for front display (eg
+        :meth:`warthog.managers.ResourceManager.filter_front`); used outside
+        of an explicit read mode.
+    :returns: alias of a replica; or None to use the default database.
+
+    """
+    databases = settings.CMS_READ_DATABASES
+    if not databases or is_pinned():
+        return None
+    mode = getattr(_state, 'mode', None)
+    if mode == PRIMARY or (mode is None and not front) or recently_written():
+        return None
+    try:
+        return _state.replica
+    except AttributeError:
+        # Use a single replica per thread so reads are consistent with one another
+        replica = _state.replica = random.choice(databases)
+        return replica
+
+
+class ReadReplicaRouter(object):
+    """
+    Database router sending front-end reads of CMS models to read replicas,
+    see :mod:`warthog.routers`.
+    """
+    def _is_routed(self, model):
+        return model._meta.app_label == 'warthog' and model._meta.model_name not in PRIMARY_MODELS
+
+    def db_for_read(self, model, **hints):
+        if self._is_routed(model):
+            return get_read_database()
+
+    def db_for_write(self, model, **hints):
+        if self._is_routed(model):
+            _state.written = True
+            pin_to_primary()
+            note_write()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        if self._is_routed(type(obj1)) or self._is_routed(type(obj2)):
+            return True
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Full-text search of resources.
+
+Resource titles and the values of text fields (see ``CMS_SEARCH_FIELD_TYPES``)
+of the published snapshot of each resource (the content visitors see) are kept
+in a search index. A resource is indexed when it is published, changes to the
+draft of a published resource do not touch the index. Resources without a
+snapshot are indexed from their current values as they are saved. Two index
+backends are provided:
+
+``fts5``
+    SQLite FTS5 virtual table (created by migrations where the SQLite build
+    supports it), ranked using bm25.
+``table``
+    Inverted index stored in the :class:`warthog.models.SearchTerm` table that
+    works with any database, ranked by the (weighted) number of occurrences of
+    the search terms.
+
+"""
+from __future__ import absolute_import
+import re
+from collections import Counter
+from django.db import connections, transaction
+from django.db.models import Count, Sum
+from django.utils.encoding import force_text
+from django.utils.html import strip_tags
+from django.utils.six.moves import html_parser
+from . import cache
+from .conf import settings
+from .managers import resources_published
+from .models import Resource, ResourceField, ResourceSnapshot, ResourceTypeField, SearchTerm
+
+
+FTS_TABLE = 'warthog_search'
+
+# Terms in the title are weighted higher than terms in the body
+TITLE_WEIGHT = 5
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TERM_LENGTH = 50
+
+
+def tokenize(text):
+    """Split text into a list of lower case search terms."""
+    return [term[:MAX_TERM_LENGTH] for term in TERM_RE.findall(force_text(text).lower()) if len(term) > 1]
+
+
+def html_to_text(value):
+    return html_parser.HTMLParser().unescape(strip_tags(value))
+
+
+def get_document(resource):
+    """
+    Get the text of a resource that is indexed; taken from the published
+    snapshot of the resource where it has one.
+
+    :param resource: Resource to index.
+    :returns: tuple of (title, body).
+
+    """
+    codes = sorted(ResourceTypeField.objects.filter(
+        resource_type=resource.type_id, field_type__in=settings.CMS_SEARCH_FIELD_TYPES
+    ).values_list('code', flat=True))
+    if resource.snapshot_id is not None:
+        snapshot = ResourceSnapshot.objects.get_snapshot(resource.snapshot_id)
+        title = snapshot.title
+        values = [snapshot.fields.get(code) for code in codes]
+    else:
+        title = resource.title
+        values = ResourceField.objects.filter(resource=resource, code__in=codes).values_list('value', flat=True)
+    body = '\n'.join(html_to_text(value) for value in values if value)
+    return title, body
+
+
+def indexed_key(resource_id):
+    """Cache key of the snapshot a resource was last indexed from."""
+    return cache.generate_key('search', resource=resource_id)
+
+
+class TableBackend(object):
+    """Search index stored in the search terms table."""
+    name = 'table'
+
+    def index(self, resource, title, body):
+        weights = Counter()
+        for term in tokenize(title):
+            weights[term] += TITLE_WEIGHT
+        weights.update(tokenize(body))
+        with transaction.atomic():
+            SearchTerm.objects.filter(resource=resource).delete()
+            SearchTerm.objects.bulk_create([
+                SearchTerm(resource=resource, term=term, weight=weight) for term, weight in weights.iteritems()
+            ])
+
+    def remove(self, resource_id):
+        SearchTerm.objects.filter(resource=resource_id).delete()
+
+    def search(self, queryset, terms):
+        terms = set(terms)
+        return queryset.filter(search_terms__term__in=terms).annotate(
+            search_score=Sum('search_terms__weight'), search_matches=Count('search_terms')
+        ).filter(search_matches=len(terms)).order_by('-search_score', 'pk')
+
+
+class FtsBackend(object):
+    """Search index stored in an SQLite FTS5 virtual table."""
+    name = 'fts5'
+
+    def index(self, resource, title, body):
+        with connections[Resource.objects.db].cursor() as cursor:
+            cursor.execute('DELETE FROM %s WHERE rowid = %%s' % FTS_TABLE, [resource.pk])
+            cursor.execute('INSERT INTO %s (rowid, title, body) VALUES (%%s, %%s, %%s)' % FTS_TABLE,
+                           [resource.pk, title, body])
+
+    def remove(self, resource_id):
+        with connections[Resource.objects.db].cursor() as cursor:
+            cursor.execute('DELETE FROM %s WHERE rowid = %%s' % FTS_TABLE, [resource_id])
+
+    def search(self, queryset, terms):
+        # Quote each term so it is not interpreted as FTS5 query syntax
+        match = ' '.join('"%s"' % term.replace('"', '""') for term in terms)
+        table = queryset.model._meta.db_table
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=['%s.rowid = %s.id' % (FTS_TABLE, table), '%s MATCH %%s' % FTS_TABLE],
+            params=[match],
+            # bm25 scores are negative; lower is a better match
+            select={'search_score': 'bm25(%s, %s, 1.0)' % (FTS_TABLE, float(TITLE_WEIGHT))},
+            order_by=['search_score', 'pk'],
+        )
+
+
+BACKENDS = {backend.name: backend for backend in (TableBackend(), FtsBackend())}
+
+_connection_backends = {}
+
+
+def get_backend():
+    """Backend used for the search index (see ``CMS_SEARCH_BACKEND``)."""
+    if settings.CMS_SEARCH_BACKEND:
+        return BACKENDS[settings.CMS_SEARCH_BACKEND]
+
+    alias = Resource.objects.db
+    name = _connection_backends.get(alias)
+    if name is None:
+        connection = connections[alias]
+        if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+            name = 'fts5'
+        else:
+            name = 'table'
+        _connection_backends[alias] = name
+    return BACKENDS[name]
+
+
+def index_resource(resource):
+    """
+    Add (or replace) a resource in the search index.
+
+    :param resource: Resource to index.
+
+    """
+    title, body = get_document(resource)
+    get_backend().index(resource, title, body)
+    if resource.snapshot_id is not None:
+        cache.set(indexed_key(resource.pk), resource.snapshot_id, None)
+
+
+def update_resource(resource):
+    """
+    Index a resource if its indexed content may have changed; a resource with a
+    snapshot is only indexed once for each snapshot (so saving a published
+    resource, or its fields, does not re-index it).
+
+    :param resource: Resource that has been changed.
+
+    """
+    if resource.snapshot_id is None or cache.get(indexed_key(resource.pk)) != resource.snapshot_id:
+        index_resource(resource)
+
+
+def index_resources(resource_ids):
+    """Index resources (eg after they have been published)."""
+    for resource in Resource.objects.filter(pk__in=resource_ids):
+        update_resource(resource)
+
+
+def remove_resource(resource_id):
+    """Remove a resource from the search index."""
+    get_backend().remove(resource_id)
+
+
+def search(query, site=None):
+    """
+    Search live resources.
+
+    :param query: search text; resources must match all terms.
+    :param site: Optional site to restrict results to.
+    :returns: Resource query set ordered by relevance; each resource has a
+        ``search_score`` attribute.
+
+    """
+    queryset = Resource.objects.live()
+    if site is not None:
+        queryset = queryset.filter(site=site)
+    terms = tokenize(query)
+    if not terms:
+        return queryset.none()
+    return get_backend().search(queryset, terms)
+
+
+def _resource_saved(instance, raw=False, **kwargs):
+    if not raw:
+        update_resource(instance)
+
+
+def _resource_deleted(instance, **kwargs):
+    remove_resource(instance.pk)
+
+
+def _field_saved(instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Loaded again (usually from cache) as the related instance may predate a publish
+    resource = Resource.objects.get(pk=instance.resource_id)
+    # Fields of a published snapshot are indexed when the resource is published
+    if resource.snapshot_id is None and ResourceTypeField.objects.get_field_types(
+            resource.type_id).get(instance.code) in settings.CMS_SEARCH_FIELD_TYPES:
+        index_resource(resource)
+
+
+def _resources_published(resource_ids, **kwargs):
+    index_resources(resource_ids)
+
+
+def connect_signals():
+    """
+    Keep the search index up to date as resources are changed.
+
+    .. note::
+        Fields of resources without a snapshot that are created in bulk (eg by
+        the admin) must be indexed by calling :func:`update_resource`.
+
+    """
+    from django.db.models import signals
+    signals.post_save.connect(_resource_saved, sender=Resource, dispatch_uid='warthog.search.resource_saved')
+    # Resource already has post_delete receivers (see CachingManager) so fast deletes are not affected
+    signals.post_delete.connect(_resource_deleted, sender=Resource, dispatch_uid='warthog.search.resource_deleted')
+    signals.post_save.connect(_field_saved, sender=ResourceField, dispatch_uid='warthog.search.field_saved')
+    resources_published.connect(_resources_published, dispatch_uid='warthog.search.resources_published')
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Sitemap generation for large sites.
+
+Live resources of a site are split into shards of ``CMS_SITEMAP_SHARD_SIZE``
+URLs that are listed by a sitemap index. Shards are read using keyset
+pagination over (uri_path, pk) so generating any shard costs the same
+regardless of its position, and rendered as a stream of chunks.
+
+"""
+from __future__ import absolute_import
+import math
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.html import escape
+from . import cache, compress
+from .conf import settings
+from .models import Resource
+
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def get_sitemap_resources(site):
+    """Resources of a site that are included in the sitemap."""
+    return Resource.objects.live().filter(site=site)
+
+
+def get_sitemap_timeout(site):
+    """
+    Timeout for cached sitemap entries; entries are only cached until the next
+    scheduled publish/un-publish transition of the site.
+
+    """
+    next_transition = Resource.objects.filter(site=site).next_transition()
+    if next_transition is None:
+        return DEFAULT_TIMEOUT
+    return max(1, int(math.ceil((next_transition - timezone.now()).total_seconds())))
+
+
+def get_shard_keys(site, uri_paths_generation):
+    """
+    Keys of the resource each shard starts after.
+
+    :param site: Site the sitemap is generated for.
+    :param uri_paths_generation: Current generation token of resource paths.
+    :returns: list of (uri_path, pk) keys, one per shard; the first is None.
+
+    """
+    cache_key = cache.generate_key('sitemap_shards', site=site.pk, uri_paths=uri_paths_generation)
+    keys = cache.get(cache_key)
+    if keys is None:
+        shard_size = settings.CMS_SITEMAP_SHARD_SIZE
+        queryset = get_sitemap_resources(site).order_by('uri_path', 'pk')
+        keys = [None]
+        while True:
+            # Last resource of this shard and the first of the next (if any)
+            rows = list(queryset.after_key(keys[-1]).values_list('uri_path', 'pk')[shard_size - 1:shard_size + 1])
+            if len(rows) < 2:
+                break
+            keys.append(rows[0])
+        cache.set(cache_key, keys, get_sitemap_timeout(site))
+    return keys
+
+
+def shard_cache_key(site, shard, scheme, uri_paths_generation):
+    return cache.generate_key('sitemap', site=site.pk, shard=shard, scheme=scheme, uri_paths=uri_paths_generation)
+
+
+def render_index(shard_urls):
+    """
+    Render a sitemap index.
+
+    :param shard_urls: absolute URLs of each shard.
+
+    """
+    bits = [XML_HEADER, '<sitemapindex xmlns="%s">\n' % SITEMAP_NS]
+    for url in shard_urls:
+        bits.append('<sitemap><loc>%s</loc></sitemap>\n' % escape(url))
+    bits.append('</sitemapindex>\n')
+    return ''.join(bits)
+
+
+def iter_shard(site, after, base_url, chunk_size=1000):
+    """
+    Render a sitemap shard as a stream of chunks.
+
+    :param site: Site the sitemap is generated for.
+    :param after: key of the resource the shard starts after (see
+        :func:`get_shard_keys`).
+    :param base_url: scheme and domain prepended to resource paths.
+    :param chunk_size: number of URLs fetched and yielded at a time.
+
+    """
+    yield XML_HEADER + '<urlset xmlns="%s">\n' % SITEMAP_NS
+
+    remaining = settings.CMS_SITEMAP_SHARD_SIZE
+    bits = []
+    for uri_path, _, updated in get_sitemap_resources(site).keyset_iterator(
+            ('updated', ), min(chunk_size, remaining), after):
+        bits.append('<url><loc>%s</loc><lastmod>%s</lastmod></url>\n' % (
+            escape(base_url + uri_path), updated.date().isoformat()))
+        remaining -= 1
+        if not remaining:
+            break
+        if len(bits) >= chunk_size:
+            yield ''.join(bits)
+            bits = []
+    if bits:
+        yield ''.join(bits)
+
+    yield '</urlset>\n'
+
+
+def cache_stream(cache_key, chunks, timeout):
+    """
+    Pass through a stream of chunks; once complete the output is stored in
+    cache along with compressed variants (see :func:`warthog.compress.compress`).
+
+    """
+    bits = []
+    for chunk in chunks:
+        bits.append(chunk)
+        yield chunk
+    cache.set(cache_key, compress.compress(force_bytes(''.join(bits))), timeout)
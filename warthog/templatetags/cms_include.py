@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 from django import template
-from ..models import Resource
-from ..render import render_resource
+from ..identity import get_identity_map
+from ..render import render_resource_fragment
 
 register = template.Library()
 
@@ -10,7 +10,8 @@ register = template.Library()
 @register.simple_tag(takes_context=True)
 def inline_resource(context, pk_or_path, not_found='Resource `{}` not found'):
     """
-    Render a resource inline
+    Render a resource inline within the current context (output is cached, see
+    :func:`warthog.render.render_resource_fragment`).
 
     :param context: Current render context
     :param pk_or_path: An ID or path of resource to be rendered
@@ -22,18 +23,10 @@ def inline_resource(context, pk_or_path, not_found='Resource `{}` not found'):
         raise KeyError('The request object is required to be part of the context. '
                        'Add "django.core.context_processors.request" to your TEMPLATE_CONTEXT_PROCESSORS setting')
 
-    try:
-        filters = dict(pk=int(pk_or_path))
-    except ValueError:
-        # Assume is path
-        filters = dict(uri_path=pk_or_path)
-
-    try:
-        resource = Resource.objects.get_front(**filters)
-    except Resource.DoesNotExist:
+    resource = get_identity_map(request).get_resource(pk_or_path)
+    if resource is None:
         return not_found.format(pk_or_path)
-    else:
-        if resource.can_serve(request.user):
-            return render_resource(resource, request)
+    elif resource.can_serve(request.user):
+        return render_resource_fragment(resource, request, context)
 
     return ''  # Return empty text if user permissions don't pass
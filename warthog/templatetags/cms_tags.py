@@ -1,42 +1,92 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 from django import template
-from ..models import Resource, ResourceType
-from ..data_structures import ResourceIterator, ResourceItem
+from .. import dependencies, search
+from ..data_structures import ResourceIterator
+from ..identity import get_context_identity_map
 
 register = template.Library()
 
+# Largest number of results returned by search_resources
+SEARCH_MAX_LIMIT = 100
 
-@register.assignment_tag
-def get_resource(pk_or_path):
+
+def _int_param(value, default, maximum=None):
+    """Parse an integer tag parameter (eg from the query string) falling back to a default."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    value = max(value, 0)
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
+
+
+@register.assignment_tag(takes_context=True)
+def get_resource(context, pk_or_path, lazy=False):
     """
     Get a resource from it's ID or path.
-    """
-    try:
-        filters = dict(pk=int(pk_or_path))
-    except ValueError:
-        # Assume is path
-        filters = dict(uri_path=pk_or_path)
 
-    try:
-        resource = Resource.objects.get_front(**filters)
-    except Resource.DoesNotExist:
-        return None
-    else:
-        if resource.is_live:
-            return ResourceItem(resource)
+    If ``lazy`` is set a proxy is returned, all lazy resources requested during
+    a render are fetched in a single batch when the first of them is used::
+
+        {% get_resource 12 lazy=True as first %}
+        {% get_resource "/promo" lazy=True as second %}
+        {{ first.title }}{{ second.title }}
+
+    """
+    identity_map = get_context_identity_map(context)
+    if lazy:
+        return identity_map.defer_resource(pk_or_path)
+    resource = identity_map.get_resource(pk_or_path)
+    if resource is not None and resource.is_live:
+        return identity_map.get_item(resource)
 
 
-@register.assignment_tag
-def get_resource_type(code, include_hidden=False):
-    resource_type = ResourceType.objects.get(code=code)
-    return ResourceIterator.for_type(resource_type, include_hidden)
+@register.assignment_tag(takes_context=True)
+def get_resource_type(context, code, include_hidden=False):
+    identity_map = get_context_identity_map(context)
+    resource_type = identity_map.get_resource_type_by_code(code)
+    identity_map.dependencies.add([dependencies.type_listing_key(resource_type.pk)])
+    return ResourceIterator.for_type(resource_type, include_hidden, identity_map.use_snapshots)
 
 
 @register.assignment_tag(takes_context=True)
 def get_children(context, resource=None, include_hidden=False):
-    if isinstance(resource, int):
-        resource = get_resource(resource)
-    elif resource is None:
+    """
+    Get the children of a resource (the resource being rendered by default);
+    the parent may be a resource, an item (eg of an enclosing menu) or an ID
+    so nested menus do not load a resource for each item::
+
+        {% get_children as items %}
+        {% for item in items %}{{ item.title }}
+            {% get_children item as children %}
+            {% for child in children %}{{ child.title }}{% endfor %}
+        {% endfor %}
+
+    """
+    identity_map = get_context_identity_map(context)
+    if resource is None:
         resource = context.resource
-    return ResourceIterator.for_children(resource, include_hidden)
+    resource_id = getattr(resource, 'pk', resource)
+    identity_map.dependencies.add_section(resource_id)
+    return ResourceIterator.for_children(resource_id, include_hidden, identity_map.use_snapshots)
+
+
+@register.assignment_tag(takes_context=True)
+def search_resources(context, query, limit=10, offset=0):
+    """
+    Search live resources of the current site, most relevant first::
+
+        {% search_resources request.GET.q limit=20 as results %}
+        {% for result in results %}<a href="{{ result.uri_path }}">{{ result.title }}</a>{% endfor %}
+
+    Invalid ``limit`` or ``offset`` values (eg taken from the query string)
+    are replaced by their defaults; ``limit`` is capped at ``SEARCH_MAX_LIMIT``.
+
+    """
+    offset = _int_param(offset, 0)
+    limit = _int_param(limit, 10, SEARCH_MAX_LIMIT)
+    resources = list(search.search(query or '', getattr(context, 'site', None))[offset:offset + limit])
+    return get_context_identity_map(context).get_items(resources)
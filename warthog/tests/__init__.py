@@ -1,2 +1,18 @@
 from warthog.tests.models import *
 from warthog.tests.cache import *
+from warthog.tests.managers import *
+from warthog.tests.admin.forms import *
+from warthog.tests.admin.actions import *
+from warthog.tests.render import *
+from warthog.tests.identity import *
+from warthog.tests.middleware import *
+from warthog.tests.commands import *
+from warthog.tests.compress import *
+from warthog.tests.sitemaps import *
+from warthog.tests.search import *
+from warthog.tests.snapshots import *
+from warthog.tests.purge import *
+from warthog.tests.dependencies import *
+from warthog.tests.routers import *
+from warthog.tests.changes import *
+from warthog.tests.data_structures import *
@@ -0,0 +1,61 @@
+# coding=utf-8
+from django import test
+from django.contrib import admin
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from warthog import cache as warthog_cache, dependencies
+from warthog.admin import ResourceAdmin
+from warthog.models import Resource, ResourceField, ResourceType
+
+
+class ClearCacheActionTestCase(test.TestCase):
+    def setUp(self):
+        cache.clear()
+        self.resource_type = ResourceType.objects.create(
+            name='Page', code='page', default_template='page.html')
+        self.resource = Resource.objects.create(
+            type=self.resource_type, title='Home', slug='home', uri_path='/home', published=True)
+        self.resource.fields.create(code='summary', value='Old')
+        self.target = ResourceAdmin(Resource, admin.site)
+
+    def clear_cache(self, queryset):
+        request = test.RequestFactory().post('/')
+        request._messages = CookieStorage(request)
+        self.target.clear_cache(request, queryset)
+
+    def test_clear_cache_evicts_uri_path(self):
+        # Arrange; populate the cache then change the database behind its back
+        self.assertEqual('Home', Resource.objects.get_uri_path('/home').title)
+        Resource.objects.filter(pk=self.resource.pk).update(title='Welcome')
+        self.assertEqual('Home', Resource.objects.get_uri_path('/home').title)
+
+        # Act
+        self.clear_cache(Resource.objects.filter(pk=self.resource.pk))
+
+        # Assert
+        self.assertEqual('Welcome', Resource.objects.get_uri_path('/home').title)
+        self.assertEqual('Welcome', Resource.objects.get(pk=self.resource.pk).title)
+
+    def test_clear_cache_evicts_field_bundle(self):
+        self.assertEqual({'summary': 'Old'}, ResourceField.objects.get_bundle(self.resource.pk))
+        ResourceField.objects.filter(resource=self.resource).update(value='New')
+
+        self.clear_cache(Resource.objects.filter(pk=self.resource.pk))
+
+        self.assertEqual({'summary': 'New'}, ResourceField.objects.get_bundle(self.resource.pk))
+
+    def test_clear_cache_uses_serving_keys(self):
+        Resource.objects.get_uri_path('/home')
+        served_keys = [warthog_cache.generate_obj_key(Resource, pk=self.resource.pk),
+                       warthog_cache.generate_obj_key(Resource, uri_path='/home')]
+
+        self.assertTrue(set(served_keys) <= set(self.resource.cache_keys))
+
+    def test_clear_cache_removes_rendered_output(self):
+        output_key = warthog_cache.generate_key('output', page='home')
+        warthog_cache.set(output_key, 'Home')
+        dependencies.register(output_key, ['resource-%s' % self.resource.pk])
+
+        self.clear_cache(Resource.objects.filter(pk=self.resource.pk))
+
+        self.assertIsNone(warthog_cache.get(output_key))
@@ -0,0 +1,52 @@
+# coding=utf-8
+from django import test
+from django.core.cache import cache
+from warthog.admin.forms import ResourceFieldsForm
+from warthog.models import Resource, ResourceField, ResourceType
+
+
+class ResourceFieldsFormTestCase(test.TestCase):
+    def setUp(self):
+        cache.clear()
+        self.resource_type = ResourceType.objects.create(
+            name='Page', code='page', default_template='page.html')
+        self.resource_type.fields.create(code='summary', field_type='char')
+        self.resource_type.fields.create(code='featured', field_type='bool')
+        self.resource = Resource.objects.create(
+            type=self.resource_type, title='Home', slug='home', uri_path='/home', published=True)
+        self.resource.fields.create(code='summary', value='Old')
+
+    def test_save_to(self):
+        # Arrange
+        self.assertEqual({'summary': 'Old'}, ResourceField.objects.get_bundle(self.resource.pk))
+        initial = dict(ResourceField.objects.get_bundle(self.resource.pk))
+        target = ResourceFieldsForm.for_type(self.resource_type)(instance=self.resource, initial=initial, data={
+            'summary': 'New', 'featured': 'on',
+        })
+        self.assertTrue(target.is_valid())
+
+        # Act
+        # Single delete and insert and change log entry (plus savepoint/release of the
+        # transaction) and a lookup of rendered output depending on the resource
+        with self.assertNumQueries(6):
+            target.save_to(self.resource)
+
+        # Assert
+        self.assertEqual({'summary': 'New', 'featured': 'true'}, ResourceField.objects.get_bundle(self.resource.pk))
+
+    def test_for_type_is_cached(self):
+        resource_type = ResourceType.objects.get(pk=self.resource_type.pk)
+        form_class = ResourceFieldsForm.for_type(resource_type)
+        self.assertEqual(['summary', 'featured'], list(form_class.base_fields))
+
+        with self.assertNumQueries(0):
+            self.assertIs(form_class, ResourceFieldsForm.for_type(resource_type))
+            form_class(instance=self.resource)
+
+    def test_for_type_rebuilt_when_fields_change(self):
+        form_class = ResourceFieldsForm.for_type(ResourceType.objects.get(pk=self.resource_type.pk))
+        self.resource_type.fields.create(code='body', field_type='html')
+
+        actual = ResourceFieldsForm.for_type(ResourceType.objects.get(pk=self.resource_type.pk))
+        self.assertIsNot(form_class, actual)
+        self.assertIn('body', actual.base_fields)
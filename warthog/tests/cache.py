@@ -1,3 +1,4 @@
+import hashlib
 from django.db import models
 from django import test
 from warthog import cache
@@ -19,18 +20,35 @@ class CacheTestCase(test.TestCase):
         m = CacheTest(pk=1, code='foo', other=69)
         actual = cache.generate_obj_key(m, pk=m.pk)
 
-        self.assertEquals('model:warthog_test.cachetest[pk=1]', actual)
+        self.assertEquals('warthog:1:model:warthog_test.cachetest[pk=1]', actual)
 
     def test_generate_obj_key_with_type(self):
         actual = cache.generate_obj_key(CacheTest, pk=2)
 
-        self.assertEquals('model:warthog_test.cachetest[pk=2]', actual)
+        self.assertEquals('warthog:1:model:warthog_test.cachetest[pk=2]', actual)
+
+    def test_generate_obj_key_stable_ordering(self):
+        actual = cache.generate_obj_key(CacheTest, other=69, code='foo')
+
+        self.assertEquals('warthog:1:model:warthog_test.cachetest[code=foo,other=69]', actual)
+
+    def test_generate_obj_key_long_value(self):
+        value = '/' + 'a' * 499
+        actual = cache.generate_obj_key(CacheTest, code=value)
+
+        self.assertEquals(
+            'warthog:1:model:warthog_test.cachetest[code=md5.%s]' % hashlib.md5(value).hexdigest(), actual)
+
+    def test_generate_obj_key_unsafe_value(self):
+        actual = cache.generate_obj_key(CacheTest, code=u'/caf\xe9 menu')
+
+        self.assertTrue(actual.startswith('warthog:1:model:warthog_test.cachetest[code=md5.'))
 
     def test_set_model(self):
         m = CacheTest(pk=1, code='foo', other=69)
 
         key = cache.set_model(m)
-        self.assertEqual('model:warthog_test.cachetest[pk=1]', key)
+        self.assertEqual('warthog:1:model:warthog_test.cachetest[pk=1]', key)
 
         actual = cache.default_cache.get(key)
         self.assertIsNotNone(actual)
@@ -42,7 +60,7 @@ class CacheTestCase(test.TestCase):
 
         # Arrange
         target = CacheTest(pk=1, code='foo', other=69)
-        cache.default_cache.set('model:warthog_test.cachetest[pk=1]', target)
+        cache.default_cache.set('warthog:1:model:warthog_test.cachetest[pk=1]', target)
 
         # Act
         actual = cache.get_model(CacheTest, 1)
@@ -54,9 +72,9 @@ class CacheTestCase(test.TestCase):
         ref_key = cache.set_model_by_attribute(m, 'code')
 
         # Assert
-        self.assertEqual('model:warthog_test.cachetest[code=foo]', ref_key)
+        self.assertEqual('warthog:1:model:warthog_test.cachetest[code=foo]', ref_key)
         key = cache.default_cache.get(ref_key)
-        self.assertEqual('model:warthog_test.cachetest[pk=1]', key)
+        self.assertEqual('warthog:1:model:warthog_test.cachetest[pk=1]', key)
         actual = cache.default_cache.get(key)
         self.assertIsNotNone(actual)
         self.assertIsInstance(actual, CacheTest)
@@ -67,10 +85,35 @@ class CacheTestCase(test.TestCase):
 
         # Arrange
         target = CacheTest(pk=1, code='foo', other=69)
-        cache.default_cache.set('model:warthog_test.cachetest[code=foo]', 'model:warthog_test.cachetest[pk=1]')
-        cache.default_cache.set('model:warthog_test.cachetest[pk=1]', target)
+        cache.default_cache.set('warthog:1:model:warthog_test.cachetest[code=foo]', 'warthog:1:model:warthog_test.cachetest[pk=1]')
+        cache.default_cache.set('warthog:1:model:warthog_test.cachetest[pk=1]', target)
 
         # Act
         actual = cache.get_model_by_attribute(CacheTest, 'code', 'foo')
         self.assertIsNotNone(actual)
         self.assertIsInstance(actual, CacheTest)
+
+    def test_clear_models(self):
+        # Arrange
+        targets = [CacheTest(pk=1, code='foo', other=69), CacheTest(pk=2, code='bar', other=42)]
+        for target in targets:
+            cache.set_model(target)
+
+        # Act
+        actual = cache.clear_models(targets)
+
+        # Assert
+        self.assertEqual(2, actual)
+        self.assertIsNone(cache.get_model(CacheTest, 1))
+        self.assertIsNone(cache.get_model(CacheTest, 2))
+
+    def test_stats(self):
+        cache.stats.reset()
+
+        cache.set('foo', 'bar')
+        cache.get('foo')
+        cache.get('eek')
+        cache.get_many(['foo', 'eek'])
+        cache.delete('foo')
+
+        self.assertEqual({'hits': 2, 'misses': 2, 'sets': 1, 'deletes': 1}, cache.stats.as_dict())
@@ -0,0 +1,130 @@
+from datetime import timedelta
+from django import test
+from django.db import DatabaseError
+from django.db import transaction
+from django.utils import timezone
+from warthog.models import ContentChange, Resource, ResourceType, ResourceTypeField, Template
+
+
+class ContentChangeTestCase(test.TestCase):
+    def setUp(self):
+        self.resource_type = ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+        self.resource = Resource.objects.create(
+            type=self.resource_type, title='Home', slug='home', uri_path='/home', published=True)
+        self.cursor = ContentChange.objects.latest_cursor()
+
+    def changes(self):
+        return [(c.kind, c.object_id, c.action) for c in ContentChange.objects.read(self.cursor, settle=0)]
+
+    def test_model_saves(self):
+        self.resource.title = 'Welcome'
+        self.resource.save()
+        self.resource.fields.create(code='body', value='Hello')
+        template = Template.objects.create(name='page.html', content='{{ title }}')
+        template_id = template.pk
+        template.delete()
+        ResourceTypeField.objects.create(
+            resource_type=self.resource_type, code='summary', field_type='text', label_raw='Summary')
+
+        self.assertEqual([
+            ('resource', self.resource.pk, 'save'),
+            ('fields', self.resource.pk, 'save'),
+            ('template', template_id, 'save'),
+            ('template', template_id, 'delete'),
+            ('resource_type', self.resource_type.pk, 'save'),
+        ], self.changes())
+
+    def test_deletes(self):
+        field = self.resource.fields.create(code='body', value='Hello')
+        type_field = ResourceTypeField.objects.create(
+            resource_type=self.resource_type, code='summary', field_type='text', label_raw='Summary')
+        self.cursor = ContentChange.objects.latest_cursor()
+
+        field.delete()
+        type_field.delete()
+        Resource.objects.filter(pk=self.resource.pk).delete()
+
+        self.assertEqual([
+            ('fields', self.resource.pk, 'save'),
+            ('resource_type', self.resource_type.pk, 'save'),
+            ('resource', self.resource.pk, 'delete'),
+        ], self.changes())
+
+    def test_bulk_operations(self):
+        other = Resource.objects.create(
+            type=self.resource_type, title='About', slug='about', uri_path='/about')
+        self.cursor = ContentChange.objects.latest_cursor()
+
+        Resource.objects.filter(pk__in=[self.resource.pk, other.pk]).publish()
+
+        self.assertEqual(
+            sorted([('resource', self.resource.pk, 'save'), ('resource', other.pk, 'save')]),
+            sorted(self.changes()))
+
+    def test_rolled_back_with_save(self):
+        try:
+            with transaction.atomic():
+                self.resource.title = 'Welcome'
+                self.resource.save()
+                raise ValueError()
+        except ValueError:
+            pass
+
+        self.assertEqual([], self.changes())
+
+    def test_cursor(self):
+        for title in ('One', 'Two', 'Three'):
+            self.resource.title = title
+            self.resource.save()
+
+        first = ContentChange.objects.read(self.cursor, limit=2, settle=0)
+        rest = ContentChange.objects.read(first[-1].pk, settle=0)
+
+        self.assertEqual(2, len(first))
+        self.assertEqual(1, len(rest))
+        self.assertEqual(
+            [c.pk for c in first + rest],
+            [c.pk for c in ContentChange.objects.iter_changes(self.cursor, chunk_size=2, settle=0)])
+
+    def test_settle(self):
+        for title in ('One', 'Two', 'Three'):
+            self.resource.title = title
+            self.resource.save()
+        first, second, third = ContentChange.objects.filter(pk__gt=self.cursor).order_by('pk')
+        # Entry of a transaction that has not committed yet
+        second.delete()
+
+        self.assertEqual([first], ContentChange.objects.read(self.cursor, settle=60))
+        self.assertEqual([], ContentChange.objects.read(first.pk, settle=60))
+
+        # Gap is skipped once the entry after it has settled
+        ContentChange.objects.filter(pk=third.pk).update(created=timezone.now() - timedelta(seconds=61))
+        self.assertEqual([first, third], ContentChange.objects.read(self.cursor, settle=60))
+
+    def test_prune(self):
+        ContentChange.objects.update(created=timezone.now() - timedelta(days=2))
+        self.resource.save()
+
+        self.assertTrue(ContentChange.objects.prune(timezone.now() - timedelta(days=1)) > 0)
+        self.assertEqual(1, ContentChange.objects.count())
+
+
+class ContentChangeTransactionTestCase(test.TransactionTestCase):
+    """Saves under autocommit (outside of a test case transaction)."""
+    def test_atomic_with_save(self):
+        resource_type = ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+        resource = Resource.objects.create(type=resource_type, title='Home', slug='home', uri_path='/home')
+
+        def record(*args, **kwargs):
+            raise DatabaseError()
+        manager = ContentChange._default_manager.__class__
+        original = manager.record
+        manager.record = record
+        try:
+            resource.title = 'Welcome'
+            with self.assertRaises(DatabaseError):
+                resource.save()
+        finally:
+            manager.record = original
+
+        self.assertEqual('Home', Resource.objects.filter(pk=resource.pk).values_list('title', flat=True)[0])
@@ -0,0 +1,194 @@
+import json
+import os
+import shutil
+import tempfile
+from django import test
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.six import StringIO
+from warthog.management.commands.warthog_export_static import MANIFEST_NAME, get_output_path
+from warthog.models import Resource, ResourceField, ResourceSnapshot, ResourceType, Template
+from warthog.tests.render import TEMPLATES
+
+
+class GetOutputPathTestCase(test.SimpleTestCase):
+    def test_index(self):
+        self.assertEqual('index.html', get_output_path('/', 'text/html'))
+        self.assertEqual('about/index.html', get_output_path('/about', 'text/html'))
+        self.assertEqual('about/index.html', get_output_path('/about/', 'text/html'))
+
+    def test_extension(self):
+        self.assertEqual('style.css', get_output_path('/style.css', 'text/css'))
+        self.assertEqual('feed/index.xml', get_output_path('/feed', 'text/xml'))
+
+
+@test.override_settings(TEMPLATES=TEMPLATES)
+class ExportStaticTestCase(test.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+        self.template = Template.objects.create(name='page.html', content='{{ title }}: {{ body }}')
+        resource_type = ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+        self.home = Resource.objects.create(
+            type=resource_type, title='Home', slug='home', uri_path='/', published=True)
+        self.home.fields.create(code='body', value='Welcome')
+        self.about = Resource.objects.create(
+            type=resource_type, title='About', slug='about', uri_path='/about', published=True)
+        Resource.objects.create(type=resource_type, title='Draft', slug='draft', uri_path='/draft')
+        cache.clear()
+
+    def export(self, *args):
+        out = StringIO()
+        call_command('warthog_export_static', self.output_dir, '--processes=1', *args, stdout=out)
+        return out.getvalue()
+
+    def read(self, path):
+        with open(os.path.join(self.output_dir, path)) as f:
+            return f.read()
+
+    def test_export(self):
+        self.assertIn('Exported 2 of 2', self.export())
+
+        self.assertEqual('Home: Welcome', self.read('index.html'))
+        self.assertEqual('About: ', self.read('about/index.html'))
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'draft')))
+        self.assertEqual(2, len(json.loads(self.read(MANIFEST_NAME))))
+
+    def test_incremental(self):
+        self.export()
+
+        field = self.home.fields.get(code='body')
+        field.value = 'Hello'
+        field.save()
+
+        self.assertIn('Exported 1 of 2', self.export())
+        self.assertEqual('Home: Hello', self.read('index.html'))
+
+        self.assertIn('Exported 2 of 2', self.export('--full'))
+
+    def test_unpublished_removed(self):
+        self.export()
+
+        Resource.objects.filter(pk=self.about.pk).unpublish()
+
+        self.assertIn('removed 1 file(s)', self.export())
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'about/index.html')))
+
+    def test_full_keeps_other_files(self):
+        self.export()
+        with open(os.path.join(self.output_dir, 'robots.txt'), 'w') as f:
+            f.write('User-agent: *')
+        Resource.objects.filter(pk=self.about.pk).unpublish()
+
+        self.assertIn('removed 1 file(s)', self.export('--full'))
+        self.assertEqual(sorted([MANIFEST_NAME, 'index.html', 'robots.txt']), sorted(os.listdir(self.output_dir)))
+
+    def test_site(self):
+        site = Site.objects.create(domain='other.example', name='Other')
+        Template.objects.create(
+            name='other.example/page.html',
+            content='{% load cms_tags %}{{ title }} {% get_resource "/contact" as contact %}{{ contact.title }}')
+        resource_type = ResourceType.objects.get(code='page')
+        Resource.objects.create(
+            type=resource_type, site=site, title='Other', slug='home', uri_path='/', published=True)
+        Resource.objects.create(
+            type=resource_type, site=site, title='Contact', slug='contact', uri_path='/contact', published=True)
+
+        self.assertIn('Exported 2 of 2', self.export('--site=%s' % site.pk))
+        self.assertEqual('Other Contact', self.read('index.html'))
+
+
+class ExportImportTestCase(test.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+        self.file_name = os.path.join(self.output_dir, 'resources.jsonl')
+
+        resource_type = ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+        self.home = Resource.objects.create(
+            type=resource_type, title='Home', slug='home', uri_path='/home', published=True)
+        self.home.fields.create(code='body', value='Welcome')
+        child = Resource.objects.create(
+            type=resource_type, title='About', slug='about', parent=self.home, uri_path='/home/about')
+        child.fields.create(code='body', value='About us')
+        cache.clear()
+
+    def export(self):
+        call_command('warthog_export', output=self.file_name, chunk_size=1, stderr=StringIO())
+        with open(self.file_name) as f:
+            return [json.loads(line) for line in f]
+
+    def import_(self):
+        call_command('warthog_import', self.file_name, chunk_size=1, stdout=StringIO())
+
+    def test_export(self):
+        actual = self.export()
+
+        self.assertEqual(['/home', '/home/about'], [r['uri_path'] for r in actual])
+        self.assertEqual('/home', actual[1]['parent'])
+        self.assertEqual('page', actual[1]['type'])
+        self.assertEqual({'body': 'About us'}, actual[1]['fields'])
+
+    def test_import_new(self):
+        self.export()
+        Resource.objects.get(uri_path='/home/about').delete()
+        self.home.delete()
+
+        self.import_()
+
+        home = Resource.objects.get(uri_path='/home')
+        about = Resource.objects.get(uri_path='/home/about')
+        self.assertTrue(home.published)
+        self.assertEqual(home.pk, about.parent_id)
+        self.assertEqual({'body': 'About us'}, ResourceField.objects.get_bundle(about.pk))
+        # Published resources are served from a snapshot of the imported values
+        self.assertEqual({'body': 'Welcome'}, ResourceSnapshot.objects.get_snapshot(home.snapshot_id).fields)
+        self.assertIsNone(about.snapshot_id)
+
+    def test_import_existing(self):
+        self.export()
+        Resource.objects.filter(pk=self.home.pk).update(title='Changed')
+        self.home.fields.update(value='Changed')
+        # Cached before import
+        self.assertEqual('Changed', Resource.objects.get(pk=self.home.pk).title)
+        ResourceField.objects.get_bundle(self.home.pk)
+
+        self.import_()
+
+        self.assertEqual(2, Resource.objects.count())
+        self.assertEqual('Home', Resource.objects.get(pk=self.home.pk).title)
+        self.assertEqual({'body': 'Welcome'}, ResourceField.objects.get_bundle(self.home.pk))
+
+    def test_import_existing_bulk(self):
+        self.export()
+        Resource.objects.update(title='Changed', order=5)
+
+        call_command('warthog_import', self.file_name, chunk_size=10, stdout=StringIO())
+
+        self.assertEqual([('/home', 'Home', 100, None), ('/home/about', 'About', 100, self.home.pk)], list(
+            Resource.objects.order_by('uri_path').values_list('uri_path', 'title', 'order', 'parent')))
+
+    def test_import_existing_parameter_limit(self):
+        self.export()
+        Resource.objects.update(title='Changed')
+        self.addCleanup(delattr, connection.features, 'max_query_params')
+        connection.features.max_query_params = 30
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('warthog_import', self.file_name, chunk_size=10, stdout=StringIO())
+
+        # Each row takes over 20 parameters so is updated by its own statement
+        updates = [q['sql'] for q in queries.captured_queries if 'UPDATE "warthog_resource" ' in q['sql']]
+        self.assertEqual(2, len([sql for sql in updates if '"title" = CASE' in sql]))
+        self.assertEqual(['Home', 'About'], list(Resource.objects.order_by('uri_path').values_list('title', flat=True)))
+
+    def test_import_missing_parent(self):
+        with open(self.file_name, 'w') as f:
+            f.write(json.dumps({'site': 1, 'type': 'page', 'uri_path': '/missing/child', 'parent': '/missing'}))
+
+        with self.assertRaises(CommandError):
+            self.import_()
@@ -0,0 +1,31 @@
+import gzip
+from io import BytesIO
+from django import test
+from warthog import compress
+
+
+class CompressTestCase(test.SimpleTestCase):
+    def test_compress(self):
+        content = b'Hello World ' * 50
+
+        actual = compress.compress(content)
+
+        self.assertEqual(content, actual['identity'])
+        self.assertEqual(content, gzip.GzipFile(fileobj=BytesIO(actual['gzip'])).read())
+
+    def test_compress_short_content(self):
+        self.assertEqual({'identity': b'Hello'}, compress.compress(b'Hello'))
+
+    def test_parse_accept_encoding(self):
+        actual = compress.parse_accept_encoding('gzip;q=0.5, deflate, br; q=0,')
+
+        self.assertEqual({'gzip': 0.5, 'deflate': 1.0, 'br': 0.0}, actual)
+
+    def test_select_encoding(self):
+        variants = {'identity': b'', 'gzip': b''}
+
+        self.assertEqual('gzip', compress.select_encoding('gzip, deflate', variants))
+        self.assertEqual('gzip', compress.select_encoding('*', variants))
+        self.assertEqual('identity', compress.select_encoding('gzip;q=0', variants))
+        self.assertEqual('identity', compress.select_encoding('', variants))
+        self.assertEqual('identity', compress.select_encoding('gzip', {'identity': b''}))
@@ -0,0 +1,128 @@
+import warnings
+from django import test
+from django.core.cache import cache
+from django.db.models import signals
+from django.template import engines
+from warthog.context import CmsRequestContext
+from warthog.data_structures import ResourceItem, ResourceIterator
+from warthog.models import Resource, ResourceType, ResourceTypeField
+
+
+class ResourceIteratorTestCase(test.TestCase):
+    def setUp(self):
+        self.page = ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+        self.home = Resource.objects.create(
+            type=self.page, title='Home', slug='home', uri_path='/', published=True)
+        for idx in range(3):
+            child = Resource.objects.create(
+                type=self.page, parent=self.home, title='Item %s' % idx, slug='item-%s' % idx,
+                uri_path='/item-%s' % idx, menu_title_raw='Menu %s' % idx if idx else '', order=idx,
+                published=idx != 2)
+            child.fields.create(code='code', value='C%s' % idx)
+        news = ResourceType.objects.create(name='News', code='news', default_template='news.html')
+        Resource.objects.create(
+            type=news, parent=self.home, title='News', slug='news', uri_path='/news', published=True, order=9)
+        cache.clear()
+
+    def test_children(self):
+        target = ResourceIterator.for_children(self.home)
+
+        actual = [(item.title, item.menu_title, item.uri_path) for item in target]
+
+        self.assertEqual([
+            ('Item 0', 'Item 0', '/item-0'),
+            ('Item 1', 'Menu 1', '/item-1'),
+            ('News', 'News', '/news'),
+        ], actual)
+        with self.assertNumQueries(0):
+            self.assertEqual(3, len(target))
+
+    def test_len_counted_once(self):
+        target = ResourceIterator.for_children(self.home)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(3, len(target))
+            self.assertEqual(3, len(target))
+
+    def test_no_model_instances(self):
+        created = []
+        receiver = lambda **kwargs: created.append(kwargs['instance'])
+        signals.post_init.connect(receiver, sender=Resource)
+        self.addCleanup(signals.post_init.disconnect, receiver, sender=Resource)
+
+        items = list(ResourceIterator.for_children(self.home))
+
+        self.assertEqual(['C0', 'C1'], [item.vars['code'] for item in items[:2]])
+        self.assertEqual([], created)
+
+    def test_children_of_item_or_pk(self):
+        item = next(iter(ResourceIterator.for_children(self.home)))
+        expected = ['Item 0', 'Item 1', 'News']
+
+        self.assertEqual(expected, [i.title for i in ResourceIterator.for_children(self.home.pk)])
+        self.assertEqual([], [i.title for i in ResourceIterator.for_children(item)])
+
+    def test_nested_menu(self):
+        template = engines['django'].from_string(
+            '{% load cms_tags %}{% get_children as items %}{% for item in items %}{{ item.title }}'
+            '{% get_children item as children %}[{% for child in children %}{{ child.title }}{% endfor %}]'
+            '{% endfor %}')
+        created = []
+        receiver = lambda **kwargs: created.append(kwargs['instance'])
+        signals.post_init.connect(receiver, sender=Resource)
+        self.addCleanup(signals.post_init.disconnect, receiver, sender=Resource)
+        Resource.objects.filter(uri_path='/news').update(parent=None)
+        Resource.objects.filter(uri_path='/item-1').update(parent=Resource.objects.get(uri_path='/item-0'))
+        del created[:]
+
+        actual = template.template.render(CmsRequestContext(None, test.RequestFactory().get('/'), self.home))
+
+        self.assertEqual('Item 0[Item 1]', actual)
+        self.assertEqual([], created)
+
+    def test_for_type(self):
+        actual = [item.title for item in ResourceIterator.for_type(self.page)]
+
+        self.assertEqual(['Item 0', 'Item 1', 'Home'], actual)
+
+    def test_item_from_resource(self):
+        actual = ResourceItem(self.home, {'code': 'H'})
+
+        self.assertEqual((self.home.pk, 'Home', '/'), (actual.pk, actual.title, actual.uri_path))
+        self.assertEqual('H', actual.vars['code'])
+
+    def test_fields_loaded_on_first_use(self):
+        # Menu only using titles does not load fields
+        with self.assertNumQueries(1):
+            items = [item for item in ResourceIterator.for_children(self.home)]
+
+        # Fields of the whole batch are loaded together (along with the field types)
+        with self.assertNumQueries(2):
+            self.assertEqual(['C0', 'C1'], [item.vars['code'] for item in items[:2]])
+
+    def test_values_decoded(self):
+        ResourceTypeField.objects.create(resource_type=self.page, code='featured', field_type='bool')
+        cache.clear()
+
+        actual = ResourceItem(self.home, {'featured': 'false', 'code': 'H'})
+
+        self.assertIs(False, actual.vars['featured'])
+        self.assertEqual('H', actual.vars['code'])
+
+    def test_malformed_value(self):
+        ResourceTypeField.objects.create(resource_type=self.page, code='start', field_type='datetime')
+        cache.clear()
+
+        actual = ResourceItem(self.home, {'start': 'next week'})
+
+        self.assertEqual('next week', actual.vars['start'])
+
+    def test_resource_deprecated(self):
+        item = next(iter(ResourceIterator.for_children(self.home)))
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            actual = item.resource
+
+        self.assertEqual(item.pk, actual.pk)
+        self.assertTrue(issubclass(caught[0].category, DeprecationWarning))
@@ -0,0 +1,200 @@
+from django import test
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.template import engines
+from warthog import dependencies, render
+from warthog.identity import get_identity_map
+from warthog.models import RenderDependency, Resource, ResourceType, Template
+
+
+TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'OPTIONS': {
+        'loaders': ('warthog.loaders.CmsTemplateLoader', ),
+    },
+}]
+
+
+@test.override_settings(TEMPLATES=TEMPLATES)
+class TemplateDependenciesTestCase(test.TestCase):
+    def setUp(self):
+        Template.objects.create(name='base.html', content='{% block body %}{% endblock %}{% include "footer.html" %}')
+        Template.objects.create(name='footer.html', content='Footer')
+
+    def test_extends_and_includes(self):
+        template = engines['django'].from_string(
+            '{% extends "base.html" %}{% block body %}{% include "nav.html" %}{% endblock %}')
+
+        actual = dependencies.get_template_dependencies(template)
+
+        self.assertEqual(set([
+            'template-name.base.html', 'template-name.nav.html', 'template-name.footer.html',
+        ]), actual)
+
+    def test_variable_include(self):
+        template = engines['django'].from_string('{% include name %}')
+
+        self.assertEqual(set([dependencies.ANY_TEMPLATE]), dependencies.get_template_dependencies(template))
+
+
+@test.override_settings(TEMPLATES=TEMPLATES)
+class RenderDependencyTestCase(test.TestCase):
+    def setUp(self):
+        self.header = Template.objects.create(name='header.html', content='Header')
+        Template.objects.create(
+            name='with_snippet.html',
+            content='{% load cms_tags %}{% include "header.html" %} {{ title }} '
+                    '{% get_resource "/snippet" as snippet %}{{ snippet.vars.body }}')
+        Template.objects.create(name='page.html', content='{{ title }}')
+        with_snippet = ResourceType.objects.create(
+            name='With snippet', code='with-snippet', default_template='with_snippet.html')
+        page = ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+        self.snippet = Resource.objects.create(
+            type=page, title='Snippet', slug='snippet', uri_path='/snippet', published=True)
+        self.snippet.fields.create(code='body', value='Old')
+        self.first = Resource.objects.create(
+            type=with_snippet, title='First', slug='first', uri_path='/first', published=True)
+        self.second = Resource.objects.create(
+            type=page, title='Second', slug='second', uri_path='/second', published=True)
+        cache.clear()
+
+    @property
+    def request(self):
+        request = test.RequestFactory().get('/')
+        request.user = AnonymousUser()
+        return request
+
+    def render_page(self, resource):
+        return render.render_resource_page(resource, self.request)['identity']
+
+    def is_cached(self, resource):
+        return cache.get(render.output_cache_key('page', resource, self.request)) is not None
+
+    def test_dependencies_recorded(self):
+        self.render_page(self.first)
+
+        cache_key = render.output_cache_key('page', self.first, self.request)
+        actual = set(RenderDependency.objects.filter(output_key=cache_key).values_list('dependency', flat=True))
+        self.assertTrue(set([
+            'resource-%s' % self.first.pk, 'resource-%s' % self.snippet.pk,
+            'template-name.with_snippet.html', 'template-name.header.html',
+        ]) <= actual)
+
+    def test_shared_snippet_change(self):
+        self.assertEqual(b'Header First Old', self.render_page(self.first))
+        self.render_page(self.second)
+
+        field = self.snippet.fields.get(code='body')
+        field.value = 'New'
+        field.save()
+
+        self.assertFalse(self.is_cached(self.first))
+        self.assertTrue(self.is_cached(self.second))
+        self.assertEqual(b'Header First New', self.render_page(self.first))
+
+    def test_included_template_change(self):
+        self.render_page(self.first)
+        self.render_page(self.second)
+
+        self.header.content = 'Banner'
+        self.header.save()
+
+        self.assertFalse(self.is_cached(self.first))
+        self.assertTrue(self.is_cached(self.second))
+        self.assertEqual(b'Banner First Old', self.render_page(self.first))
+
+    def test_cached_fragment_dependencies(self):
+        request = self.request
+        render.render_resource_fragment(self.first, request)
+
+        # Cached fragment adds it's dependencies to the enclosing render
+        request = self.request
+        tracker = get_identity_map(request).dependencies
+        with self.assertNumQueries(0):
+            with tracker.track() as keys:
+                render.render_resource_fragment(self.first, request)
+
+        self.assertIn('resource-%s' % self.snippet.pk, keys)
+
+    def test_register_unchanged(self):
+        self.render_page(self.first)
+        cache_key = render.output_cache_key('page', self.first, self.request)
+        keys = list(RenderDependency.objects.filter(output_key=cache_key).values_list('dependency', flat=True))
+
+        # Rendered again with the same dependencies; the index is not written
+        with self.assertNumQueries(0):
+            dependencies.register(cache_key, keys)
+
+    def test_register_changed(self):
+        dependencies.register('output', ['a', 'b'])
+        dependencies.register('output', ['b', 'c'])
+
+        self.assertEqual(['b', 'c'], sorted(
+            RenderDependency.objects.filter(output_key='output').values_list('dependency', flat=True)))
+
+    def test_prune(self):
+        self.render_page(self.first)
+        self.render_page(self.second)
+        cache.delete(render.output_cache_key('page', self.first, self.request))
+
+        self.assertEqual(1, dependencies.prune(chunk_size=1))
+        self.assertEqual(
+            {render.output_cache_key('page', self.second, self.request)},
+            set(RenderDependency.objects.values_list('output_key', flat=True)))
+
+
+@test.override_settings(TEMPLATES=TEMPLATES)
+class ListingDependencyTestCase(test.TestCase):
+    def setUp(self):
+        Template.objects.create(
+            name='menu.html',
+            content='{% load cms_tags %}{% get_children as items %}'
+                    '{% for item in items %}{{ item.title }}{{ item.vars.body }} {% endfor %}')
+        menu = ResourceType.objects.create(name='Menu', code='menu', default_template='menu.html')
+        page = ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+        self.first = Resource.objects.create(
+            type=menu, title='First', slug='first', uri_path='/first', published=True)
+        self.second = Resource.objects.create(
+            type=menu, title='Second', slug='second', uri_path='/second', published=True)
+        self.child = Resource.objects.create(
+            type=page, parent=self.first, title='Child', slug='child', uri_path='/first/child', published=True)
+        for idx in range(3):
+            Resource.objects.create(
+                type=page, parent=self.first, title='Item %s' % idx, slug='item-%s' % idx,
+                uri_path='/first/item-%s' % idx, published=True, order=idx)
+        cache.clear()
+
+    @property
+    def request(self):
+        request = test.RequestFactory().get('/')
+        request.user = AnonymousUser()
+        return request
+
+    def render_page(self, resource):
+        return render.render_resource_page(resource, self.request)['identity']
+
+    def test_rows_not_recorded(self):
+        self.render_page(self.first)
+
+        cache_key = render.output_cache_key('page', self.first, self.request)
+        actual = set(RenderDependency.objects.filter(output_key=cache_key).values_list('dependency', flat=True))
+        self.assertIn('section-%s' % self.first.pk, actual)
+        self.assertNotIn('resource-%s' % self.child.pk, actual)
+
+    def test_moved_resource(self):
+        self.assertIn(b'Child', self.render_page(self.first))
+        self.render_page(self.second)
+
+        child = Resource.objects.get(pk=self.child.pk)
+        child.parent = self.second
+        child.save()
+
+        self.assertNotIn(b'Child', self.render_page(self.first))
+        self.assertIn(b'Child', self.render_page(self.second))
+
+    def test_listed_field_change(self):
+        self.render_page(self.first)
+
+        self.child.fields.create(code='body', value='!')
+
+        self.assertIn(b'Child! ', self.render_page(self.first))
@@ -0,0 +1,62 @@
+from django import test
+from django.core.cache import cache
+from warthog.identity import get_identity_map
+from warthog.models import Resource, ResourceType
+
+
+class IdentityMapTestCase(test.TestCase):
+    def setUp(self):
+        self.resource_type = ResourceType.objects.create(
+            name='Page', code='page', default_template='page.html')
+        self.resource = Resource.objects.create(
+            type=self.resource_type, title='Home', slug='home', uri_path='/home', published=True)
+        self.resource.fields.create(code='summary', value='Foo')
+        self.request = test.RequestFactory().get('/')
+        cache.clear()
+
+    def test_get_identity_map_per_request(self):
+        target = get_identity_map(self.request)
+
+        self.assertIs(target, get_identity_map(self.request))
+        self.assertIsNot(target, get_identity_map(test.RequestFactory().get('/')))
+
+    def test_get_resource(self):
+        target = get_identity_map(self.request)
+
+        with self.assertNumQueries(1):
+            actual = target.get_resource(self.resource.pk)
+            self.assertIs(actual, target.get_resource(str(self.resource.pk)))
+            self.assertIs(actual, target.get_resource('/home'))
+
+    def test_get_resource_not_found(self):
+        target = get_identity_map(self.request)
+
+        with self.assertNumQueries(1):
+            self.assertIsNone(target.get_resource('/eek'))
+            self.assertIsNone(target.get_resource('/eek'))
+
+    def test_get_fields(self):
+        target = get_identity_map(self.request)
+
+        with self.assertNumQueries(1):
+            self.assertEqual({'summary': 'Foo'}, target.get_fields(self.resource.pk))
+            cache.clear()
+            self.assertEqual({'summary': 'Foo'}, target.get_fields(self.resource.pk))
+
+    def test_defer_resource(self):
+        other = Resource.objects.create(
+            type=self.resource_type, title='About', slug='about', uri_path='/about', published=True)
+        target = get_identity_map(self.request)
+
+        home = target.defer_resource(self.resource.pk)
+        about = target.defer_resource('/about')
+        missing = target.defer_resource('/eek')
+
+        # Resources and fields are each fetched in a single query (plus the field types used
+        # to decode values, which are then cached)
+        with self.assertNumQueries(3):
+            self.assertEqual('Home', home.title)
+            self.assertEqual('Foo', home.vars['summary'])
+            self.assertEqual('About', about.title)
+            self.assertFalse(missing)
+        self.assertEqual(other.pk, about.pk)
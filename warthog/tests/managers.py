@@ -0,0 +1,86 @@
+import datetime
+from django import test
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from warthog.managers import generate_cache_key
+from warthog.models import Resource, ResourceType
+
+
+class ResourceManagerPublishTestCase(test.TestCase):
+    def setUp(self):
+        cache.clear()
+        self.resource_type = ResourceType.objects.create(
+            name='Page', code='page', default_template='page.html')
+        self.resource = Resource.objects.create(
+            type=self.resource_type, title='Home', slug='home', uri_path='/home', published=True)
+
+    def test_publish_invalidates_cache(self):
+        # Arrange
+        self.assertEqual(self.resource, Resource.objects.get_uri_path('/home'))
+        self.assertIsNotNone(cache.get(generate_cache_key(Resource, uri_path='/home')))
+
+        # Act
+        rows = Resource.objects.filter(pk=self.resource.pk).unpublish()
+
+        # Assert
+        self.assertEqual(1, rows)
+        self.assertIsNone(cache.get(generate_cache_key(Resource, pk=self.resource.pk)))
+        self.assertIsNone(cache.get(generate_cache_key(Resource, uri_path='/home')))
+        self.assertRaises(Resource.DoesNotExist, lambda: Resource.objects.get_uri_path('/home'))
+
+        rows = Resource.objects.publish()
+        self.assertEqual(1, rows)
+        self.assertTrue(Resource.objects.get_uri_path('/home').published)
+
+    def test_schedule(self):
+        publish_date = timezone.now() + datetime.timedelta(days=1)
+        Resource.objects.filter(pk=self.resource.pk).schedule(publish_date=publish_date)
+
+        actual = Resource.objects.get(pk=self.resource.pk)
+        self.assertEqual(Resource.STATUS_SCHEDULED, actual.published_status)
+
+    def test_schedule_invalid_range(self):
+        now = timezone.now()
+        self.assertRaises(ValidationError, lambda: Resource.objects.schedule(now, now - datetime.timedelta(days=1)))
+
+    def test_live(self):
+        now = timezone.now()
+        self.assertEqual([self.resource], list(Resource.objects.live()))
+
+        Resource.objects.filter(pk=self.resource.pk).update(unpublish_date=now - datetime.timedelta(minutes=5))
+        self.assertEqual([], list(Resource.objects.live()))
+
+    def test_transitioned(self):
+        now = timezone.now()
+        Resource.objects.filter(pk=self.resource.pk).update(publish_date=now - datetime.timedelta(minutes=5))
+
+        self.assertEqual([self.resource], list(Resource.objects.transitioned(now - datetime.timedelta(minutes=10))))
+        self.assertEqual([], list(Resource.objects.transitioned(now - datetime.timedelta(minutes=1))))
+
+    def test_next_transition(self):
+        self.assertIsNone(Resource.objects.next_transition())
+
+        unpublish_date = timezone.now() + datetime.timedelta(hours=1)
+        Resource.objects.schedule(unpublish_date=unpublish_date)
+        self.assertEqual(unpublish_date, Resource.objects.next_transition())
+
+
+class ResourceTypeManagerTestCase(test.TestCase):
+    def setUp(self):
+        cache.clear()
+        self.section = ResourceType.objects.create(name='Section', code='section', default_template='section.html')
+        self.page = ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+        self.section.child_types.add(self.section, self.page)
+
+    def test_child_type_map(self):
+        with self.assertNumQueries(1):
+            expected = {self.section.pk: [(self.page.pk, 'Page'), (self.section.pk, 'Section')]}
+            self.assertEqual(expected, ResourceType.objects.child_type_map())
+            self.assertEqual(expected, ResourceType.objects.child_type_map())
+
+    def test_child_type_map_invalidated(self):
+        ResourceType.objects.child_type_map()
+        self.page.child_types.add(self.page)
+
+        self.assertEqual([(self.page.pk, 'Page')], ResourceType.objects.child_type_map()[self.page.pk])
@@ -0,0 +1,62 @@
+from django import test
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from warthog.index import UriPathIndex
+from warthog.middleware import CmsRequestMiddleware
+from warthog.models import Resource, ResourceType, Template
+from warthog.tests.render import TEMPLATES
+
+
+class UriPathIndexTestCase(test.TestCase):
+    def setUp(self):
+        cache.clear()
+        self.resource_type = ResourceType.objects.create(
+            name='Page', code='page', default_template='page.html')
+        Resource.objects.create(
+            type=self.resource_type, title='Home', slug='home', uri_path='/home', published=True)
+        Resource.objects.create(
+            type=self.resource_type, title='Draft', slug='draft', uri_path='/draft', published=False)
+
+    def test_contains(self):
+        target = UriPathIndex()
+
+        self.assertIn('/home', target)
+        self.assertIn('/home/', target)
+        self.assertNotIn('/draft', target)
+        self.assertNotIn('/admin/', target)
+
+    def test_rebuilt_when_resources_change(self):
+        target = UriPathIndex()
+        self.assertNotIn('/about', target)
+
+        Resource.objects.create(
+            type=self.resource_type, title='About', slug='about', uri_path='/about', published=True)
+        target._checked = 0  # Skip check interval
+
+        self.assertIn('/about', target)
+
+
+@test.override_settings(TEMPLATES=TEMPLATES)
+class CmsRequestMiddlewareTestCase(test.TestCase):
+    def setUp(self):
+        cache.clear()
+        Template.objects.create(name='page.html', content='{{ title }}')
+        resource_type = ResourceType.objects.create(
+            name='Page', code='page', default_template='page.html')
+        Resource.objects.create(
+            type=resource_type, title='Home', slug='home', uri_path='/home', published=True)
+        self.target = CmsRequestMiddleware()
+
+    def get(self, path):
+        request = test.RequestFactory().get(path)
+        request.user = AnonymousUser()
+        return self.target.process_request(request)
+
+    def test_cms_path(self):
+        actual = self.get('/home')
+
+        self.assertEqual(200, actual.status_code)
+        self.assertEqual('Home', actual.content)
+
+    def test_other_path(self):
+        self.assertIsNone(self.get('/admin/'))
@@ -96,6 +96,17 @@ class ContentModelTestCase(test.TestCase):
         target = Resource(parent=parent)
         self.assertFalse(target.is_root)
 
+    def test_next_transition(self):
+        self.assertIsNone(TEST_RESOURCES['live'].next_transition)
+        self.assertIsNone(TEST_RESOURCES['expired'].next_transition)
+        self.assertEqual(FUTURE, TEST_RESOURCES['scheduled'].next_transition)
+        self.assertEqual(FUTURE, TEST_RESOURCES['live_in_range'].next_transition)
+
+    def test_seconds_to_transition(self):
+        self.assertIsNone(TEST_RESOURCES['live'].seconds_to_transition)
+        actual = TEST_RESOURCES['scheduled'].seconds_to_transition
+        self.assertTrue(0 < actual <= THIRTY_MINUTES.total_seconds())
+
     def test_menu_title(self):
         target = Resource(title="Foo")
         self.assertEqual("Foo", target.menu_title)
@@ -0,0 +1,118 @@
+from django import test
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from warthog import purge
+from warthog.conf import settings
+from warthog.models import Resource, ResourceType, Template
+from warthog.tests.render import TEMPLATES
+from warthog.views import Cms
+
+
+class PurgeDispatcherTestCase(test.SimpleTestCase):
+    def test_batched(self):
+        target = purge.PurgeDispatcher(purge.MemoryPurgeBackend(), 60)
+        self.addCleanup(target.flush)
+
+        target.purge(['resource-2', 'resource-1'])
+        target.purge(['resource-1'])
+        self.assertEqual([], target.backend.requests)
+
+        target.flush()
+        self.assertEqual([['resource-1', 'resource-2']], target.backend.requests)
+        self.assertIsNone(target.timer)
+
+    def test_immediate(self):
+        target = purge.PurgeDispatcher(purge.MemoryPurgeBackend(), 0)
+        target.backend.max_keys = 2
+
+        target.purge(['a', 'b', 'c'])
+
+        self.assertEqual([['a', 'b'], ['c']], target.backend.requests)
+
+
+@test.override_settings(TEMPLATES=TEMPLATES)
+class PurgeTestCase(test.TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, purge, '_dispatcher', purge._dispatcher)
+        purge._dispatcher = self.dispatcher = purge.PurgeDispatcher(purge.MemoryPurgeBackend(), 0)
+
+        self.template = Template.objects.create(name='page.html', content='{{ title }}')
+        resource_type = ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+        self.home = Resource.objects.create(
+            type=resource_type, title='Home', slug='home', uri_path='/home', published=True)
+        self.about = Resource.objects.create(
+            type=resource_type, title='About', slug='about', uri_path='/home/about', parent=self.home,
+            published=True)
+        cache.clear()
+        self.requests = self.dispatcher.backend.requests
+        del self.requests[:]
+
+    def test_resource_saved(self):
+        self.about.save()
+
+        self.assertEqual([sorted(['resource-%s' % self.about.pk, 'resource-%s' % self.home.pk,
+                                  'section-%s' % self.home.pk, 'type-listing.%s' % self.about.type_id,
+                                  purge.OVERFLOW_KEY])],
+                         self.requests)
+
+    def test_field_saved(self):
+        self.home.fields.create(code='body', value='Body')
+
+        # Output listing the resource is purged as it may show its fields
+        self.assertEqual([[purge.OVERFLOW_KEY, 'resource-%s' % self.home.pk, 'type-listing.%s' % self.home.type_id]],
+                         self.requests)
+
+    def test_bulk_publish(self):
+        Resource.objects.all().unpublish()
+
+        self.assertEqual(
+            sorted(['resource-%s' % self.home.pk, 'resource-%s' % self.about.pk, 'section-%s' % self.home.pk,
+                    'type-listing.%s' % self.home.type_id, purge.OVERFLOW_KEY]),
+            self.requests[0])
+
+    def test_template_saved(self):
+        self.template.save()
+
+        self.assertEqual(
+            [[purge.OVERFLOW_KEY, 'template-%s' % self.template.pk, 'template-name.*', 'template-name.page.html']],
+            self.requests)
+
+    def test_surrogate_key_header(self):
+        request = test.RequestFactory().get('/home/about')
+        request.user = AnonymousUser()
+
+        actual = Cms.as_view()(request)
+
+        self.assertEqual(
+            'resource-%s type-%s site-%s template-%s section-%s '
+            'template-name.example.com/page.html template-name.page.html' % (
+                self.about.pk, self.about.type_id, self.about.site_id, self.template.pk, self.home.pk),
+            actual['Surrogate-Key'])
+
+    def test_surrogate_key_header_dependencies(self):
+        self.template.content = '{% load cms_tags %}{% get_resource "/home" as home %}{{ home.title }}'
+        self.template.save()
+        request = test.RequestFactory().get('/home/about')
+        request.user = AnonymousUser()
+        Cms.as_view()(request)
+
+        # Dependencies of a cached page are also sent
+        request = test.RequestFactory().get('/home/about')
+        request.user = AnonymousUser()
+        actual = Cms.as_view()(request)
+
+        self.assertIn('resource-%s' % self.home.pk, actual['Surrogate-Key'].split())
+
+    def test_surrogate_key_header_overflow(self):
+        self.template.content = '{% load cms_tags %}{% get_resource "/home" as home %}{{ home.title }}'
+        self.template.save()
+        request = test.RequestFactory().get('/home/about')
+        request.user = AnonymousUser()
+        self.addCleanup(setattr, settings, 'CMS_SURROGATE_KEY_MAX_LENGTH', settings.CMS_SURROGATE_KEY_MAX_LENGTH)
+        settings.CMS_SURROGATE_KEY_MAX_LENGTH = 60
+
+        actual = Cms.as_view()(request)['Surrogate-Key'].split()
+
+        self.assertNotIn('resource-%s' % self.home.pk, actual)
+        self.assertEqual(purge.OVERFLOW_KEY, actual[-1])
+        self.assertIn('site-%s' % self.about.site_id, actual)
@@ -0,0 +1,246 @@
+import gzip
+from io import BytesIO
+from django import test
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.template import Context, TemplateDoesNotExist, engines
+from warthog import render
+from warthog.views import Cms
+from warthog.context import CmsRequestContext
+from warthog.models import Resource, ResourceType, Template
+
+
+TEMPLATES = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'OPTIONS': {
+        'loaders': ('warthog.loaders.CmsTemplateLoader', ),
+    },
+}]
+
+
+@test.override_settings(TEMPLATES=TEMPLATES)
+class RenderResourceFragmentTestCase(test.TestCase):
+    def setUp(self):
+        self.template = Template.objects.create(name='snippet.html', content='{{ title }}: {{ body }}')
+        self.resource_type = ResourceType.objects.create(
+            name='Snippet', code='snippet', default_template='snippet.html')
+        self.resource = Resource.objects.create(
+            type=self.resource_type, title='Footer', slug='footer', uri_path='/footer', published=True)
+        self.resource.fields.create(code='body', value='Old')
+        cache.clear()
+
+    @property
+    def request(self):
+        # New request for each render (field lookups are memoised per request)
+        return test.RequestFactory().get('/')
+
+    def test_output_cached(self):
+        self.assertEqual('Footer: Old', render.render_resource_fragment(self.resource, self.request))
+
+        with self.assertNumQueries(0):
+            self.assertEqual('Footer: Old', render.render_resource_fragment(self.resource, self.request))
+
+    def test_invalidated_on_field_change(self):
+        render.render_resource_fragment(self.resource, self.request)
+
+        field = self.resource.fields.get(code='body')
+        field.value = 'New'
+        field.save()
+
+        self.assertEqual('Footer: New', render.render_resource_fragment(self.resource, self.request))
+
+    def test_invalidated_on_template_change(self):
+        render.render_resource_fragment(self.resource, self.request)
+
+        self.template.content = '{{ body }}'
+        self.template.save()
+
+        self.assertEqual('Old', render.render_resource_fragment(self.resource, self.request))
+
+    def test_template_not_cacheable(self):
+        self.template.cacheable = False
+        self.template.save()
+        render.render_resource_fragment(self.resource, self.request)
+
+        # Template is loaded (site specific then default name) and rendered again
+        with self.assertNumQueries(2):
+            self.assertEqual('Footer: Old', render.render_resource_fragment(self.resource, self.request))
+
+
+@test.override_settings(TEMPLATES=TEMPLATES)
+class RenderResourceInContextTestCase(test.TestCase):
+    def setUp(self):
+        Template.objects.create(name='snippet.html', content='{{ title }}: {{ body }} {{ parent_var }}')
+        self.resource_type = ResourceType.objects.create(
+            name='Snippet', code='snippet', default_template='snippet.html')
+        self.resource = Resource.objects.create(
+            type=self.resource_type, title='Footer', slug='footer', uri_path='/footer', published=True)
+        self.resource.fields.create(code='body', value='Body')
+        self.request = test.RequestFactory().get('/')
+
+    def test_render(self):
+        context = CmsRequestContext(None, self.request, 'parent', {'title': 'Page', 'parent_var': 'Parent'})
+
+        with context.bind_template(engines['django'].from_string('').template):
+            actual = render.render_resource_in_context(self.resource, self.request, context)
+
+        # Variables of the parent are not visible as the output is cached
+        self.assertEqual('Footer: Body ', actual)
+        # Context is unchanged
+        self.assertEqual('Page', context['title'])
+        self.assertEqual('parent', context.resource)
+
+
+    @test.override_settings(TEMPLATES=[dict(TEMPLATES[0], OPTIONS=dict(
+        TEMPLATES[0]['OPTIONS'], context_processors=('django.template.context_processors.request', )))])
+    def test_nested_context_processors(self):
+        Template.objects.create(
+            name='outer.html', content='{% load cms_include %}[{{ request.path }} {% inline_resource "/footer" %}]')
+        Template.objects.create(name='page.html', content='{% load cms_include %}{% inline_resource "/outer" %}')
+        outer_type = ResourceType.objects.create(name='Outer', code='outer', default_template='outer.html')
+        Resource.objects.create(type=outer_type, title='Outer', slug='outer', uri_path='/outer', published=True)
+        page_type = ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+        page = Resource.objects.create(type=page_type, title='Page', slug='page', uri_path='/page', published=True)
+        self.request.user = AnonymousUser()
+
+        actual = render.render_resource(page, self.request)
+
+        # Values of context processors (eg request) are available to nested inline resources
+        self.assertEqual('[/ Footer: Body ]', actual)
+
+
+@test.override_settings(TEMPLATES=TEMPLATES)
+class RenderResourcePageTestCase(test.TestCase):
+    def setUp(self):
+        Template.objects.create(name='page.html', content='{{ title }}: {{ body }}')
+        resource_type = ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+        self.resource = Resource.objects.create(
+            type=resource_type, title='Home', slug='home', uri_path='/home', published=True)
+        self.resource.fields.create(code='body', value='Welcome ' * 50)
+        cache.clear()
+
+    def get(self, **extra):
+        request = test.RequestFactory().get('/home', **extra)
+        request.user = AnonymousUser()
+        return request
+
+    def test_precompressed(self):
+        actual = render.render_resource_page(self.resource, self.get())
+
+        self.assertEqual(b'Home: ' + b'Welcome ' * 50, actual['identity'])
+        self.assertEqual(actual['identity'], gzip.GzipFile(fileobj=BytesIO(actual['gzip'])).read())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(actual, render.render_resource_page(self.resource, self.get()))
+
+    def test_view_encoding(self):
+        view = Cms.as_view()
+
+        actual = view(self.get(HTTP_ACCEPT_ENCODING='gzip, deflate'))
+
+        self.assertEqual('gzip', actual['Content-Encoding'])
+        self.assertEqual('Accept-Encoding', actual['Vary'])
+        self.assertEqual(b'Home: ' + b'Welcome ' * 50, gzip.GzipFile(fileobj=BytesIO(actual.content)).read())
+
+        actual = view(self.get())
+
+        self.assertFalse(actual.has_header('Content-Encoding'))
+        self.assertEqual(b'Home: ' + b'Welcome ' * 50, actual.content)
+
+    def test_query_string_not_cached(self):
+        request = test.RequestFactory().get('/home', {'q': 'welcome'})
+        request.user = AnonymousUser()
+
+        render.render_resource_page(self.resource, request)
+
+        self.assertIsNone(render.output_cache_key('page', self.resource, request))
+        self.assertIsNone(cache.get(render.output_cache_key('page', self.resource, self.get())))
+
+    @test.override_settings(TEMPLATES=[dict(TEMPLATES[0], OPTIONS=dict(
+        TEMPLATES[0]['OPTIONS'], context_processors=['django.template.context_processors.csrf']))])
+    def test_csrf_token_not_cached(self):
+        Template.objects.filter(name='page.html').update(content='<form>{% csrf_token %}</form>')
+        request = self.get()
+        request.META['CSRF_COOKIE'] = 'a' * 32
+
+        actual = render.render_resource_page(self.resource, request)
+
+        self.assertIn(b'csrfmiddlewaretoken', actual['identity'])
+        self.assertTrue(request.META['CSRF_COOKIE_USED'])
+        self.assertIsNone(cache.get(render.output_cache_key('page', self.resource, self.get())))
+
+
+@test.override_settings(TEMPLATES=TEMPLATES)
+class StreamResourceTestCase(test.TestCase):
+    def setUp(self):
+        Template.objects.create(
+            name='feed.csv', mime_type='text/csv', streaming=True,
+            content='title\n{% load cms_tags %}{% get_children as children %}'
+                    '{% for child in children %}{{ forloop.counter }},{{ child.title }},{{ child.vars.code }}\n'
+                    '{% empty %}none{% endfor %}')
+        resource_type = ResourceType.objects.create(name='Feed', code='feed', default_template='feed.csv')
+        self.resource = Resource.objects.create(
+            type=resource_type, title='Feed', slug='feed', uri_path='/feed', published=True)
+        for idx in range(3):
+            child = Resource.objects.create(
+                type=resource_type, parent=self.resource, title='Item %s' % idx, slug='item-%s' % idx,
+                published=True)
+            child.fields.create(code='code', value='C%s' % idx)
+        cache.clear()
+
+    def get(self):
+        request = test.RequestFactory().get('/feed')
+        request.user = AnonymousUser()
+        return request
+
+    def test_stream(self):
+        actual = ''.join(render.stream_resource(self.resource, self.get()))
+
+        self.assertEqual('title\n1,Item 0,C0\n2,Item 1,C1\n3,Item 2,C2\n', actual)
+
+    def test_stream_empty(self):
+        Resource.objects.filter(parent=self.resource).delete()
+
+        self.assertEqual('title\nnone', ''.join(render.stream_resource(self.resource, self.get())))
+
+    def test_missing_template_raises_before_streaming(self):
+        Template.objects.filter(name='feed.csv').delete()
+
+        with self.assertRaises(TemplateDoesNotExist):
+            render.stream_resource(self.resource, self.get())
+
+    def test_loop_iterations_streamed(self):
+        consumed = []
+
+        class Items(object):
+            def __len__(self):
+                return 3
+
+            def __iter__(self):
+                for idx in range(3):
+                    consumed.append(idx)
+                    yield idx
+
+        template = engines['django'].from_string('{% for i in items %}{{ i }},{% endfor %}').template
+
+        actual = render.iter_template(template, Context({'items': Items()}))
+
+        self.assertEqual('0,', next(actual))
+        self.assertEqual([0], consumed)
+        self.assertEqual(['1,', '2,'], list(actual))
+
+    def test_loop_same_as_render(self):
+        template = engines['django'].from_string(
+            '{% for a, b in pairs reversed %}{{ forloop.counter }}{{ a }}{{ b }}{% if forloop.last %}.{% endif %}'
+            '{% endfor %}{{ a }}').template
+        context = {'pairs': [(1, 2), (3, 4)], 'a': 'x'}
+
+        self.assertEqual(
+            template.render(Context(context)), ''.join(render.iter_template(template, Context(context))))
+
+    def test_view(self):
+        actual = Cms.as_view()(self.get())
+
+        self.assertTrue(actual.streaming)
+        self.assertEqual('text/csv; charset=utf-8', actual['Content-Type'])
+        self.assertEqual(b'title\n1,Item 0,C0\n2,Item 1,C1\n3,Item 2,C2\n', b''.join(actual.streaming_content))
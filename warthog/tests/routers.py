@@ -0,0 +1,91 @@
+from django import test
+from django.core.cache import cache
+from django.http import HttpResponse
+from warthog import routers
+from warthog.conf import settings
+from warthog.middleware import ReplicaStickinessMiddleware
+from warthog.models import RenderDependency, Resource, ResourceType
+
+
+@test.override_settings(DATABASE_ROUTERS=['warthog.routers.ReadReplicaRouter'])
+class ReadReplicaRouterTestCase(test.TestCase):
+    def setUp(self):
+        old = settings.CMS_READ_DATABASES
+        settings.CMS_READ_DATABASES = ('replica', )
+        self.addCleanup(setattr, settings, 'CMS_READ_DATABASES', old)
+        routers.reset()
+        self.addCleanup(routers.reset)
+        cache.clear()
+        self.target = routers.ReadReplicaRouter()
+
+    def test_reads_primary_by_default(self):
+        self.assertIsNone(self.target.db_for_read(Resource))
+        self.assertEqual('default', Resource.objects.all().db)
+
+    def test_reads_replica_in_replica_mode(self):
+        with routers.read_mode(routers.REPLICA):
+            self.assertEqual('replica', self.target.db_for_read(Resource))
+            self.assertEqual('replica', Resource.objects.all().db)
+            self.assertIsNone(self.target.db_for_read(RenderDependency))
+
+    def test_front_display_reads_replica(self):
+        self.assertEqual('replica', Resource.objects.filter_front().db)
+
+        with routers.read_mode(routers.PRIMARY):
+            self.assertEqual('default', Resource.objects.filter_front().db)
+
+    def test_no_replicas(self):
+        settings.CMS_READ_DATABASES = ()
+
+        with routers.read_mode(routers.REPLICA):
+            self.assertEqual('default', Resource.objects.filter_front().db)
+
+    def test_sticky_after_write(self):
+        resource_type = ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+
+        self.assertTrue(routers.has_written())
+        with routers.read_mode(routers.REPLICA):
+            self.assertEqual('default', Resource.objects.filter(type=resource_type).db)
+
+    def test_primary_after_write_by_other_user(self):
+        ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+        # Request of another user (in the same cache)
+        routers.reset()
+
+        with routers.read_mode(routers.REPLICA):
+            self.assertFalse(routers.is_pinned())
+            self.assertEqual('default', Resource.objects.filter_front().db)
+
+        cache.delete(routers.recent_write_key())
+        with routers.read_mode(routers.REPLICA):
+            self.assertEqual('replica', Resource.objects.filter_front().db)
+
+    def test_render_dependencies_not_sticky(self):
+        RenderDependency.objects.create(dependency='resource-1', output_key='page')
+
+        self.assertFalse(routers.is_pinned())
+
+
+class ReplicaStickinessMiddlewareTestCase(test.SimpleTestCase):
+    def setUp(self):
+        routers.reset()
+        self.addCleanup(routers.reset)
+        self.target = ReplicaStickinessMiddleware()
+
+    def test_cookie_set_after_write(self):
+        request = test.RequestFactory().get('/')
+        self.target.process_request(request)
+        routers.ReadReplicaRouter().db_for_write(Resource)
+
+        response = self.target.process_response(request, HttpResponse())
+
+        self.assertIn(self.target.cookie_name, response.cookies)
+
+    def test_cookie_pins_to_primary(self):
+        request = test.RequestFactory().get('/')
+        request.COOKIES[self.target.cookie_name] = '1'
+
+        self.target.process_request(request)
+
+        self.assertTrue(routers.is_pinned())
+        self.assertNotIn(self.target.cookie_name, self.target.process_response(request, HttpResponse()).cookies)
@@ -0,0 +1,105 @@
+from django import test
+from django.core.cache import cache
+from django.template import Context, Template as DjangoTemplate
+from warthog import search
+from warthog.conf import settings
+from warthog.models import Resource, ResourceType, SearchTerm
+
+
+class SearchTestMixin(object):
+    backend = None
+
+    def setUp(self):
+        self.addCleanup(setattr, settings, 'CMS_SEARCH_BACKEND', settings.CMS_SEARCH_BACKEND)
+        settings.CMS_SEARCH_BACKEND = self.backend
+
+        resource_type = ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+        resource_type.fields.create(code='body', field_type='html')
+        resource_type.fields.create(code='summary', field_type='char')
+
+        self.warthog = Resource.objects.create(
+            type=resource_type, title='Warthog', slug='warthog', uri_path='/warthog', published=True)
+        self.warthog.fields.create(code='body', value='<p>The warthog is a wild member of the pig family.</p>')
+        self.pig = Resource.objects.create(
+            type=resource_type, title='Pig farming', slug='pig', uri_path='/pig', published=True)
+        self.pig.fields.create(code='body', value='Pig &amp; hog farming.')
+        self.pig.fields.create(code='summary', value='Zebra')
+        self.draft = Resource.objects.create(
+            type=resource_type, title='Draft pig', slug='draft', uri_path='/draft')
+        cache.clear()
+
+    def test_ranked(self):
+        actual = list(search.search('pig'))
+
+        self.assertEqual([self.pig, self.warthog], actual)
+
+    def test_all_terms_match(self):
+        self.assertEqual([self.warthog], list(search.search('wild PIG')))
+        self.assertEqual([], list(search.search('wild hog')))
+
+    def test_html_stripped(self):
+        self.assertEqual([self.pig], list(search.search('hog')))
+        self.assertEqual([], list(search.search('amp')))
+
+    def test_other_field_types_not_indexed(self):
+        self.assertEqual([], list(search.search('zebra')))
+
+    def test_incremental_update(self):
+        field = self.warthog.fields.get(code='body')
+        field.value = 'An African zebra'
+        field.save()
+
+        self.assertEqual([self.warthog], list(search.search('zebra')))
+        self.assertEqual([self.pig], list(search.search('pig')))
+
+    def test_deleted(self):
+        self.pig.fields.all().delete()
+        self.pig.delete()
+
+        self.assertEqual([self.warthog], list(search.search('pig')))
+
+    def test_empty_query(self):
+        self.assertEqual([], list(search.search(' ! ')))
+
+    def test_template_tag(self):
+        template = DjangoTemplate(
+            '{% load cms_tags %}{% search_resources q as results %}'
+            '{% for result in results %}{{ result.uri_path }} {% endfor %}')
+
+        self.assertEqual('/pig /warthog ', template.render(Context({'q': 'pig'})))
+
+    def test_template_tag_invalid_parameters(self):
+        template = DjangoTemplate(
+            '{% load cms_tags %}{% search_resources q limit=limit offset=offset as results %}'
+            '{% for result in results %}{{ result.uri_path }} {% endfor %}')
+
+        actual = template.render(Context({'q': 'pig', 'limit': 'ten', 'offset': '-1'}))
+
+        self.assertEqual('/pig /warthog ', actual)
+
+    def test_indexes_published_snapshot(self):
+        Resource.objects.filter(pk=self.warthog.pk).publish()
+        field = self.warthog.fields.get(code='body')
+        field.value = 'An African zebra'
+        field.save()
+
+        # Draft changes are not searchable until published
+        self.assertEqual([], list(search.search('zebra')))
+        self.assertEqual([self.pig, self.warthog], list(search.search('pig')))
+
+        Resource.objects.filter(pk=self.warthog.pk).publish()
+
+        self.assertEqual([self.warthog], list(search.search('zebra')))
+
+
+class TableSearchTestCase(SearchTestMixin, test.TestCase):
+    backend = 'table'
+
+    def test_weights(self):
+        # Title and body
+        self.assertEqual(search.TITLE_WEIGHT + 1, SearchTerm.objects.get(resource=self.pig, term='farming').weight)
+        self.assertEqual(1, SearchTerm.objects.get(resource=self.pig, term='hog').weight)
+
+
+class FtsSearchTestCase(SearchTestMixin, test.TestCase):
+    backend = 'fts5'
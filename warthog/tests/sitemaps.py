@@ -0,0 +1,71 @@
+import datetime
+from django import test
+from django.core.cache import cache
+from django.http import Http404
+from django.utils import timezone
+from warthog import sitemaps
+from warthog.conf import settings
+from warthog.models import Resource, ResourceType
+from warthog.views import Sitemap
+
+
+class SitemapTestCase(test.TestCase):
+    def setUp(self):
+        resource_type = ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+        for name in ('c', 'a', 'e', 'b', 'd'):
+            Resource.objects.create(
+                type=resource_type, title=name, slug=name, uri_path='/%s' % name, published=True)
+        Resource.objects.create(type=resource_type, title='Draft', slug='draft', uri_path='/draft')
+        Resource.objects.create(
+            type=resource_type, title='Scheduled', slug='scheduled', uri_path='/scheduled', published=True,
+            publish_date=timezone.now() + datetime.timedelta(days=1))
+        cache.clear()
+
+        self.addCleanup(setattr, settings, 'CMS_SITEMAP_SHARD_SIZE', settings.CMS_SITEMAP_SHARD_SIZE)
+        settings.CMS_SITEMAP_SHARD_SIZE = 2
+        self.view = Sitemap.as_view()
+
+    def get(self, path, **kwargs):
+        return self.view(test.RequestFactory().get(path), **kwargs)
+
+    def test_keyset_iterator(self):
+        actual = [r[0] for r in Resource.objects.live().keyset_iterator(chunk_size=2)]
+
+        self.assertEqual(['/a', '/b', '/c', '/d', '/e'], actual)
+
+    def test_shard_keys(self):
+        actual = sitemaps.get_shard_keys(Resource.objects.get(uri_path='/a').site, 'gen')
+
+        self.assertEqual([None, '/b', '/d'], [k and k[0] for k in actual])
+
+    def test_index(self):
+        actual = self.get('/sitemap.xml')
+
+        self.assertEqual('application/xml', actual['Content-Type'])
+        self.assertIn('<loc>http://testserver/sitemap-1.xml</loc>', actual.content)
+        self.assertIn('<loc>http://testserver/sitemap-3.xml</loc>', actual.content)
+        self.assertNotIn('sitemap-4.xml', actual.content)
+
+    def test_shard(self):
+        actual = self.get('/sitemap-2.xml', shard='2')
+
+        content = b''.join(actual.streaming_content)
+        self.assertIn('<loc>http://example.com/c</loc>', content)
+        self.assertIn('<loc>http://example.com/d</loc>', content)
+        self.assertEqual(2, content.count('<url>'))
+
+        # Served from cache
+        with self.assertNumQueries(0):
+            actual = self.get('/sitemap-2.xml', shard='2')
+        self.assertEqual(content, actual.content)
+
+    def test_shard_invalidated(self):
+        b''.join(self.get('/sitemap-1.xml', shard='1').streaming_content)
+
+        Resource.objects.filter(uri_path='/b').unpublish()
+
+        actual = b''.join(self.get('/sitemap-1.xml', shard='1').streaming_content)
+        self.assertIn('<loc>http://example.com/c</loc>', actual)
+
+    def test_shard_not_found(self):
+        self.assertRaises(Http404, self.get, '/sitemap-4.xml', shard='4')
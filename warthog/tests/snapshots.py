@@ -0,0 +1,139 @@
+from datetime import timedelta
+from django import test
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from warthog.admin import ResourceAdmin
+from warthog.data_structures import ResourceIterator
+from warthog.models import Resource, ResourceSnapshot, ResourceType, Template
+from warthog.tests.render import TEMPLATES
+from warthog.views import Cms, CmsPreview
+
+
+@test.override_settings(TEMPLATES=TEMPLATES)
+class ResourceSnapshotTestCase(test.TestCase):
+    def setUp(self):
+        Template.objects.create(name='page.html', content='{{ title }}: {{ body }}')
+        resource_type = ResourceType.objects.create(name='Page', code='page', default_template='page.html')
+        self.resource = Resource.objects.create(
+            type=resource_type, title='Home', slug='home', uri_path='/home')
+        self.field = self.resource.fields.create(code='body', value='Welcome')
+        cache.clear()
+
+    def get(self, view, user=None, *args):
+        request = test.RequestFactory().get('/home')
+        request.user = user or AnonymousUser()
+        return view.as_view()(request, *args).content
+
+    def test_publish(self):
+        self.assertEqual(1, Resource.objects.filter(pk=self.resource.pk).publish())
+
+        resource = Resource.objects.get(pk=self.resource.pk)
+        self.assertTrue(resource.published)
+        snapshot = ResourceSnapshot.objects.get_snapshot(resource.snapshot_id)
+        self.assertEqual('Home', snapshot.title)
+        self.assertEqual('page.html', snapshot.template)
+        self.assertEqual({'body': 'Welcome'}, snapshot.fields)
+
+    def test_publish_bulk(self):
+        for idx in range(3):
+            Resource.objects.create(
+                type=self.resource.type, title='Page %s' % idx, slug='page-%s' % idx, uri_path='/page-%s' % idx)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(4, Resource.objects.all().publish())
+
+        statements = [q['sql'] for q in queries.captured_queries]
+        self.assertEqual(1, len([sql for sql in statements if 'INSERT INTO "warthog_resourcesnapshot"' in sql]))
+        self.assertEqual(1, len([sql for sql in statements if 'UPDATE "warthog_resource" ' in sql]))
+        self.assertEqual(
+            {'Home', 'Page 0', 'Page 1', 'Page 2'},
+            set(ResourceSnapshot.objects.get_snapshot(r.snapshot_id).title for r in Resource.objects.all()))
+
+    def test_publish_parameter_limit(self):
+        for idx in range(3):
+            Resource.objects.create(
+                type=self.resource.type, title='Page %s' % idx, slug='page-%s' % idx, uri_path='/page-%s' % idx)
+        self.addCleanup(delattr, connection.features, 'max_query_params')
+        connection.features.max_query_params = 12
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(4, Resource.objects.all().publish())
+
+        updates = [q['sql'] for q in queries.captured_queries if 'UPDATE "warthog_resource" ' in q['sql']]
+        self.assertEqual(2, len(updates))
+        self.assertEqual(4, Resource.objects.exclude(snapshot=None).count())
+
+    def test_unpublish(self):
+        Resource.objects.filter(pk=self.resource.pk).publish()
+        Resource.objects.filter(pk=self.resource.pk).unpublish()
+
+        self.assertIsNone(Resource.objects.get(pk=self.resource.pk).snapshot_id)
+
+    def test_snapshot_rendered(self):
+        Resource.objects.filter(pk=self.resource.pk).publish()
+        self.assertEqual('Home: Welcome', self.get(Cms))
+
+        self.field.value = 'Draft'
+        self.field.save()
+        Resource.objects.filter(pk=self.resource.pk).update(title='Draft title')
+        Resource.objects.filter(pk=self.resource.pk).invalidate()
+
+        # Changes are not live until published again
+        self.assertEqual('Home: Welcome', self.get(Cms))
+        superuser = User(is_superuser=True, is_active=True)
+        self.assertEqual('Draft title: Draft', self.get(CmsPreview, superuser, self.resource.pk))
+
+        Resource.objects.filter(pk=self.resource.pk).publish()
+        self.assertEqual('Draft title: Draft', self.get(Cms))
+
+    def test_snapshot_cached(self):
+        Resource.objects.filter(pk=self.resource.pk).publish()
+        snapshot_id = Resource.objects.get(pk=self.resource.pk).snapshot_id
+        ResourceSnapshot.objects.get_snapshot(snapshot_id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual({snapshot_id}, set(ResourceSnapshot.objects.get_snapshots([snapshot_id])))
+
+    def test_listing_reads_snapshot(self):
+        Resource.objects.filter(pk=self.resource.pk).publish()
+        self.field.value = 'Draft'
+        self.field.save()
+        Resource.objects.filter(pk=self.resource.pk).update(title='Draft title')
+
+        actual = [(item.title, item.vars['body']) for item in ResourceIterator(Resource.objects.all())]
+        preview = [(item.title, item.vars['body']) for item in ResourceIterator(Resource.objects.all(), use_snapshots=False)]
+
+        self.assertEqual([('Home', 'Welcome')], actual)
+        self.assertEqual([('Draft title', 'Draft')], preview)
+
+    def test_admin_save_publishes(self):
+        target = ResourceAdmin(Resource, admin.site)
+        resource = Resource.objects.get(pk=self.resource.pk)
+        resource.published = True
+        resource.save()
+
+        target.save_snapshot(None, resource)
+
+        snapshot_id = Resource.objects.get(pk=self.resource.pk).snapshot_id
+        self.assertEqual({'body': 'Welcome'}, ResourceSnapshot.objects.get_snapshot(snapshot_id).fields)
+
+        resource = Resource.objects.get(pk=self.resource.pk)
+        resource.published = False
+        resource.save()
+        target.save_snapshot(None, resource)
+
+        self.assertIsNone(Resource.objects.get(pk=self.resource.pk).snapshot_id)
+
+    def test_prune(self):
+        Resource.objects.filter(pk=self.resource.pk).publish()
+        Resource.objects.filter(pk=self.resource.pk).publish()
+        ResourceSnapshot.objects.update(created=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(1, ResourceSnapshot.objects.prune(timezone.now() - timedelta(days=1)))
+        self.assertEqual(
+            [Resource.objects.get(pk=self.resource.pk).snapshot_id],
+            list(ResourceSnapshot.objects.values_list('pk', flat=True)))
@@ -1,17 +1,62 @@
 # -*- coding: utf-8 -*-
 from logging import getLogger
-from django.http import HttpResponse, Http404
+from django.conf import settings
+from django.contrib.sites.shortcuts import get_current_site
+from django.http import HttpResponse, Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
 from django.views.generic import View
 
+from . import cache, compress, routers, sitemaps
+from .conf import settings as cms_settings
+from .identity import get_identity_map
+from .managers import URI_PATHS_GENERATION
 from .models import Resource
-from .render import render_resource
+from .render import get_surrogate_keys, render_resource_page, resource_template_options, stream_resource
 
 
 logger = getLogger('warthog.views')
 
 
-class Cms(View):
+def compressed_response(request, variants, content_type=None):
+    """
+    Response with the best variant of precompressed content the client accepts.
+
+    :param request: Current request object.
+    :param variants: dict of content encoding -> content (see
+        :func:`warthog.compress.compress`).
+    :param content_type: Content type of response.
+
+    """
+    encoding = compress.select_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), variants)
+    response = HttpResponse(variants[encoding], content_type=content_type)
+    if len(variants) > 1:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    if encoding != compress.IDENTITY:
+        # GZipMiddleware skips responses that already have an encoding
+        response['Content-Encoding'] = encoding
+        response['Content-Length'] = str(len(response.content))
+    return response
+
+
+class ReadModeMixin(object):
+    """
+    Perform reads of a view (including those made while a streaming response
+    is iterated) from replica or primary databases, see :mod:`warthog.routers`.
+    """
+    read_mode = routers.REPLICA
+
+    def dispatch(self, request, *args, **kwargs):
+        with routers.read_mode(self.read_mode):
+            return super(ReadModeMixin, self).dispatch(request, *args, **kwargs)
+
+    def stream(self, chunks):
+        with routers.read_mode(self.read_mode):
+            for chunk in chunks:
+                yield chunk
+
+
+class Cms(ReadModeMixin, View):
     """View for displaying CMS resources.
 
     **Example**::
@@ -38,6 +83,9 @@ class Cms(View):
         This view is also used by :ref:CMSMiddleware to handle page requests.
 
     """
+    # Render the published snapshot of resources (see ResourceSnapshot)
+    use_snapshots = True
+
     def load_resource(self, *args, **kwargs):
         """Load the actual resource."""
         try:
@@ -64,8 +112,26 @@ class Cms(View):
 
         if not resource.can_serve(request.user, **self.can_serve_flags):
             raise Http404
+        get_identity_map(request, self.use_snapshots).add_resource(resource)
+
+        options = resource_template_options(resource, request)
+        content_type = None
+        if options['mime_type']:
+            content_type = '%s; charset=%s' % (options['mime_type'], settings.DEFAULT_CHARSET)
 
-        return HttpResponse(render_resource(resource, request))
+        # Dependencies of streamed output are only known once it has been sent so
+        # streaming responses are only tagged with the resource's own keys.
+        with get_identity_map(request).dependencies.track() as dependency_keys:
+            if options['streaming']:
+                response = StreamingHttpResponse(
+                    self.stream(stream_resource(resource, request)), content_type=content_type)
+            else:
+                response = compressed_response(request, render_resource_page(resource, request), content_type)
+
+        if cms_settings.CMS_SURROGATE_KEY_HEADER:
+            response[cms_settings.CMS_SURROGATE_KEY_HEADER] = ' '.join(
+                get_surrogate_keys(resource, request, options, dependency_keys))
+        return response
 
 
 class CmsPreview(Cms):
@@ -91,6 +157,65 @@ class CmsPreview(Cms):
         including those which have not been published or are outside the
         published date range. **Default:** ``preview_resource``
 
+    Resources are rendered with their current values rather than the published
+    snapshot and are always read from the primary database.
+
     """
+    use_snapshots = False
+    read_mode = routers.PRIMARY
+
     def load_resource(self, resource_id):
         return get_object_or_404(Resource, pk=resource_id)
+
+
+class Sitemap(ReadModeMixin, View):
+    """View for a sitemap of all live resources of the current site.
+
+    **Example**::
+
+        from django.conf.urls import *
+        from warthog.views import Sitemap
+
+        urlpatterns = patterns('',
+            url(r'^sitemap\.xml$', Sitemap.as_view()),
+            url(r'^sitemap-(?P<shard>\d+)\.xml$', Sitemap.as_view()),
+        )
+
+    The sitemap index lists shards of up to ``CMS_SITEMAP_SHARD_SIZE`` URLs.
+    Shards are streamed when generated and then served from cache until a
+    resource is changed or a scheduled transition occurs.
+
+    The ``as_view`` method takes the option:
+
+    ``shard_url``
+        Location of shards relative to the sitemap index.
+        **Default:** ``sitemap-%s.xml``
+
+    """
+    content_type = 'application/xml'
+    shard_url = 'sitemap-%s.xml'
+
+    def get(self, request, shard=None):
+        """Respond to ``get`` HTTP method."""
+        site = get_current_site(request)
+        generation = cache.get_generations([URI_PATHS_GENERATION])[URI_PATHS_GENERATION]
+        shard_keys = sitemaps.get_shard_keys(site, generation)
+
+        if shard is None:
+            shard_urls = [request.build_absolute_uri(self.shard_url % n) for n in range(1, len(shard_keys) + 1)]
+            return HttpResponse(sitemaps.render_index(shard_urls), content_type=self.content_type)
+
+        shard = int(shard)
+        if not 0 < shard <= len(shard_keys):
+            raise Http404
+
+        cache_key = sitemaps.shard_cache_key(site, shard, request.scheme, generation)
+        variants = cache.get(cache_key)
+        if variants is not None:
+            return compressed_response(request, variants, self.content_type)
+
+        base_url = '%s://%s' % (request.scheme, site.domain)
+        chunks = sitemaps.iter_shard(site, shard_keys[shard - 1], base_url)
+        return StreamingHttpResponse(
+            self.stream(sitemaps.cache_stream(cache_key, chunks, sitemaps.get_sitemap_timeout(site))),
+            content_type=self.content_type)